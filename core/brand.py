@@ -3,7 +3,106 @@ Utility for brand-detection logic in GSC Exporter.
 """
 import os
 import re
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+from functools import lru_cache
 from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+from core.naming import get_property_name
+
+BRAND_INDEX_FILENAME = 'brand-index.sqlite'
+# Keep resolved brand terms and per-query brand flags in cache/<property>/brand-index.sqlite
+BRAND_INDEX_ENABLED = os.environ.get('GSC_BRAND_INDEX', '1') != '0'
+
+def get_brand_index_path(site_url):
+    from core import cache
+    return os.path.join(cache.CACHE_DIR, get_property_name(site_url), BRAND_INDEX_FILENAME)
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS resolved_terms (
+            signature TEXT PRIMARY KEY,
+            terms TEXT NOT NULL,
+            resolved_at TEXT NOT NULL
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS query_flags (
+            terms_hash TEXT NOT NULL,
+            query TEXT NOT NULL,
+            is_brand INTEGER NOT NULL,
+            PRIMARY KEY (terms_hash, query)
+        ) WITHOUT ROWID''')
+    return conn
+
+def _get_terms_hash(terms_key):
+    """Hashes a term set's content; query flags are stored under it, so editing the terms invalidates them."""
+    return hashlib.md5('\n'.join(sorted(terms_key)).encode('utf-8')).hexdigest()
+
+def _load_resolved_terms(db_path, signature):
+    if not os.path.exists(db_path):
+        return None
+    conn = _connect(db_path)
+    try:
+        row = conn.execute('SELECT terms FROM resolved_terms WHERE signature = ?', (signature,)).fetchone()
+    finally:
+        conn.close()
+    return set(json.loads(row[0])) if row else None
+
+def _save_resolved_terms(db_path, signature, terms):
+    """Stores the resolved terms, dropping flags computed for any other term set."""
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute('DELETE FROM resolved_terms')
+            conn.execute('INSERT INTO resolved_terms VALUES (?, ?, ?)', (signature, json.dumps(sorted(terms)), datetime.now().isoformat()))
+            conn.execute('DELETE FROM query_flags WHERE terms_hash != ?', (_get_terms_hash(_terms_key(terms)),))
+    finally:
+        conn.close()
+
+def _load_query_flags(db_path, terms_hash):
+    if not os.path.exists(db_path):
+        return {}
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute('SELECT query, is_brand FROM query_flags WHERE terms_hash = ?', (terms_hash,)).fetchall()
+    finally:
+        conn.close()
+    return {query: bool(is_brand) for query, is_brand in rows}
+
+def _save_query_flags(db_path, terms_hash, flags):
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO query_flags VALUES (?, ?, ?)',
+                             [(terms_hash, query, int(flag)) for query, flag in flags.items()])
+    finally:
+        conn.close()
+
+def _get_config_brand_files(site_url):
+    """Returns the config/brand-terms-*.txt files tried for a site, in priority order."""
+    from core.naming import get_filename_slug
+    config_dir = 'config'
+    # Try a few variations of the slug for the brand file
+    # e.g. brand-terms-hr-inform-co-uk.txt or brand-terms-hr-inform.txt
+    candidates = [os.path.join(config_dir, f"brand-terms-{get_filename_slug(site_url)}.txt")]
+    hostname = urlparse(site_url).hostname
+    if not hostname and site_url.startswith('sc-domain:'):
+        hostname = site_url.replace('sc-domain:', '')
+    if hostname:
+        # Domain root (e.g. hr-inform)
+        root = hostname.split('.')[0] if not hostname.startswith('www.') else hostname.split('.')[1]
+        candidates.append(os.path.join(config_dir, f"brand-terms-{root}.txt"))
+    return candidates
+
+def _read_terms_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
 
 def get_brand_terms(site_url, brand_terms=None, brand_terms_file=None, no_brand_detection=False):
     """
@@ -13,10 +112,37 @@ def get_brand_terms(site_url, brand_terms=None, brand_terms_file=None, no_brand_
     2. brand_terms_file (path)
     3. config/brand-terms-{slug}.txt
     4. Automatic detection from site_url
+    The resolved terms are kept in the property's brand index and reused
+    until the arguments or a brand term file (mtime or size) change.
     """
     if no_brand_detection:
         return set()
 
+    files = ([brand_terms_file] if brand_terms_file else []) + _get_config_brand_files(site_url)
+    signature = json.dumps({
+        'site_url': site_url,
+        'brand_terms': sorted(brand_terms or []),
+        'files': [[path, os.stat(path).st_mtime_ns, os.stat(path).st_size] for path in files if os.path.exists(path)]
+    })
+    db_path = get_brand_index_path(site_url)
+    if BRAND_INDEX_ENABLED:
+        try:
+            terms = _load_resolved_terms(db_path, signature)
+            if terms is not None:
+                return terms
+        except (OSError, sqlite3.Error) as e:
+            print(f"  - Could not read the brand index: {e}")
+
+    terms = _resolve_brand_terms(site_url, brand_terms, brand_terms_file)
+    if BRAND_INDEX_ENABLED:
+        try:
+            _save_resolved_terms(db_path, signature, terms)
+        except (OSError, sqlite3.Error) as e:
+            print(f"  - Could not update the brand index: {e}")
+    return terms
+
+def _resolve_brand_terms(site_url, brand_terms=None, brand_terms_file=None):
+    """Resolves the brand terms for a site without the brand index (see get_brand_terms)."""
     all_brand_terms = set()
 
     # 1. Manual terms
@@ -25,34 +151,13 @@ def get_brand_terms(site_url, brand_terms=None, brand_terms_file=None, no_brand_
 
     # 2. Manual file
     if brand_terms_file and os.path.exists(brand_terms_file):
-        with open(brand_terms_file, 'r', encoding='utf-8') as f:
-            all_brand_terms.update(line.strip() for line in f if line.strip())
+        all_brand_terms.update(_read_terms_file(brand_terms_file))
 
     # 3. Config file
     if not all_brand_terms:
-        from core.naming import get_filename_slug
-        slug = get_filename_slug(site_url)
-        # Try a few variations of the slug for the brand file
-        # e.g. brand-terms-hr-inform-co-uk.txt or brand-terms-hr-inform.txt
-        config_dir = 'config'
-        if os.path.exists(config_dir):
-            # Try full slug first
-            brand_file = os.path.join(config_dir, f"brand-terms-{slug}.txt")
-            if os.path.exists(brand_file):
-                with open(brand_file, 'r', encoding='utf-8') as f:
-                    all_brand_terms.update(line.strip() for line in f if line.strip())
-            else:
-                # Try domain root (e.g. hr-inform)
-                hostname = urlparse(site_url).hostname
-                if not hostname and site_url.startswith('sc-domain:'):
-                    hostname = site_url.replace('sc-domain:', '')
-                
-                if hostname:
-                    root = hostname.split('.')[0] if not hostname.startswith('www.') else hostname.split('.')[1]
-                    brand_file = os.path.join(config_dir, f"brand-terms-{root}.txt")
-                    if os.path.exists(brand_file):
-                        with open(brand_file, 'r', encoding='utf-8') as f:
-                            all_brand_terms.update(line.strip() for line in f if line.strip())
+        brand_file = next((path for path in _get_config_brand_files(site_url) if os.path.exists(path)), None)
+        if brand_file:
+            all_brand_terms.update(_read_terms_file(brand_file))
 
     # 4. Automatic detection
     if not all_brand_terms:
@@ -80,11 +185,70 @@ def get_brand_terms(site_url, brand_terms=None, brand_terms_file=None, no_brand_
 
     return all_brand_terms
 
+# Distinct queries whose brand flag is remembered per term set within a process
+CLASSIFY_MEMO_MAX_QUERIES = 1000000
+
+_classify_memo = {}
+_loaded_indexes = set()
+
+def _terms_key(brand_terms):
+    return frozenset(brand_terms or ())
+
+@lru_cache(maxsize=32)
+def _compile_brand_pattern(terms_key):
+    """Compiles the word-bounded, case-insensitive alternation for a set of brand terms once."""
+    return re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in sorted(terms_key)) + r')\b', re.IGNORECASE)
+
 def classify_query(query, brand_terms):
     """Returns True if the query contains any brand terms."""
     if not brand_terms:
         return False
     
     # Use word boundaries for precise matching
-    pattern = r'\b(?:' + '|'.join(re.escape(term) for term in brand_terms) + r')\b'
-    return bool(re.search(pattern, query, re.IGNORECASE))
+    return bool(_compile_brand_pattern(_terms_key(brand_terms)).search(query))
+
+def classify_queries(queries, brand_terms, site_url=None):
+    """
+    Classifies a whole column of queries at once, returning a boolean Series
+    aligned with it. Each distinct query is matched once and the result is
+    remembered for later reports in the same process. With site_url, flags
+    are also looked up in and added to the property's brand index, so other
+    processes and later runs only match queries they have not seen before.
+    Matches classify_query exactly; missing queries are non-brand.
+    """
+    queries = pd.Series(queries)
+    if not brand_terms or queries.empty:
+        return pd.Series(False, index=queries.index, dtype=bool)
+    terms_key = _terms_key(brand_terms)
+    search = _compile_brand_pattern(terms_key).search
+    memo = _classify_memo.setdefault(terms_key, {})
+
+    db_path = get_brand_index_path(site_url) if site_url and BRAND_INDEX_ENABLED else None
+    terms_hash = _get_terms_hash(terms_key)
+    if db_path and (db_path, terms_hash) not in _loaded_indexes:
+        try:
+            memo.update(_load_query_flags(db_path, terms_hash))
+        except (OSError, sqlite3.Error) as e:
+            print(f"  - Could not read the brand index: {e}")
+        _loaded_indexes.add((db_path, terms_hash))
+
+    codes, uniques = pd.factorize(queries)
+    flags = []
+    new_flags = {}
+    for query in uniques:
+        flag = memo.get(query)
+        if flag is None:
+            flag = isinstance(query, str) and search(query) is not None
+            if len(memo) < CLASSIFY_MEMO_MAX_QUERIES:
+                memo[query] = flag
+            if isinstance(query, str):
+                new_flags[query] = flag
+        flags.append(flag)
+    if db_path and new_flags:
+        try:
+            _save_query_flags(db_path, terms_hash, new_flags)
+        except (OSError, sqlite3.Error) as e:
+            print(f"  - Could not update the brand index: {e}")
+    # Missing values have code -1, which picks the trailing False
+    lookup = np.array(flags + [False], dtype=bool)
+    return pd.Series(lookup[codes], index=queries.index)
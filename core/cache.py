@@ -3,19 +3,141 @@ Unified caching system for GSC Exporter.
 Handles hash-based caching with monthly fragmentation to maximise reusability.
 """
 import os
+import re
 import hashlib
 import json
 import time
 import socket
+import shutil
 import calendar
+import sqlite3
+import threading
 import pandas as pd
-from datetime import datetime, date
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from googleapiclient.errors import HttpError
 from core.naming import get_property_name
+from core.storage import read_fragment, write_fragment, fragment_exists, find_fragment, merge_fragments, get_fragment_data_files
+from core.memo import get_memo_key, get_fragments_fingerprint, memo_get, memo_put
+from core import datastore, manifest, metrics
+from core.quota import execute_query, is_retryable, backoff_delay, count_event, TIMEOUT_ATTEMPTS
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
 
 CACHE_DIR = 'cache'
 
+METRIC_COLUMNS = ['clicks', 'impressions', 'ctr', 'position']
+
+# The Search Analytics API returns at most 25,000 rows per request
+MAX_ROW_LIMIT = 25000
+# Page size floor when shrinking after timeouts
+MIN_ROW_LIMIT = 1000
+
+# Checkpoints older than this are discarded, as GSC may have re-ordered rows since
+CHECKPOINT_MAX_AGE = timedelta(hours=24)
+
+# Answer requests from cached fragments with a superset of the dimensions where possible
+ROLLUP_ENABLED = os.environ.get('GSC_ROLLUP', '1') != '0'
+# Dimensions which can be summed away without changing how GSC aggregates the data
+ROLLUP_EXACT_DIMENSIONS = {'date', 'country', 'device'}
+# Dropping 'page' switches from by-page to by-property aggregation, and dropping 'query'
+# loses anonymised queries, so these roll-ups only approximate what the API would return
+ROLLUP_APPROXIMATE_DIMENSIONS = {'page', 'query'}
+# GSC exposes at most about 50,000 rows per day per search type; denser fragments are likely truncated
+DAILY_ROW_CAP = 50000
+
+# GSC keeps revising a day's data for a few days after it is first published
+DATA_REVISION_DAYS = int(os.environ.get('GSC_REVISION_DAYS', 3))
+# Partial ranges in a month that is still open are cached one day per fragment
+DAILY_FRAGMENTS_ENABLED = os.environ.get('GSC_DAILY_FRAGMENTS', '1') != '0'
+# Fragments which GSC may still revise are refetched once they are older than this
+CACHE_TTL = timedelta(hours=float(os.environ.get('GSC_CACHE_TTL_HOURS', 24)))
+# Refresh expired fragments which are still being revised in the background, serving the cached copy meanwhile
+BACKGROUND_REFRESH = os.environ.get('GSC_BACKGROUND_REFRESH', '1') != '0'
+
+class FetchCancelled(Exception):
+    """Raised inside fetch workers when the user interrupts a run."""
+
+# Number of missing monthly chunks fetched in parallel by a single fetch_with_cache call
+FETCH_WORKERS = int(os.environ.get('GSC_FETCH_WORKERS', 4))
+# Maximum concurrent API conversations per property across all threads in the process
+PROPERTY_CONCURRENCY = int(os.environ.get('GSC_PROPERTY_CONCURRENCY', 4))
+
+# Seconds between attempts to take a fragment lock held by another thread or process
+LOCK_POLL_INTERVAL = 0.2
+
+_property_semaphores = {}
+_property_semaphores_lock = threading.Lock()
+
+def _get_property_semaphore(site_url):
+    """Returns the semaphore capping concurrent fetches for a property."""
+    with _property_semaphores_lock:
+        if site_url not in _property_semaphores:
+            _property_semaphores[site_url] = threading.BoundedSemaphore(PROPERTY_CONCURRENCY)
+        return _property_semaphores[site_url]
+
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+def _get_lock_path(base_path):
+    return os.path.join(os.path.dirname(base_path), '.locks', os.path.basename(base_path) + '.lock')
+
+@contextmanager
+def fragment_lock(base_path, cancel_event=None):
+    """
+    Holds the lock for one cache key while its fragment is written, so that
+    concurrent threads and processes on the host fetch each key only once.
+    The file lock is released by the OS if its holder dies, so it never goes
+    stale. Without fcntl (Windows) only threads within the process are serialised.
+    """
+    with _key_locks_lock:
+        thread_lock = _key_locks.setdefault(base_path, threading.Lock())
+    while not thread_lock.acquire(timeout=LOCK_POLL_INTERVAL):
+        if cancel_event is not None and cancel_event.is_set():
+            raise FetchCancelled()
+    try:
+        if not HAS_FCNTL:
+            yield
+            return
+        lock_path = _get_lock_path(base_path)
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise FetchCancelled()
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+def _is_fragment_locked(base_path):
+    """Returns True if another thread or process is writing the fragment."""
+    if not HAS_FCNTL:
+        return False
+    try:
+        with open(_get_lock_path(base_path), 'r') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    except FileNotFoundError:
+        pass
+    return False
+
 def is_full_month(start, end):
     if start.day != 1:
         return False
@@ -24,17 +146,33 @@ def is_full_month(start, end):
         return False
     return True
 
+def _get_cache_key(site_url, s_str, e_str, dimensions, search_type):
+    """Returns the cache key for a chunk. Dimension order does not matter."""
+    standardised_url = site_url.rstrip('/')
+    cache_key_content = f"{standardised_url}|{s_str}|{e_str}|{','.join(sorted(dimensions))}|{search_type}"
+    return hashlib.md5(cache_key_content.encode()).hexdigest()
+
 def _get_cache_paths(cache_key, site_url):
-    """Returns the CSV and JSON paths for a given cache key within a site subfolder."""
+    """
+    Returns the data base path (without extension) and JSON path for a given
+    cache key within a site subfolder. The data file extension depends on the
+    storage backend (see core.storage).
+    """
     property_name = get_property_name(site_url)
     site_cache_dir = os.path.join(CACHE_DIR, property_name)
     
     if not os.path.exists(site_cache_dir):
         os.makedirs(site_cache_dir, exist_ok=True)
         
-    csv_path = os.path.join(site_cache_dir, f"{cache_key}.csv")
+    base_path = os.path.join(site_cache_dir, cache_key)
     json_path = os.path.join(site_cache_dir, f"{cache_key}.json")
-    return csv_path, json_path
+    return base_path, json_path
+
+def _record_fragment_io(event, site_url, base_path, rows):
+    """Records the size of a fragment read or written, if metrics are enabled."""
+    if metrics.is_enabled():
+        path, _ = find_fragment(base_path)
+        metrics.record(event, site_url, key=os.path.basename(base_path), rows=rows, bytes=os.path.getsize(path) if path else 0)
 
 def _get_monthly_chunks(start_date, end_date):
     """
@@ -61,75 +199,580 @@ def _get_monthly_chunks(start_date, end_date):
         
     return chunks
 
-def _fetch_from_api(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=10000, max_rows=None):
-    """Fetches performance data from GSC with pagination and retries."""
-    all_data = []
-    start_row = 0
-    
+def is_open_month(day):
+    """Returns True if the month containing day may still receive or revise data."""
+    last_day = day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    return last_day + timedelta(days=DATA_REVISION_DAYS) >= date.today()
+
+def _get_fragment_chunks(start_date, end_date):
+    """
+    Returns the (start, end) chunks cached as separate fragments: calendar
+    months, except that partial ranges ending in a still-open month (e.g.
+    --last-7-days) are split into single days. Rolling windows then only
+    fetch the days they have not seen before.
+    """
+    chunks = []
+    for chunk_start, chunk_end in _get_monthly_chunks(start_date, end_date):
+        if DAILY_FRAGMENTS_ENABLED and not is_full_month(chunk_start, chunk_end) and is_open_month(chunk_end):
+            days = (chunk_end - chunk_start).days + 1
+            chunks.extend((chunk_start + timedelta(days=i), chunk_start + timedelta(days=i)) for i in range(days))
+        else:
+            chunks.append((chunk_start, chunk_end))
+    return chunks
+
+def _rows_to_frame(rows, dimensions):
+    """Converts a page of API rows into a compact columnar DataFrame."""
+    data = {}
+    if dimensions:
+        keys = [row['keys'] for row in rows]
+        for idx, dim in enumerate(dimensions):
+            data[dim] = [k[idx] for k in keys]
+    for col in METRIC_COLUMNS:
+        if col in rows[0]:
+            data[col] = pd.to_numeric(pd.Series([row.get(col) for row in rows]), errors='coerce')
+    return pd.DataFrame(data)
+
+def _iter_api_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=MAX_ROW_LIMIT, max_rows=None, start_row=0):
+    """
+    Yields (start_row, DataFrame) for each page of results, starting at start_row.
+    The page size adapts between MIN_ROW_LIMIT and row_limit: it halves after
+    a timeout and doubles back after each successful page.
+    Requests go through the shared rate-limited executor (core.quota), which
+    retries transient failures. If a page still fails the error is raised
+    rather than returning partial data that would be cached as complete.
+    """
+    max_limit = row_limit
+    timeouts = 0
+    latencies = []
+    total_rows = 0
     while True:
-        success = False
-        for attempt in range(3):
-            try:
-                request = {
-                    'startDate': start_date,
-                    'endDate': end_date,
-                    'dimensions': dimensions,
-                    'searchType': search_type,
-                    'rowLimit': row_limit,
-                    'startRow': start_row
-                }
-                start_time = time.time()
-                response = service.searchanalytics().query(siteUrl=site_url, body=request).execute()
-                elapsed = time.time() - start_time
-
-                if 'rows' in response:
-                    rows = response['rows']
-                    all_data.extend(rows)
-                    print(f"    - Retrieved {len(rows)} rows (total: {len(all_data)}) in {elapsed:.2f}s...")
-                    if len(rows) < row_limit:
-                        break
-                    start_row += row_limit
-                    if max_rows and start_row >= max_rows:
-                        print(f"    - Reached maximum row limit of {max_rows} rows. Stopping fetch.")
-                        break
-                else:
-                    break
-                success = True
-                break 
-            except (socket.timeout, TimeoutError):
-                print(f"    - Timeout occurred. Retrying (attempt {attempt + 1}/3)...")
-                time.sleep(5 * (attempt + 1))
-            except HttpError as e:
+        page_limit = min(row_limit, max_rows - start_row) if max_rows else row_limit
+        request = {
+            'startDate': start_date,
+            'endDate': end_date,
+            'dimensions': dimensions,
+            'searchType': search_type,
+            'rowLimit': page_limit,
+            'startRow': start_row
+        }
+        start_time = time.time()
+        try:
+            response = execute_query(service, site_url, request, retry_timeouts=False)
+        except (socket.timeout, TimeoutError):
+            timeouts += 1
+            if timeouts >= TIMEOUT_ATTEMPTS:
+                count_event('failed', site_url)
+                raise
+            count_event('retried', site_url)
+            row_limit = max(min(MIN_ROW_LIMIT, row_limit), row_limit // 2)
+            print(f"    - Timeout occurred. Retrying (attempt {timeouts}/{TIMEOUT_ATTEMPTS})... Page size is now {row_limit:,} rows.")
+            time.sleep(backoff_delay(timeouts))
+            continue
+        except HttpError as e:
+            # A rejected first request (e.g. no permission) means there is simply no data
+            if start_row == 0 and not is_retryable(e):
                 print(f"  - An HTTP error occurred: {e}")
-                break 
-        
-        if not success or 'rows' not in response or len(response['rows']) < row_limit:
+                return
+            raise
+        elapsed = time.time() - start_time
+        timeouts = 0
+
+        rows = response.get('rows', [])
+        metrics.record('api_call', site_url, rows=len(rows), latency=round(elapsed, 3), page_size=page_limit, start_row=start_row, dimensions=list(dimensions))
+        if rows:
+            latencies.append(elapsed)
+            total_rows += len(rows)
+            print(f"    - Retrieved {len(rows)} rows (total: {start_row + len(rows)}) in {elapsed:.2f}s (page size {page_limit:,})...")
+            yield start_row, _rows_to_frame(rows, dimensions)
+
+        if len(rows) < page_limit:
+            break
+        start_row += len(rows)
+        row_limit = min(max_limit, row_limit * 2)
+        if max_rows and start_row >= max_rows:
+            print(f"    - Reached maximum row limit of {max_rows} rows. Stopping fetch.")
             break
-            
-    if not all_data:
+
+    if len(latencies) > 1:
+        print(f"    - Fetched {total_rows:,} rows in {len(latencies)} pages (avg {sum(latencies) / len(latencies):.2f}s, max {max(latencies):.2f}s per page).")
+
+def _fetch_from_api(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=MAX_ROW_LIMIT, max_rows=None):
+    """Fetches performance data from GSC with pagination into a single DataFrame."""
+    pages = [page_df for _, page_df in _iter_api_pages(service, site_url, start_date, end_date, dimensions, search_type, row_limit, max_rows)]
+    if not pages:
         return pd.DataFrame()
+    return pd.concat(pages, ignore_index=True)
+
+def _list_parts(parts_dir):
+    """Returns sorted (start_row, rows, base_path) tuples for the pages downloaded so far."""
+    if not os.path.isdir(parts_dir):
+        return []
+    parts = {}
+    for filename in os.listdir(parts_dir):
+        name, _ = os.path.splitext(filename)
+        pieces = name.split('-')
+        if len(pieces) != 3 or pieces[0] != 'part' or not (pieces[1].isdigit() and pieces[2].isdigit()):
+            continue
+        start_row, rows = int(pieces[1]), int(pieces[2])
+        parts[start_row] = (start_row, rows, os.path.join(parts_dir, name))
+    return [parts[k] for k in sorted(parts)]
+
+def _remove_parts(parts):
+    for _, _, part_base in parts:
+        for path in get_fragment_data_files(part_base):
+            os.remove(path)
+
+def _save_checkpoint(checkpoint_path, params, parts):
+    """Records the last committed page so an interrupted download can resume from it."""
+    next_start_row = parts[-1][0] + parts[-1][1]
+    checkpoint = dict(params, next_start_row=next_start_row, rows=next_start_row, pages=len(parts), updated_at=datetime.now().isoformat())
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=4)
+    os.replace(tmp_path, checkpoint_path)
+
+def _load_checkpoint(parts_dir, checkpoint_path, params):
+    """
+    Returns the committed parts to resume from. Parts are only trusted when a
+    checkpoint for the same request, younger than CHECKPOINT_MAX_AGE, covers
+    them as a contiguous run from row 0. Anything else is discarded.
+    """
+    # Pages whose write was interrupted before the rename are never part of a resume
+    if os.path.isdir(parts_dir):
+        for filename in os.listdir(parts_dir):
+            if '.tmp' in filename:
+                os.remove(os.path.join(parts_dir, filename))
+    parts = _list_parts(parts_dir)
+    checkpoint = None
+    if os.path.exists(checkpoint_path):
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            updated_at = datetime.fromisoformat(checkpoint['updated_at'])
+            if any(checkpoint.get(k) != v for k, v in params.items()) or datetime.now() - updated_at > CHECKPOINT_MAX_AGE:
+                checkpoint = None
+        except (OSError, ValueError, KeyError, TypeError):
+            checkpoint = None
+        if checkpoint is None:
+            os.remove(checkpoint_path)
+
+    committed_rows = checkpoint['next_start_row'] if checkpoint else 0
+    resumable = []
+    for part in parts:
+        start_row, rows, _ = part
+        if start_row != sum(p[1] for p in resumable) or start_row + rows > committed_rows:
+            break
+        resumable.append(part)
+    _remove_parts(parts[len(resumable):])
+    return resumable
+
+def find_checkpoints(site_url=None):
+    """Returns the checkpoints of interrupted downloads, optionally for a single property."""
+    import glob
+    pattern_dir = get_property_name(site_url) if site_url else '*'
+    checkpoints = []
+    for checkpoint_path in sorted(glob.glob(os.path.join(CACHE_DIR, pattern_dir, '*.checkpoint'))):
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoints.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return checkpoints
+
+_CACHE_KEY_PATTERN = re.compile(r'^([0-9a-f]{32})\.(.+)$')
+
+def find_orphaned_fragments(site_url=None):
+    """
+    Returns (path, reason) for cache files left behind by interrupted writes:
+    temporary files, data files without a sidecar, sidecars without a data
+    file and downloaded pages without a checkpoint. Keys whose lock is held
+    are skipped, as they are still being written.
+    """
+    import glob
+    pattern_dir = get_property_name(site_url) if site_url else '*'
+    orphans = []
+    for site_cache_dir in sorted(glob.glob(os.path.join(CACHE_DIR, pattern_dir))):
+        if not os.path.isdir(site_cache_dir):
+            continue
+        keys = {}
+        for name in os.listdir(site_cache_dir):
+            match = _CACHE_KEY_PATTERN.match(name)
+            if match:
+                keys.setdefault(match.group(1), []).append(match.group(2))
+        for cache_key, suffixes in sorted(keys.items()):
+            base_path = os.path.join(site_cache_dir, cache_key)
+            if _is_fragment_locked(base_path):
+                continue
+            data_files = get_fragment_data_files(base_path)
+            for suffix in sorted(suffixes):
+                path = f"{base_path}.{suffix}"
+                if 'tmp' in suffix.split('.'):
+                    orphans.append((path, 'Temporary file left by an interrupted write'))
+                elif suffix == 'json' and not data_files:
+                    orphans.append((path, 'Metadata without a data file'))
+                elif suffix == 'parts' and 'checkpoint' not in suffixes:
+                    orphans.append((path, 'Downloaded pages without a checkpoint'))
+            if 'json' not in suffixes:
+                orphans.extend((path, 'Data file without metadata (interrupted write)') for path in data_files)
+    return orphans
+
+def _fetch_to_fragment(service, site_url, start_date, end_date, dimensions, search_type, max_rows, base_path, cancel_event=None, json_path=None):
+    """
+    Streams a chunk from the API straight to disk. Each page is written as a
+    part file as soon as it arrives, so memory is bounded by a single page, and
+    a checkpoint records the last committed startRow. An interrupted download
+    resumes from the checkpoint. Once complete, the parts are merged into the
+    fragment and its JSON sidecar (json_path) is written before the parts and
+    checkpoint are removed. Returns the number of rows cached.
+    """
+    parts_dir = base_path + '.parts'
+    # Not named .json so the cache utilities never mistake it for fragment metadata
+    checkpoint_path = base_path + '.checkpoint'
+    params = {
+        'site_url': site_url,
+        'start_date': start_date,
+        'end_date': end_date,
+        'dimensions': list(dimensions),
+        'search_type': search_type
+    }
+    parts = _load_checkpoint(parts_dir, checkpoint_path, params)
+    start_row = parts[-1][0] + parts[-1][1] if parts else 0
+    if parts:
+        print(f"    - Resuming from checkpoint at row {start_row} ({len(parts)} pages already downloaded).")
+    os.makedirs(parts_dir, exist_ok=True)
+
+    if not (max_rows and start_row >= max_rows):
+        for page_start, page_df in _iter_api_pages(service, site_url, start_date, end_date, dimensions, search_type, max_rows=max_rows, start_row=start_row):
+            part_base = os.path.join(parts_dir, f"part-{page_start:09d}-{len(page_df)}")
+            # Write then rename so a crash never leaves a truncated part behind
+            tmp_path = write_fragment(page_df, part_base + '.tmp')
+            os.replace(tmp_path, part_base + os.path.splitext(tmp_path)[1])
+            parts.append((page_start, len(page_df), part_base))
+            _save_checkpoint(checkpoint_path, params, parts)
+            if cancel_event is not None and cancel_event.is_set():
+                raise FetchCancelled()
+
+    rows = merge_fragments([part_base for _, _, part_base in parts], base_path)
+    if rows and json_path:
+        _write_metadata(json_path, site_url, start_date, end_date, dimensions, search_type, rows, max_rows)
+        _record_fragment_io('fragment_write', site_url, base_path, rows)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return rows
+
+def _fetch_chunk(service, site_url, s_str, e_str, dimensions, search_type, max_rows, base_path, json_path, log_prefix, cancel_event=None):
+    """
+    Fetches a single chunk from the API and commits it to the cache as soon as it lands.
+    Fetches are single-flight: the chunk's lock is held throughout, and a
+    fragment committed by another thread or process while waiting for it is
+    used instead of fetching the chunk again.
+    """
+    with fragment_lock(base_path, cancel_event):
+        metadata = _read_metadata(json_path)
+        if metadata is not None and fragment_exists(base_path) and get_freshness(metadata) in ('fresh', 'settled'):
+            print(f"{log_prefix}: Using data cached by a concurrent run: {os.path.basename(base_path)}.")
+            return metadata.get('row_count')
+        with _get_property_semaphore(site_url):
+            if cancel_event is not None and cancel_event.is_set():
+                raise FetchCancelled()
+            print(f"{log_prefix}: Fetching from GSC API: {os.path.basename(base_path)}.")
+            return _fetch_to_fragment(service, site_url, s_str, e_str, dimensions, search_type, max_rows, base_path, cancel_event, json_path)
+
+def _commit_fragment(df, base_path, json_path, site_url, s_str, e_str, dimensions, search_type, max_rows, **extra):
+    """Writes a fragment built from cached data, then its sidecar, under the chunk's lock."""
+    with fragment_lock(base_path):
+        tmp_path = write_fragment(df, base_path + '.tmp')
+        os.replace(tmp_path, base_path + os.path.splitext(tmp_path)[1])
+        _write_metadata(json_path, site_url, s_str, e_str, dimensions, search_type, len(df), max_rows, **extra)
+    _record_fragment_io('fragment_write', site_url, base_path, len(df))
+
+def _write_metadata(json_path, site_url, s_str, e_str, dimensions, search_type, rows, max_rows, **extra):
+    """
+    Writes the JSON sidecar describing a cached fragment. It is written after
+    the data file and renamed into place, so a fragment is only ever seen with
+    a complete sidecar; a data file without one was interrupted mid-commit.
+    """
+    metadata = {
+        'site_url': site_url,
+        'start_date': s_str,
+        'end_date': e_str,
+        'dimensions': dimensions,
+        'search_type': search_type,
+        'row_count': rows,
+        'max_rows': max_rows,
+        'fetched_at': datetime.now().isoformat()
+    }
+    metadata.update(extra)
+    tmp_path = f"{json_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=4)
+    os.replace(tmp_path, json_path)
+    try:
+        manifest.record_fragment(CACHE_DIR, json_path, metadata)
+    except (OSError, sqlite3.Error) as e:
+        # The sidecar is the source of truth; a stale manifest is rebuilt on demand
+        print(f"  - Could not record {os.path.basename(json_path)} in the cache manifest: {e}")
+
+def _read_metadata(json_path):
+    """Returns the JSON sidecar of a fragment, or None if it is missing or unreadable."""
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return metadata if isinstance(metadata, dict) else None
+
+def _is_settled(metadata):
+    """
+    Returns True if a fragment was fetched after GSC stopped revising its last
+    day, so it can never change.
+    """
+    try:
+        fetched_on = datetime.fromisoformat(metadata['fetched_at']).date()
+        end_date = date.fromisoformat(metadata['end_date'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return (fetched_on - end_date).days >= DATA_REVISION_DAYS
+
+def get_freshness(metadata):
+    """
+    Classifies a cached fragment by its fetched_at metadata:
+    'settled'  fetched after GSC stopped revising its last day; never refetched.
+    'fresh'    may still change, but was fetched within CACHE_TTL.
+    'stale'    older than CACHE_TTL and GSC is still revising it; served while it is refreshed.
+    'expired'  fetched before its data settled, which it now has; refetched before use.
+    Fragments without fetched_at predate this policy and are treated as settled.
+    """
+    if metadata is None or 'fetched_at' not in metadata or _is_settled(metadata):
+        return 'settled'
+    try:
+        fetched_at = datetime.fromisoformat(metadata['fetched_at'])
+        end_date = date.fromisoformat(metadata['end_date'])
+    except (KeyError, TypeError, ValueError):
+        return 'settled'
+    if datetime.now() - fetched_at < CACHE_TTL:
+        return 'fresh'
+    if (date.today() - end_date).days < DATA_REVISION_DAYS:
+        return 'stale'
+    return 'expired'
+
+_refresh_pool = None
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+def _refresh_in_background(fetch_args):
+    """
+    Refetches a stale fragment on a background thread. The interpreter waits
+    for pending refreshes before exiting, so the next run finds them cached.
+    """
+    global _refresh_pool
+    base_path = fetch_args[7]
+    with _refresh_lock:
+        if base_path in _refreshing:
+            return
+        _refreshing.add(base_path)
+        if _refresh_pool is None:
+            _refresh_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='gsc-refresh')
+
+    def refresh():
+        try:
+            _fetch_chunk(*fetch_args)
+        except Exception as e:
+            print(f"  - Background refresh of {os.path.basename(base_path)} failed: {e}")
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(base_path)
+
+    _refresh_pool.submit(refresh)
+
+def _merge_daily_chunk(site_url, chunk_start, chunk_end, dimensions, search_type, max_rows):
+    """
+    Builds a closed month from its cached single-day fragments, if every day
+    is cached, settled and complete. Returns the month's DataFrame or None.
+    """
+    frames = []
+    day = chunk_start
+    while day <= chunk_end:
+        day_str = day.strftime('%Y-%m-%d')
+        base_path, json_path = _get_cache_paths(_get_cache_key(site_url, day_str, day_str, dimensions, search_type), site_url)
+        metadata = _read_metadata(json_path)
+        # Days without any data have no fragment, so a month with gaps is fetched instead
+        if metadata is None or not _is_settled(metadata) or _is_truncated(metadata) or not fragment_exists(base_path):
+            return None
+        frames.append(read_fragment(base_path))
+        day += timedelta(days=1)
+
+    result_df = aggregate_metrics(pd.concat(frames, ignore_index=True), dimensions)
+    if 'clicks' in result_df.columns:
+        result_df = result_df.sort_values('clicks', ascending=False, kind='stable').reset_index(drop=True)
+    if max_rows:
+        result_df = result_df.head(max_rows)
+    return result_df
+
+def _load_fragment_index(site_url):
+    """Returns (base_path, metadata) for every cached fragment of a property, from the cache manifest."""
+    return [
+        (entry['base_path'], entry['metadata'])
+        for entry in manifest.load_manifest(CACHE_DIR, site_url)
+        if entry['metadata'] and 'dimensions' in entry['metadata']
+    ]
+
+def _is_truncated(metadata):
+    """
+    Returns True if a fragment may be missing rows: either the fetch stopped at
+    max_rows, or it is as dense as GSC's daily row cap allows. Fragments cached
+    before max_rows was recorded may have been capped, so they count as truncated.
+    """
+    if 'max_rows' not in metadata or 'row_count' not in metadata:
+        return True
+    row_count = metadata['row_count'] or 0
+    max_rows = metadata['max_rows']
+    if max_rows and row_count >= max_rows:
+        return True
+    days = (date.fromisoformat(metadata['end_date']) - date.fromisoformat(metadata['start_date'])).days + 1
+    return row_count >= DAILY_ROW_CAP * days
+
+def _plan_rollup(index, site_url, s_str, e_str, dimensions, search_type):
+    """
+    Finds a cached fragment for the same chunk with a superset of the requested
+    dimensions. Returns a plan dict (base_path, metadata, exact, reasons) or None.
+    Exact plans are preferred, then the smallest source fragment.
+    """
+    requested = set(dimensions)
+    droppable = ROLLUP_EXACT_DIMENSIONS | ROLLUP_APPROXIMATE_DIMENSIONS
+    plans = []
+    for base_path, metadata in index:
+        if (metadata.get('site_url', '').rstrip('/') != site_url.rstrip('/')
+                or metadata.get('start_date') != s_str or metadata.get('end_date') != e_str
+                or metadata.get('search_type', 'web') != search_type):
+            continue
+        source = set(metadata['dimensions'])
+        dropped = source - requested
+        # searchAppearance rows overlap, so it can never be summed away
+        if not requested < source or not dropped <= droppable:
+            continue
+        # Never derive from data fetched before it settled
+        if get_freshness(metadata) == 'expired' or not fragment_exists(base_path):
+            continue
+        reasons = [f"'{dim}' dropped" for dim in sorted(dropped & ROLLUP_APPROXIMATE_DIMENSIONS)]
+        if _is_truncated(metadata):
+            reasons.append('source may be truncated')
+        plans.append({'base_path': base_path, 'metadata': metadata, 'exact': not reasons, 'reasons': reasons})
+    if not plans:
+        return None
+    return min(plans, key=lambda p: (not p['exact'], p['metadata'].get('row_count') or 0))
+
+def aggregate_metrics(df, dimensions, **named_aggs):
+    """
+    Aggregates GSC rows to the given dimensions in a single vectorised pass.
+    Clicks and impressions are summed, position is weighted by impressions
+    (falling back to the plain mean for groups without impressions) and CTR is
+    recalculated. Extra named aggregations, e.g. unique_queries=('query', 'nunique'),
+    are passed through to groupby.agg. Rows are returned in dimension order.
+    """
+    dimensions = list(dimensions)
+    df = df.copy()
+    agg_dict = {col: (col, 'sum') for col in ['clicks', 'impressions'] if col in df.columns}
+    has_position = 'position' in df.columns
+    if has_position:
+        if 'impressions' in df.columns:
+            df['weighted_position'] = df['position'] * df['impressions']
+            agg_dict['weighted_position'] = ('weighted_position', 'sum')
+        agg_dict['mean_position'] = ('position', 'mean')
+    agg_dict.update(named_aggs)
+    if not agg_dict:
+        return pd.DataFrame(columns=dimensions)
 
-    df = pd.DataFrame(all_data)
-    
-    # Extract dimensions from the 'keys' list if dimensions were requested
     if dimensions:
-        df[dimensions] = pd.DataFrame(df['keys'].tolist(), index=df.index)
-        df = df.drop(columns=['keys'])
-    
-    # Ensure numeric conversion
-    for col in ['clicks', 'impressions', 'ctr', 'position']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-    return df
+        result_df = df.groupby(dimensions).agg(**agg_dict).reset_index()
+    else:
+        result_df = df.groupby(lambda _: 0).agg(**agg_dict).reset_index(drop=True)
 
-def fetch_with_cache(service, site_url, start_date, end_date, dimensions, search_type='web', label=None, max_rows=None):
+    if has_position:
+        mean_position = result_df.pop('mean_position')
+        if 'weighted_position' in result_df.columns:
+            weighted = result_df.pop('weighted_position')
+            impressions = result_df['impressions']
+            result_df['position'] = (weighted / impressions.where(impressions > 0)).fillna(mean_position)
+        else:
+            result_df['position'] = mean_position
+    if 'clicks' in result_df.columns and 'impressions' in result_df.columns:
+        result_df['ctr'] = result_df['clicks'] / result_df['impressions']
+
+    metrics = [col for col in METRIC_COLUMNS if col in result_df.columns]
+    extras = [col for col in result_df.columns if col not in dimensions and col not in metrics]
+    return result_df[dimensions + metrics + extras]
+
+def _derive_chunk(plan, dimensions, max_rows):
+    """Builds a chunk from the cached fragment named in a roll-up plan."""
+    source_df = read_fragment(plan['base_path'])
+    result_df = aggregate_metrics(source_df, dimensions)
+    if 'clicks' in result_df.columns:
+        # Match the API's ordering so max_rows keeps the same rows
+        result_df = result_df.sort_values('clicks', ascending=False, kind='stable').reset_index(drop=True)
+    if max_rows:
+        result_df = result_df.head(max_rows)
+    return result_df
+
+def _get_datastore_path():
+    return os.path.join(CACHE_DIR, datastore.DATASTORE_FILENAME)
+
+def prune_datastore(site_url=None):
+    """
+    Removes fragments from the analytical store whose cached data no longer
+    exists (e.g. deleted by the cache utilities). Returns the number removed.
+    """
+    db_path = _get_datastore_path()
+    if not os.path.exists(db_path):
+        return 0
+    catalogue = datastore.list_fragments(db_path, site_url)
+    stale = [
+        row.cache_key for row in catalogue.itertuples()
+        if not fragment_exists(os.path.join(CACHE_DIR, get_property_name(row.site_url), row.cache_key))
+    ]
+    datastore.remove_fragments(db_path, stale)
+    return len(stale)
+
+def _sync_datastore(site_url, dimensions, search_type, chunk_keys):
+    """
+    Copies cached fragments which are new or have changed since they were last
+    loaded into the analytical store, and prunes deleted ones. Failures are
+    reported but never fail the query, as the fragments remain the source of truth.
+    """
+    if not datastore.DATASTORE_ENABLED:
+        return
+    db_path = _get_datastore_path()
+    try:
+        prune_datastore(site_url)
+        loaded = datastore.get_loaded_fingerprints(db_path, [key for key, _, _, _ in chunk_keys])
+        for cache_key, base_path, s_str, e_str in chunk_keys:
+            if not fragment_exists(base_path):
+                continue
+            fingerprint = get_fragments_fingerprint([base_path])
+            if fingerprint is not None and loaded.get(cache_key) == fingerprint:
+                continue
+            df = read_fragment(base_path, columns=list(dimensions) + ['clicks', 'impressions', 'position'])
+            datastore.load_fragment(db_path, df, cache_key, site_url, s_str, e_str, dimensions, search_type, fingerprint)
+    except Exception as e:
+        print(f"  - Could not update the local data store: {e}")
+
+def fetch_with_cache(service, site_url, start_date, end_date, dimensions, search_type='web', label=None, max_rows=None, max_workers=None, load=True, allow_approximate=False):
     """
     Fetches GSC data, using monthly fragmentation for the cache.
     Reassembles data from multiple months if necessary.
+    Missing months are rolled up from a cached fragment with more dimensions when
+    that is exact, and otherwise fetched concurrently (max_workers, default
+    GSC_FETCH_WORKERS). With allow_approximate=True inexact roll-ups are used
+    too; they are never cached and the result has attrs['approximate'] set.
+    With load=False the cache is only primed and None is returned, so no
+    month is ever held in memory (used by the cache warmer).
     """
-    chunks = _get_monthly_chunks(start_date, end_date)
-    all_dfs = []
+    chunks = _get_fragment_chunks(start_date, end_date)
+    chunk_paths = []
+    pending = []
+    approximated = {}
+    fragment_index = None
     
     property_name = get_property_name(site_url)
     total_chunks = len(chunks)
@@ -139,73 +782,183 @@ def fetch_with_cache(service, site_url, start_date, end_date, dimensions, search
         month_label = chunk_start.strftime('%B %Y')
         
         # Create a unique key for this specific month/request
-        dims = sorted(dimensions)
-        standardised_url = site_url.rstrip('/')
-        cache_key_content = f"{standardised_url}|{s_str}|{e_str}|{','.join(dims)}|{search_type}"
-        cache_key = hashlib.md5(cache_key_content.encode()).hexdigest()
+        cache_key = _get_cache_key(site_url, s_str, e_str, dimensions, search_type)
         
-        csv_path, json_path = _get_cache_paths(cache_key, site_url)
+        base_path, json_path = _get_cache_paths(cache_key, site_url)
         
         if is_full_month(chunk_start, chunk_end):
             date_label = month_label
+        elif chunk_start == chunk_end:
+            date_label = s_str
         else:
             date_label = f"{s_str} to {e_str}"
         
         # If a label is provided, prepend it to the date_label
         full_label = f"{label} {date_label}" if label else date_label
+        log_prefix = f"  - [{i+1}/{total_chunks}] {property_name} {full_label}"
         
-        if os.path.exists(csv_path):
-            print(f"  - [{i+1}/{total_chunks}] {property_name} {full_label}: Using cached data: {cache_key}.")
-            chunk_df = pd.read_csv(csv_path)
-            all_dfs.append(chunk_df)
-        else:
-            print(f"  - [{i+1}/{total_chunks}] {property_name} {full_label}: Fetching from GSC API: {cache_key}.")
-            chunk_df = _fetch_from_api(service, site_url, s_str, e_str, dimensions, search_type, max_rows=max_rows)
+        chunk_paths.append(base_path)
+        fetch_args = (service, site_url, s_str, e_str, dimensions, search_type, max_rows, base_path, json_path, log_prefix)
+        metadata = _read_metadata(json_path) if fragment_exists(base_path) else None
+        if metadata is not None:
+            freshness = get_freshness(metadata)
+            # The cache warmer refreshes synchronously, as nothing waits on the result
+            if freshness == 'stale' and load and BACKGROUND_REFRESH:
+                print(f"{log_prefix}: Using cached data, refreshing in the background: {cache_key}.")
+                metrics.record('cache_hit', site_url, key=cache_key, source='fragment', freshness=freshness)
+                _refresh_in_background(fetch_args)
+            elif freshness in ('stale', 'expired'):
+                print(f"{log_prefix}: Refreshing cached data fetched before GSC finalised it: {cache_key}.")
+                metrics.record('cache_miss', site_url, key=cache_key, reason=freshness)
+                pending.append(fetch_args)
+            else:
+                print(f"{log_prefix}: Using cached data: {cache_key}.")
+                metrics.record('cache_hit', site_url, key=cache_key, source='fragment', freshness=freshness)
+            continue
+        miss_reason = 'missing'
+        if fragment_exists(base_path):
+            # The sidecar is written last, so the data file was left by an interrupted commit
+            print(f"{log_prefix}: Ignoring cached data without metadata (interrupted write): {cache_key}.")
+            miss_reason = 'orphaned'
+
+        if DAILY_FRAGMENTS_ENABLED and is_full_month(chunk_start, chunk_end):
+            merged_df = _merge_daily_chunk(site_url, chunk_start, chunk_end, dimensions, search_type, max_rows)
+            if merged_df is not None and not merged_df.empty:
+                _commit_fragment(merged_df, base_path, json_path, site_url, s_str, e_str, dimensions, search_type, max_rows, derived_from='daily')
+                print(f"{log_prefix}: Merged from cached daily data.")
+                metrics.record('cache_hit', site_url, key=cache_key, source='daily')
+                continue
+
+        plan = None
+        if ROLLUP_ENABLED:
+            if fragment_index is None:
+                fragment_index = _load_fragment_index(site_url)
+            plan = _plan_rollup(fragment_index, site_url, s_str, e_str, dimensions, search_type)
+        source_key = os.path.basename(plan['base_path']) if plan else None
+        if plan and plan['exact']:
+            chunk_df = _derive_chunk(plan, dimensions, max_rows)
             if not chunk_df.empty:
-                chunk_df.to_csv(csv_path, index=False)
-                metadata = {
-                    'site_url': site_url,
-                    'start_date': s_str,
-                    'end_date': e_str,
-                    'dimensions': dimensions,
-                    'search_type': search_type,
-                    'fetched_at': datetime.now().isoformat()
-                }
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(metadata, f, indent=4)
-                all_dfs.append(chunk_df)
+                # A roll-up is exactly as fresh as its source
+                source_fetched_at = plan['metadata'].get('fetched_at', datetime.now().isoformat())
+                _commit_fragment(chunk_df, base_path, json_path, site_url, s_str, e_str, dimensions, search_type, max_rows, derived_from=source_key, fetched_at=source_fetched_at)
+            print(f"{log_prefix}: Rolled up from cached data: {source_key}.")
+            metrics.record('cache_hit', site_url, key=cache_key, source='rollup')
+        elif plan and allow_approximate and load:
+            approximated[base_path] = _derive_chunk(plan, dimensions, max_rows)
+            print(f"{log_prefix}: Approximated from cached data: {source_key} ({', '.join(plan['reasons'])}).")
+            metrics.record('cache_hit', site_url, key=cache_key, source='approximate')
+        else:
+            metrics.record('cache_miss', site_url, key=cache_key, reason=miss_reason)
+            pending.append(fetch_args)
+
+    workers = min(max_workers or FETCH_WORKERS, len(pending))
+    if workers > 1:
+        cancel_event = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gsc-fetch')
+        try:
+            for future in [pool.submit(_fetch_chunk, *fetch_args, cancel_event) for fetch_args in pending]:
+                future.result()
+        except KeyboardInterrupt:
+            # Let in-flight workers checkpoint their current page, then stop
+            print("  - Interrupted. Stopping fetch workers after their current page...")
+            cancel_event.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=True)
+    else:
+        for fetch_args in pending:
+            _fetch_chunk(*fetch_args)
+
+    if not load:
+        return None
+
+    # Serve repeated requests from the memo while none of the fragments have changed.
+    # Approximated results are not memoised, as the memo key only describes the request
+    memo_dir = os.path.join(CACHE_DIR, property_name, 'memo')
+    memo_key = get_memo_key(site_url, str(start_date), str(end_date), dimensions, search_type)
+    fingerprint = get_fragments_fingerprint(chunk_paths) if not approximated else None
+    memo_df = memo_get(memo_dir, memo_key, fingerprint)
+    if memo_df is not None:
+        print(f"  - {property_name}: Using memoised result: {memo_key}.")
+        metrics.record('memo_hit', site_url, key=memo_key, rows=len(memo_df))
+        return memo_df
+
+    # Reassemble in chronological order. CTR is recalculated after aggregation so it is not read back
+    columns = list(dimensions) + ['clicks', 'impressions', 'position']
+    all_dfs = []
+    for base_path in chunk_paths:
+        if base_path in approximated:
+            chunk_df = approximated[base_path]
+            all_dfs.append(chunk_df[[c for c in columns if c in chunk_df.columns]])
+        elif fragment_exists(base_path):
+            chunk_df = read_fragment(base_path, columns=columns)
+            _record_fragment_io('fragment_read', site_url, base_path, len(chunk_df))
+            all_dfs.append(chunk_df)
+    all_dfs = [df for df in all_dfs if not df.empty]
 
     if not all_dfs:
         return pd.DataFrame()
         
-    # Combine all months
+    # Combine all months, weighting position by impressions
     combined_df = pd.concat(all_dfs, ignore_index=True)
-    
-    # Aggregate across months
-    agg_dict = {}
-    if 'clicks' in combined_df.columns:
-        agg_dict['clicks'] = 'sum'
-    if 'impressions' in combined_df.columns:
-        agg_dict['impressions'] = 'sum'
-    
-    # Only include 'position' if it exists in the data (Discover data doesn't have it)
-    if 'position' in combined_df.columns:
-        agg_dict['position'] = 'mean'
-    
-    if not agg_dict:
+    if not any(col in combined_df.columns for col in ['clicks', 'impressions', 'position']):
         return pd.DataFrame()
+    result_df = aggregate_metrics(combined_df, dimensions)
 
-    # Keep all dimensions in groupby
-    if dimensions:
-        result_df = combined_df.groupby(dimensions).agg(agg_dict).reset_index()
-    else:
-        # If no dimensions, aggregate everything into a single row
-        result_df = pd.DataFrame([combined_df.agg(agg_dict)])
-    
-    # Recalculate CTR if possible
-    if 'clicks' in result_df.columns and 'impressions' in result_df.columns:
-        result_df['ctr'] = result_df['clicks'] / result_df['impressions']
-        # Sort by clicks as a sensible default
+    # Sort by clicks as a sensible default
+    if 'clicks' in result_df.columns:
         result_df = result_df.sort_values('clicks', ascending=False)
-    
+
+    if approximated:
+        result_df.attrs['approximate'] = True
+    # A single-chunk result is about the size of its fragment, so only keep it in memory
+    memo_put(memo_dir, memo_key, fingerprint, result_df, persist=len(chunk_paths) > 1)
     return result_df
+
+def query_cache(service, site_url, start_date, end_date, dimensions, search_type='web', group_by=None, filters=None, by_month=False, max_rows=None):
+    """
+    Aggregates cached data over a date range in one pass, priming the cache first.
+    Filters and grouping are pushed down to the local data store (core.datastore);
+    if the store is unavailable the fragments are read and aggregated in pandas
+    with the same semantics. group_by defaults to dimensions, by_month adds a
+    'month' column and filters maps a column to a value or list of values.
+    """
+    # Priming never holds more than one month in memory, and neither does loading the store
+    fetch_with_cache(service, site_url, start_date, end_date, dimensions, search_type, max_rows=max_rows, load=False)
+    chunk_keys = []
+    for chunk_start, chunk_end in _get_fragment_chunks(start_date, end_date):
+        s_str = chunk_start.strftime('%Y-%m-%d')
+        e_str = chunk_end.strftime('%Y-%m-%d')
+        cache_key = _get_cache_key(site_url, s_str, e_str, dimensions, search_type)
+        base_path, _ = _get_cache_paths(cache_key, site_url)
+        # Months without data have no fragment
+        if fragment_exists(base_path):
+            chunk_keys.append((cache_key, base_path, s_str, e_str))
+    if not chunk_keys:
+        return pd.DataFrame()
+    group_by = list(dimensions if group_by is None else group_by)
+
+    if datastore.DATASTORE_ENABLED:
+        _sync_datastore(site_url, dimensions, search_type, chunk_keys)
+        try:
+            result_df = datastore.query_metrics(_get_datastore_path(), [key for key, _, _, _ in chunk_keys], site_url, dimensions, search_type, group_by, filters, by_month)
+            if result_df is not None:
+                return result_df
+        except Exception as e:
+            print(f"  - Could not query the local data store, reading fragments instead: {e}")
+
+    frames = []
+    for _, base_path, s_str, _ in chunk_keys:
+        df = read_fragment(base_path)
+        if df.empty:
+            continue
+        for col, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            df = df[df[col].isin(values)]
+        if by_month:
+            df = df.assign(month=s_str[:7])
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    return aggregate_metrics(pd.concat(frames, ignore_index=True), (['month'] if by_month else []) + group_by)
@@ -2,22 +2,72 @@
 Core client and authentication logic for GSC Exporter.
 """
 import os
-import socket
+import threading
+import google_auth_httplib2
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
 from google.auth import exceptions
-
-# Set global timeout for API requests
-socket.setdefaulttimeout(300)
+from core.transport import PooledHttp, use_pooled_transport, build_httplib2
 
 SCOPES = ['https://www.googleapis.com/auth/webmasters.readonly']
 CLIENT_SECRET_FILE = 'config/client_secret.json'
 TOKEN_FILE = 'config/token.json'
 
-def get_gsc_service():
-    """Authenticates and returns a Google Search Console service object."""
+API_NAME = 'searchconsole'
+API_VERSION = 'v1'
+
+# Service returned by get_gsc_service() when set (see set_shared_service)
+_shared_service = None
+
+_credentials = None
+_credentials_lock = threading.Lock()
+_discovery_document = None
+_pooled_http = None
+# Not _service_lock, which get_gsc_service() holds while building the service
+_pooled_http_lock = threading.Lock()
+_service = None
+_service_lock = threading.Lock()
+_thread_local = threading.local()
+
+def set_shared_service(service):
+    """
+    Makes get_gsc_service() return an existing service, so reports run
+    in-process by a batch runner reuse one authenticated client. Pass None to reset.
+    """
+    global _shared_service
+    _shared_service = service
+
+def _save_credentials(creds):
+    # Write then rename, as other processes may be loading the token at the same time
+    tmp_path = f"{TOKEN_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as token:
+        token.write(creds.to_json())
+    os.replace(tmp_path, TOKEN_FILE)
+
+def _lock_refresh(creds):
+    """
+    Serialises token refreshes on credentials shared between threads. A thread
+    that waited for the lock skips the refresh if another thread already did it.
+    """
+    refresh = creds.refresh
+
+    def locked_refresh(request):
+        with _credentials_lock:
+            if creds.valid:
+                return
+            refresh(request)
+            try:
+                _save_credentials(creds)
+            except OSError:
+                pass
+
+    creds.refresh = locked_refresh
+    return creds
+
+def _load_credentials():
+    """Loads, refreshes or (interactively) obtains credentials."""
     creds = None
     if os.path.exists(TOKEN_FILE):
         try:
@@ -46,11 +96,100 @@ def get_gsc_service():
             flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRET_FILE, SCOPES)
             creds = flow.run_local_server(port=0)
         
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
-            print("Authentication successful. Credentials saved.")
+        _save_credentials(creds)
+        print("Authentication successful. Credentials saved.")
+
+    return creds
+
+def get_credentials():
+    """Returns the process-wide credentials, loading them on first use."""
+    global _credentials
+    with _service_lock:
+        if _credentials is None:
+            _credentials = _lock_refresh(_load_credentials())
+        return _credentials
+
+def _get_discovery_document():
+    """
+    Returns the Search Console discovery document, read once per process from
+    the copy bundled with googleapiclient rather than fetched from Google.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        from googleapiclient.discovery_cache import get_static_doc
+        _discovery_document = get_static_doc(API_NAME, API_VERSION)
+    return _discovery_document
+
+def _get_http(creds):
+    """
+    Returns the HTTP transport for a new service: the process-wide pooled
+    session where available, otherwise a new httplib2 connection.
+    """
+    global _pooled_http
+    if use_pooled_transport():
+        with _pooled_http_lock:
+            if _pooled_http is None:
+                _pooled_http = PooledHttp(creds)
+            return _pooled_http
+    return google_auth_httplib2.AuthorizedHttp(creds, http=build_httplib2())
+
+def _build_service(creds):
+    http = _get_http(creds)
+    document = _get_discovery_document()
+    if document is None:
+        return build(API_NAME, API_VERSION, http=http, cache_discovery=False)
+    return build_from_document(document, http=http)
+
+def get_gsc_service():
+    """
+    Authenticates and returns a Google Search Console service object.
+    The service is built once per process. Its HTTP connection must not be used
+    from several threads at once: threads should call get_thread_service(), or
+    pass get_thread_http(service) to execute().
+    """
+    global _service
+    if _shared_service is not None:
+        return _shared_service
+    if _service is None:
+        creds = get_credentials()
+        with _service_lock:
+            if _service is None:
+                _service = _build_service(creds)
+    return _service
+
+def get_thread_service():
+    """
+    Returns a service object private to the calling thread. Every thread shares
+    the same credentials (refreshed under a lock) and discovery document. With
+    the pooled transport threads also share one connection pool, otherwise each
+    thread gets its own httplib2 connection.
+    """
+    service = getattr(_thread_local, 'service', None)
+    if service is None:
+        service = _thread_local.service = _build_service(get_credentials())
+    return service
+
+def get_thread_http(service):
+    """
+    Returns an authorised HTTP connection private to the calling thread.
+    httplib2 connections are not thread-safe, so concurrent fetches must not
+    share the connection held by the service object. Returns None when the
+    service was not built with google-auth credentials (e.g. in tests).
+    The pooled transport is thread-safe, so it is returned as is.
+    """
+    service_http = getattr(service, '_http', None)
+    if isinstance(service_http, PooledHttp):
+        return service_http
+    if not isinstance(service_http, google_auth_httplib2.AuthorizedHttp):
+        return None
 
-    return build('searchconsole', 'v1', credentials=creds)
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    key = id(service_http.credentials)
+    if key not in connections:
+        connections[key] = google_auth_httplib2.AuthorizedHttp(service_http.credentials, http=build_httplib2())
+    return connections[key]
 
 def get_available_properties(service):
     """Fetches all sites (properties) from the GSC API."""
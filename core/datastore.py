@@ -0,0 +1,208 @@
+"""
+Local analytical store for cached GSC data.
+Fragments aggregated through core.cache.query_cache are copied into an embedded
+SQLite database, with one table per (property, search type, dimension set).
+Rows carry the chunk they came from, so a month is a partition that can be
+replaced as a whole, and tables are indexed on date, page and query. Reports
+can push filters and aggregations down to a single grouped query instead of
+loading one DataFrame per month. The fragments remain the source of truth:
+the store can be deleted at any time and is rebuilt by the next query, and
+partitions whose fragment has been deleted are pruned.
+"""
+import os
+import re
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+import pandas as pd
+
+DATASTORE_ENABLED = os.environ.get('GSC_DATASTORE', '1') != '0'
+DATASTORE_FILENAME = 'gsc-store.sqlite'
+
+# Columns worth an index, as reports filter and group on them
+INDEXED_COLUMNS = ['date', 'page', 'query']
+
+_IDENTIFIER = re.compile(r'^[A-Za-z][A-Za-z0-9_]*$')
+
+def _quote(column):
+    """Quotes a column name, rejecting anything that is not a plain GSC dimension or metric."""
+    if not _IDENTIFIER.match(column):
+        raise ValueError(f"Invalid column name: {column!r}")
+    return f'"{column}"'
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    # WAL lets report processes read while another process is loading fragments
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS datasets (
+            table_name TEXT PRIMARY KEY,
+            site_url TEXT NOT NULL,
+            search_type TEXT NOT NULL,
+            dimensions TEXT NOT NULL
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fragments (
+            cache_key TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            site_url TEXT NOT NULL,
+            search_type TEXT NOT NULL,
+            dimensions TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            fingerprint TEXT,
+            loaded_at TEXT NOT NULL
+        )''')
+    return conn
+
+def get_table_name(site_url, dimensions, search_type):
+    """Returns the table holding a (property, search type, dimension set)."""
+    content = f"{site_url.rstrip('/')}|{','.join(sorted(dimensions))}|{search_type}"
+    return 't_' + hashlib.md5(content.encode()).hexdigest()[:16]
+
+def _ensure_table(conn, site_url, dimensions, search_type):
+    table_name = get_table_name(site_url, dimensions, search_type)
+    dims = sorted(dimensions)
+    columns = ['cache_key TEXT NOT NULL', 'chunk_start TEXT NOT NULL', 'chunk_end TEXT NOT NULL']
+    columns += [f"{_quote(dim)} TEXT" for dim in dims]
+    columns += ['clicks REAL', 'impressions REAL', 'position REAL']
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({', '.join(columns)})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_chunk ON {table_name} (chunk_start, chunk_end)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_key ON {table_name} (cache_key)")
+    for dim in dims:
+        if dim in INDEXED_COLUMNS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_{dim} ON {table_name} ({_quote(dim)})")
+    conn.execute(
+        'INSERT OR IGNORE INTO datasets (table_name, site_url, search_type, dimensions) VALUES (?, ?, ?, ?)',
+        (table_name, site_url, search_type, json.dumps(dims))
+    )
+    return table_name
+
+def get_loaded_fingerprints(db_path, cache_keys):
+    """Returns {cache_key: fingerprint} for the given fragments that are already in the store."""
+    if not cache_keys or not os.path.exists(db_path):
+        return {}
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            f"SELECT cache_key, fingerprint FROM fragments WHERE cache_key IN ({', '.join('?' * len(cache_keys))})",
+            list(cache_keys)
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+def load_fragment(db_path, df, cache_key, site_url, start_date, end_date, dimensions, search_type, fingerprint):
+    """Replaces the partition for one fragment with its rows, in a single transaction."""
+    dims = sorted(dimensions)
+    data = pd.DataFrame({dim: df[dim].astype(str) for dim in dims}, index=df.index)
+    for col in ['clicks', 'impressions', 'position']:
+        data[col] = df[col] if col in df.columns else None
+    data.insert(0, 'chunk_end', end_date)
+    data.insert(0, 'chunk_start', start_date)
+    data.insert(0, 'cache_key', cache_key)
+
+    conn = _connect(db_path)
+    try:
+        with conn:
+            table_name = _ensure_table(conn, site_url, dims, search_type)
+            conn.execute(f"DELETE FROM {table_name} WHERE cache_key = ?", (cache_key,))
+            placeholders = ', '.join('?' * len(data.columns))
+            column_list = ', '.join(_quote(c) for c in data.columns)
+            conn.executemany(
+                f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})",
+                data.astype(object).where(data.notna(), None).itertuples(index=False, name=None)
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO fragments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (cache_key, table_name, site_url, search_type, json.dumps(dims), start_date, end_date,
+                 len(data), fingerprint, datetime.now().isoformat())
+            )
+    finally:
+        conn.close()
+
+def remove_fragments(db_path, cache_keys):
+    """Deletes the partitions and catalogue entries of the given fragments."""
+    if not cache_keys or not os.path.exists(db_path):
+        return
+    conn = _connect(db_path)
+    try:
+        with conn:
+            for cache_key in cache_keys:
+                row = conn.execute('SELECT table_name FROM fragments WHERE cache_key = ?', (cache_key,)).fetchone()
+                if row:
+                    conn.execute(f"DELETE FROM {row[0]} WHERE cache_key = ?", (cache_key,))
+                conn.execute('DELETE FROM fragments WHERE cache_key = ?', (cache_key,))
+    finally:
+        conn.close()
+
+def query_metrics(db_path, cache_keys, site_url, dimensions, search_type='web', group_by=None, filters=None, by_month=False):
+    """
+    Aggregates the stored rows of the given fragments in one grouped query.
+    group_by defaults to the fragment dimensions; by_month adds a 'month'
+    column (YYYY-MM of each chunk). filters maps a column to a value or a list
+    of values. Position is weighted by impressions and CTR is recalculated,
+    matching core.cache.aggregate_metrics. Returns None if any fragment is not
+    in the store, so the caller can fall back to reading the fragments.
+    """
+    if not cache_keys or not os.path.exists(db_path):
+        return None
+    table_name = get_table_name(site_url, dimensions, search_type)
+    group_by = list(dimensions if group_by is None else group_by)
+    filters = filters or {}
+
+    conn = _connect(db_path)
+    try:
+        key_placeholders = ', '.join('?' * len(cache_keys))
+        loaded = conn.execute(
+            f"SELECT COUNT(*) FROM fragments WHERE table_name = ? AND cache_key IN ({key_placeholders})",
+            [table_name] + list(cache_keys)
+        ).fetchone()[0]
+        if loaded != len(set(cache_keys)):
+            return None
+
+        select = [_quote(col) for col in group_by]
+        group = list(select)
+        if by_month:
+            select.insert(0, 'substr(chunk_start, 1, 7) AS month')
+            group.insert(0, 'month')
+        where = [f"cache_key IN ({key_placeholders})"]
+        params = list(cache_keys)
+        for col, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            where.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        select += [
+            'SUM(clicks) AS clicks',
+            'SUM(impressions) AS impressions',
+            # Fall back to the plain mean for groups without impressions
+            'COALESCE(SUM(position * impressions) / NULLIF(SUM(impressions), 0), AVG(position)) AS position'
+        ]
+        sql = f"SELECT {', '.join(select)} FROM {table_name} WHERE {' AND '.join(where)}"
+        if group:
+            sql += f" GROUP BY {', '.join(group)}"
+        result_df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+    result_df['ctr'] = result_df['clicks'] / result_df['impressions']
+    leading = (['month'] if by_month else []) + group_by
+    return result_df[leading + ['clicks', 'impressions', 'ctr', 'position']]
+
+def list_fragments(db_path, site_url=None):
+    """Returns the catalogue of stored fragments, optionally for a single property."""
+    if not os.path.exists(db_path):
+        return pd.DataFrame()
+    conn = _connect(db_path)
+    try:
+        sql = 'SELECT * FROM fragments'
+        params = []
+        if site_url:
+            sql += ' WHERE site_url = ?'
+            params.append(site_url)
+        return pd.read_sql_query(sql + ' ORDER BY site_url, start_date', conn, params=params)
+    finally:
+        conn.close()
@@ -0,0 +1,84 @@
+"""
+Formatting of GSC metrics for report tables.
+Columns are formatted whole rather than one cell at a time: each distinct
+value is formatted once and the results are broadcast back to the rows, so
+columns such as clicks and impressions (which repeat the same values many
+times) cost a fraction of a per-cell apply. Reports declare how their
+columns are shown with a column spec ({column: kind}), or rely on
+METRIC_COLUMNS for the standard GSC metrics, and format a table in one call.
+"""
+import numpy as np
+import pandas as pd
+
+# Kinds of column and the format applied to their values
+NUMBER_FORMATS = {
+    'int': '{:,.0f}',
+    'percent': '{:.2%}',
+    'decimal': '{:.2f}',
+    'number': '{:,.2f}',
+}
+
+# Kinds of cell that are right-aligned in tables
+NUMERIC_KINDS = tuple(NUMBER_FORMATS)
+
+# How the standard GSC metric columns are shown
+METRIC_COLUMNS = {
+    'clicks': 'int',
+    'impressions': 'int',
+    'ctr': 'percent',
+    'position': 'decimal',
+    'queries': 'int',
+    'pages': 'int',
+}
+
+_HTML_ENTITIES = [('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;')]
+
+def escape_html(values):
+    """HTML-escapes a column of values (as html.escape does for one string)."""
+    values = pd.Series(values).astype(str)
+    for char, entity in _HTML_ENTITIES:
+        values = values.str.replace(char, entity, regex=False)
+    return values
+
+def _format_distinct(values, fmt, na_rep):
+    """Formats each distinct value once and broadcasts the results back to the column."""
+    codes, uniques = pd.factorize(values)
+    # Missing values have code -1, which picks the trailing na_rep
+    formatted = np.array(list(map(fmt.format, uniques.tolist())) + [na_rep], dtype=object)
+    return pd.Series(formatted[codes], index=values.index)
+
+def format_column(values, kind, na_rep='-', fill_value=None):
+    """
+    Formats a column for display. kind is one of NUMBER_FORMATS ('int' with
+    thousands separators, 'percent', 'decimal' or 'number' with two decimal
+    places), a format string such as '{:+.1f}', or 'link', 'code' or 'text'
+    for escaped text (a link to the value, in <code> or plain).
+    Missing or non-numeric values are shown as fill_value when it is given
+    and as na_rep otherwise.
+    """
+    values = pd.Series(values)
+    if kind in ('link', 'code', 'text'):
+        escaped = escape_html(values)
+        if kind == 'link':
+            return '<a href="' + escaped + '" target="_blank" class="text-break">' + escaped + '</a>'
+        if kind == 'code':
+            return '<code>' + escaped + '</code>'
+        return escaped
+    numbers = pd.to_numeric(values, errors='coerce')
+    if fill_value is not None:
+        numbers = numbers.fillna(fill_value)
+    return _format_distinct(numbers.astype(float), NUMBER_FORMATS.get(kind, kind), na_rep)
+
+def format_table(df, columns=None, na_rep='-', fill_value=None):
+    """
+    Returns a copy of df with its columns formatted for display in one pass.
+    columns maps column names to kinds (see format_column); by default the
+    standard metric columns in METRIC_COLUMNS are formatted. Columns missing
+    from df are skipped, so one spec can serve tables with optional columns.
+    """
+    columns = METRIC_COLUMNS if columns is None else columns
+    df = df.copy()
+    for column, kind in columns.items():
+        if column in df.columns:
+            df[column] = format_column(df[column], kind, na_rep, fill_value)
+    return df
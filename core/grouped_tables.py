@@ -0,0 +1,99 @@
+"""
+Rendering of grouped tables in the HTML reports: one summary row per group
+(e.g. a query) which expands to a table of its top detail rows (e.g. the
+pages ranking for it).
+The detail rows of every group are selected in a single pass over the data
+instead of filtering the whole frame once per group, cells are formatted a
+column at a time (see core/formatting.py), and the markup comes from
+compiled Jinja2 templates in templates/ (grouped-accordion.html and
+collapsible-table-rows.html).
+"""
+import os
+import numpy as np
+import pandas as pd
+from jinja2 import Environment, FileSystemLoader
+from core.formatting import NUMERIC_KINDS, escape_html, format_column
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+# Values are escaped as they are formatted, so the templates do not escape again
+_environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), trim_blocks=True, lstrip_blocks=True)
+
+def _select_groups(detail, group_col, keys, limit=None):
+    """Returns the rows of detail for keys, grouped in the order of keys, and the group boundaries."""
+    keys = pd.Index(keys)
+    codes = keys.get_indexer(detail[group_col])
+    matched = codes >= 0
+    # A stable sort on the key position groups the rows without reordering them
+    order = np.flatnonzero(matched)[np.argsort(codes[matched], kind='stable')]
+    codes = codes[order]
+    bounds = np.searchsorted(codes, np.arange(len(keys) + 1))
+    if limit is not None:
+        keep = np.arange(len(codes)) - bounds[codes] < limit
+        order, codes = order[keep], codes[keep]
+        bounds = np.searchsorted(codes, np.arange(len(keys) + 1))
+    return detail.iloc[order], bounds
+
+def split_groups(detail, group_col, keys, limit=None):
+    """
+    Returns the rows of `detail` belonging to each of `keys` (unique values
+    of group_col), as a list of frames in the order of keys. Rows keep their
+    order within a group and at most `limit` are kept per group.
+    """
+    selected, bounds = _select_groups(detail, group_col, keys, limit)
+    return [selected.iloc[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+def _rows_html(frame, columns):
+    """Builds the <tr> markup of every row of frame at once."""
+    rows = np.full(len(frame), '<tr>', dtype=object)
+    for column, kind in columns:
+        cell = '<td class="text-end">' if kind in NUMERIC_KINDS else '<td>'
+        rows = rows + cell + format_column(frame[column], kind).to_numpy(dtype=object) + '</td>'
+    return (rows + '</tr>').tolist()
+
+def build_groups(summary, detail, group_col, detail_columns, limit=None, summary_formats=None):
+    """
+    Pairs each row of `summary` (one per group, in display order) with its
+    first `limit` rows of `detail`, matched on group_col.
+    detail_columns lists the (column, kind) cells of the detail table, and
+    summary_formats maps summary columns to the kind they are shown as (see
+    format_column). Returns a list of dicts holding the formatted summary
+    values, 'key' (the group value), 'label' (the escaped group value),
+    'rows' (the detail table body), 'count' (number of detail rows) and
+    'detail' (the detail rows themselves).
+    """
+    summary = summary.reset_index(drop=True)
+    selected, bounds = _select_groups(detail, group_col, summary[group_col], limit)
+    # The detail rows of all groups are formatted together, then each group takes its slice
+    rows = _rows_html(selected, detail_columns)
+    formatted = {column: format_column(summary[column], kind).tolist() for column, kind in (summary_formats or {}).items()}
+    labels = escape_html(summary[group_col]).tolist()
+
+    groups = []
+    for i, key in enumerate(summary[group_col]):
+        start, end = bounds[i], bounds[i + 1]
+        group = {column: values[i] for column, values in formatted.items()}
+        group.update({
+            'key': key,
+            'label': labels[i],
+            'rows': ''.join(rows[start:end]),
+            'count': end - start,
+            'detail': selected.iloc[start:end]
+        })
+        groups.append(group)
+    return groups
+
+def spread_top_rows(detail, group_col, columns, n):
+    """
+    Returns one row per group with the first n detail rows of the group side
+    by side, as columns (column, rank) for rank 1 to n. Groups with fewer rows
+    have missing values in the remaining ranks.
+    """
+    top = detail.groupby(group_col, sort=False).head(n)
+    top = top.assign(_rank=top.groupby(group_col, sort=False).cumcount() + 1)
+    wide = top.pivot(index=group_col, columns='_rank', values=columns)
+    return wide.reindex(columns=pd.MultiIndex.from_product([columns, range(1, n + 1)]))
+
+def render_template(name, **context):
+    """Renders a template from templates/, compiling it once per process."""
+    return _environment.get_template(name).render(**context)
@@ -0,0 +1,195 @@
+"""
+Batch engine for the URL Inspection API.
+URLs are inspected concurrently within the per-property quotas (600 requests
+per minute and 2,000 per day). Every result is stored as soon as it arrives
+in a local SQLite store (cache/<property>/url-inspection.sqlite) keyed by URL
+and inspection date, together with the number of inspections spent each day.
+Lists larger than the remaining daily quota are deferred and resumed by the
+next run, and URLs inspected within the freshness window are not re-inspected.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from googleapiclient.errors import HttpError
+from core import cache
+from core.naming import get_property_name
+from core.client import get_thread_http
+from core.quota import TokenBucket, is_retryable, backoff_delay, _get_retry_after, RETRY_ATTEMPTS
+
+# Per-property URL Inspection quotas
+INSPECTION_QUERIES_PER_MINUTE = int(os.environ.get('GSC_INSPECTION_QPM_LIMIT', 600))
+INSPECTION_QUERIES_PER_DAY = int(os.environ.get('GSC_INSPECTION_QPD_LIMIT', 2000))
+# Number of inspections in flight at once
+INSPECTION_WORKERS = int(os.environ.get('GSC_INSPECTION_WORKERS', 8))
+# URLs inspected more recently than this are served from the store
+INSPECTION_FRESHNESS_DAYS = float(os.environ.get('GSC_INSPECTION_FRESHNESS_DAYS', 7))
+
+INSPECTION_STORE_FILENAME = 'url-inspection.sqlite'
+
+_minute_budgets = {}
+_minute_budgets_lock = threading.Lock()
+
+def _get_minute_budget(site_url):
+    with _minute_budgets_lock:
+        if site_url not in _minute_budgets:
+            _minute_budgets[site_url] = TokenBucket(INSPECTION_QUERIES_PER_MINUTE)
+        return _minute_budgets[site_url]
+
+def get_store_path(site_url):
+    return os.path.join(cache.CACHE_DIR, get_property_name(site_url), INSPECTION_STORE_FILENAME)
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS inspections (
+            url TEXT NOT NULL,
+            inspection_date TEXT NOT NULL,
+            inspected_at TEXT NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (url, inspection_date)
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_usage (
+            day TEXT PRIMARY KEY,
+            used INTEGER NOT NULL
+        )''')
+    return conn
+
+def load_fresh_results(db_path, urls, freshness_days=INSPECTION_FRESHNESS_DAYS):
+    """Returns {url: inspection result} for URLs inspected within the freshness window."""
+    if not urls or not os.path.exists(db_path) or freshness_days <= 0:
+        return {}
+    cutoff = (datetime.now() - timedelta(days=freshness_days)).isoformat()
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            'SELECT url, result FROM inspections WHERE inspected_at >= ? ORDER BY inspected_at',
+            (cutoff,)
+        ).fetchall()
+    finally:
+        conn.close()
+    wanted = set(urls)
+    # Later rows overwrite earlier ones, so the newest result wins
+    return {url: json.loads(result) for url, result in rows if url in wanted}
+
+def save_result(db_path, url, result):
+    """Stores a successful inspection result under today's date."""
+    now = datetime.now()
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO inspections VALUES (?, ?, ?, ?)',
+                (url, now.strftime('%Y-%m-%d'), now.isoformat(), json.dumps(result))
+            )
+    finally:
+        conn.close()
+
+def reserve_daily_quota(db_path, requested, limit=None):
+    """
+    Reserves up to `requested` inspections from today's quota for the property.
+    The reservation is made in one transaction, so concurrent runs never
+    overspend the shared daily quota. Returns the number reserved.
+    """
+    limit = INSPECTION_QUERIES_PER_DAY if limit is None else limit
+    day = datetime.now().strftime('%Y-%m-%d')
+    conn = _connect(db_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute('SELECT used FROM daily_usage WHERE day = ?', (day,)).fetchone()
+        used = row[0] if row else 0
+        granted = max(0, min(requested, limit - used))
+        conn.execute('INSERT OR REPLACE INTO daily_usage VALUES (?, ?)', (day, used + granted))
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+    return granted
+
+def release_daily_quota(db_path, unused):
+    """Returns reserved but unspent inspections (e.g. after an interruption) to today's quota."""
+    if unused <= 0:
+        return
+    day = datetime.now().strftime('%Y-%m-%d')
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute('UPDATE daily_usage SET used = MAX(0, used - ?) WHERE day = ?', (unused, day))
+    finally:
+        conn.close()
+
+def _inspect(service, site_url, url, minute_budget):
+    """Inspects one URL, retrying throttling and server errors. Returns the result or {'error': ...}."""
+    request = {'inspectionUrl': url, 'siteUrl': site_url, 'languageCode': 'en-US'}
+    attempts = 0
+    while True:
+        minute_budget.acquire()
+        try:
+            response = service.urlInspection().index().inspect(body=request).execute(http=get_thread_http(service))
+            minute_budget.recover()
+            return response.get('inspectionResult') or {'error': 'No inspection data received.'}
+        except HttpError as e:
+            attempts += 1
+            if not is_retryable(e) or attempts >= RETRY_ATTEMPTS:
+                return {'error': str(e)}
+            if e.resp.status == 429:
+                minute_budget.throttle()
+            retry_after = _get_retry_after(e)
+            time.sleep(retry_after if retry_after is not None else backoff_delay(attempts))
+        except Exception as e:
+            return {'error': str(e)}
+
+def inspect_urls(service, site_url, urls, freshness_days=INSPECTION_FRESHNESS_DAYS, workers=None):
+    """
+    Inspects a list of URLs for one property. Returns (results, deferred):
+    results maps every inspected or fresh URL to its inspection result (or an
+    {'error': ...} dict), and deferred lists the URLs left for a later run
+    because today's quota is spent. Failed inspections are not stored, so
+    they are retried by the next run.
+    """
+    db_path = get_store_path(site_url)
+    urls = list(dict.fromkeys(urls))
+    results = load_fresh_results(db_path, urls, freshness_days)
+    if results:
+        print(f"  - {len(results)} of {len(urls)} URLs were inspected within the last {freshness_days:g} days. Using stored results.")
+    pending = [url for url in urls if url not in results]
+
+    granted = reserve_daily_quota(db_path, len(pending)) if pending else 0
+    to_inspect, deferred = pending[:granted], pending[granted:]
+    if deferred:
+        print(f"  - Daily inspection quota reached. {len(deferred)} URLs are deferred; re-run tomorrow to resume.")
+
+    minute_budget = _get_minute_budget(site_url)
+    completed = [0]
+    lock = threading.Lock()
+
+    def inspect_one(url):
+        result = _inspect(service, site_url, url, minute_budget)
+        if 'error' not in result:
+            save_result(db_path, url, result)
+        with lock:
+            completed[0] += 1
+            print(f"  - [{completed[0]}/{len(to_inspect)}] Inspected: {url}")
+        return url, result
+
+    workers = max(1, min(workers or INSPECTION_WORKERS, len(to_inspect) or 1))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gsc-inspect')
+    futures = [pool.submit(inspect_one, url) for url in to_inspect]
+    try:
+        for future in futures:
+            url, result = future.result()
+            results[url] = result
+    except KeyboardInterrupt:
+        print("  - Interrupted. Completed inspections are stored and will be skipped next run.")
+        pool.shutdown(wait=True, cancel_futures=True)
+        release_daily_quota(db_path, sum(1 for f in futures if f.cancelled()))
+        raise
+    finally:
+        pool.shutdown(wait=True)
+
+    return {url: results[url] for url in urls if url in results}, deferred
@@ -0,0 +1,191 @@
+"""
+Consolidated index of cached fragments.
+Every JSON sidecar written by core.cache is also recorded in a small SQLite
+manifest (cache/manifest.sqlite) with its key, property, range, dimensions,
+search type, row count, data file size, checksum and fetched_at, so the cache
+utilities can list fragments without opening every sidecar. The sidecars
+remain the source of truth: a manifest that has never been completed is
+rebuilt from them by a single scan.
+"""
+import os
+import glob
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+from core.naming import get_property_name
+from core.storage import get_fragment_data_files
+
+MANIFEST_FILENAME = 'manifest.sqlite'
+
+def get_manifest_path(cache_dir):
+    return os.path.join(cache_dir, MANIFEST_FILENAME)
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fragments (
+            path TEXT PRIMARY KEY,
+            cache_key TEXT NOT NULL,
+            property TEXT NOT NULL,
+            site_url TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            dimensions TEXT,
+            search_type TEXT,
+            row_count INTEGER,
+            byte_size INTEGER,
+            checksum TEXT,
+            fetched_at TEXT,
+            metadata TEXT,
+            error TEXT
+        )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS fragments_property ON fragments (property)')
+    conn.execute('CREATE TABLE IF NOT EXISTS manifest_info (name TEXT PRIMARY KEY, value TEXT)')
+    return conn
+
+def _file_checksum(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _entry_row(cache_dir, json_path, metadata, error=None, checksum=True):
+    """Returns the manifest row for a sidecar. Checksums are skipped when rebuilding, as they read every file."""
+    base_path = json_path[:-len('.json')]
+    data_files = get_fragment_data_files(base_path)
+    byte_size = sum(os.path.getsize(p) for p in data_files) if data_files else None
+    digest = _file_checksum(data_files[0]) if checksum and data_files else None
+    metadata = metadata if isinstance(metadata, dict) else {}
+    dimensions = metadata.get('dimensions')
+    return (
+        os.path.relpath(base_path, cache_dir),
+        os.path.basename(base_path),
+        os.path.basename(os.path.dirname(base_path)),
+        metadata.get('site_url'),
+        metadata.get('start_date'),
+        metadata.get('end_date'),
+        json.dumps(dimensions) if dimensions is not None else None,
+        metadata.get('search_type'),
+        metadata.get('row_count'),
+        byte_size,
+        digest,
+        metadata.get('fetched_at'),
+        json.dumps(metadata) if metadata else None,
+        error
+    )
+
+def _is_complete(conn):
+    return conn.execute("SELECT 1 FROM manifest_info WHERE name = 'rebuilt_at'").fetchone() is not None
+
+def rebuild_manifest(cache_dir):
+    """
+    Rebuilds the manifest from the JSON sidecars under cache_dir. Sidecars that
+    cannot be read are recorded with an error so the cleaner can report them.
+    Returns the number of fragments recorded.
+    """
+    rows = []
+    for json_path in glob.glob(os.path.join(cache_dir, '**', '*.json'), recursive=True):
+        if os.sep + 'memo' + os.sep in json_path:
+            continue
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            error = None if isinstance(metadata, dict) else 'Metadata is not a JSON object'
+        except (OSError, ValueError) as e:
+            metadata, error = None, f"Corrupted JSON file ({e})"
+        try:
+            rows.append(_entry_row(cache_dir, json_path, metadata, error, checksum=False))
+        except OSError:
+            continue
+
+    conn = _connect(get_manifest_path(cache_dir))
+    try:
+        with conn:
+            conn.execute('DELETE FROM fragments')
+            conn.executemany(f"INSERT OR REPLACE INTO fragments VALUES ({', '.join('?' * 14)})", rows)
+            conn.execute("INSERT OR REPLACE INTO manifest_info VALUES ('rebuilt_at', ?)", (datetime.now().isoformat(),))
+    finally:
+        conn.close()
+    return len(rows)
+
+def record_fragment(cache_dir, json_path, metadata):
+    """Records (or replaces) the manifest entry for a fragment whose sidecar has just been written."""
+    db_path = get_manifest_path(cache_dir)
+    conn = _connect(db_path)
+    try:
+        complete = _is_complete(conn)
+    finally:
+        conn.close()
+    if not complete:
+        # The first write after an upgrade indexes the existing cache as well
+        rebuild_manifest(cache_dir)
+
+    row = _entry_row(cache_dir, json_path, metadata)
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute(f"INSERT OR REPLACE INTO fragments VALUES ({', '.join('?' * 14)})", row)
+    finally:
+        conn.close()
+
+def remove_fragments(cache_dir, json_paths):
+    """Removes the manifest entries for deleted fragments, given their sidecar paths."""
+    db_path = get_manifest_path(cache_dir)
+    if not json_paths or not os.path.exists(db_path):
+        return
+    paths = [os.path.relpath(str(p)[:-len('.json')], cache_dir) for p in json_paths]
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.executemany('DELETE FROM fragments WHERE path = ?', [(p,) for p in paths])
+    finally:
+        conn.close()
+
+def load_manifest(cache_dir, site_url=None):
+    """
+    Returns the manifest entries, optionally for a single property, rebuilding
+    the manifest first if it is missing. Each entry is a dict with base_path,
+    json_path, metadata (None if the sidecar was unreadable), error, byte_size,
+    checksum and the indexed fields.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    db_path = get_manifest_path(cache_dir)
+    conn = _connect(db_path)
+    try:
+        complete = _is_complete(conn)
+    finally:
+        conn.close()
+    if not complete:
+        rebuild_manifest(cache_dir)
+
+    sql = 'SELECT path, cache_key, property, row_count, byte_size, checksum, metadata, error FROM fragments'
+    params = []
+    if site_url:
+        sql += ' WHERE property = ?'
+        params.append(get_property_name(site_url))
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(sql + ' ORDER BY path', params).fetchall()
+    finally:
+        conn.close()
+
+    entries = []
+    for path, cache_key, property_name, row_count, byte_size, checksum, metadata, error in rows:
+        base_path = os.path.join(cache_dir, path)
+        entries.append({
+            'base_path': base_path,
+            'json_path': base_path + '.json',
+            'cache_key': cache_key,
+            'property': property_name,
+            'row_count': row_count,
+            'byte_size': byte_size,
+            'checksum': checksum,
+            'metadata': json.loads(metadata) if metadata else None,
+            'error': error
+        })
+    return entries
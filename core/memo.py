@@ -0,0 +1,144 @@
+"""
+Memo layer for assembled fetch_with_cache results.
+Recently assembled results are kept in memory (LRU, bounded by size) and shared
+between processes through an on-disk store, so repeated requests in a batch
+skip re-reading and re-aggregating the monthly fragments. Every entry carries
+a fingerprint of the fragments it was built from and is ignored once any of
+them changes.
+"""
+import os
+import glob
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from core.storage import read_fragment, write_fragment, find_fragment, get_fragment_data_files
+
+MEMO_ENABLED = os.environ.get('GSC_MEMO', '1') != '0'
+MEMORY_MAX_BYTES = int(os.environ.get('GSC_MEMO_MAX_MB', 512)) * 1024 * 1024
+DISK_MAX_BYTES = int(os.environ.get('GSC_MEMO_DISK_MAX_MB', 2048)) * 1024 * 1024
+
+# Memo metadata is not named .json so the cache utilities never mistake it for fragment metadata
+MEMO_META_EXTENSION = '.memo'
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_lock = threading.Lock()
+
+def get_memo_key(site_url, start_date, end_date, dimensions, search_type):
+    """Returns the memo key for a request. Dimension order is kept as it shapes the result."""
+    content = f"{site_url.rstrip('/')}|{start_date}|{end_date}|{','.join(dimensions)}|{search_type}"
+    return hashlib.md5(content.encode()).hexdigest()
+
+def get_fragments_fingerprint(base_paths):
+    """
+    Returns a fingerprint of the fragment files behind a result (path, mtime and
+    size), or None if they cannot be inspected. Months without data have no file
+    and are recorded as missing, so fetching them later also changes the fingerprint.
+    """
+    entries = []
+    for base_path in base_paths:
+        path, _ = find_fragment(base_path)
+        if path is None:
+            entries.append(f"{base_path}:missing")
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        entries.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+    return hashlib.md5('|'.join(entries).encode()).hexdigest()
+
+def _remember(key, fingerprint, df):
+    """Adds a result to the in-memory LRU, evicting the oldest entries over budget."""
+    global _memory_bytes
+    nbytes = int(df.memory_usage(deep=True).sum())
+    if nbytes > MEMORY_MAX_BYTES:
+        return
+    with _lock:
+        if key in _memory:
+            _memory_bytes -= _memory.pop(key)[2]
+        _memory[key] = (fingerprint, df, nbytes)
+        _memory_bytes += nbytes
+        while _memory_bytes > MEMORY_MAX_BYTES:
+            _, (_, _, evicted_bytes) = _memory.popitem(last=False)
+            _memory_bytes -= evicted_bytes
+
+def memo_get(memo_dir, key, fingerprint):
+    """Returns a copy of the memoised result for key if it matches fingerprint, else None."""
+    if not MEMO_ENABLED or fingerprint is None:
+        return None
+
+    with _lock:
+        entry = _memory.get(key)
+        if entry and entry[0] == fingerprint:
+            _memory.move_to_end(key)
+            return entry[1].copy()
+
+    base_path = os.path.join(memo_dir, key)
+    try:
+        with open(base_path + MEMO_META_EXTENSION, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('fingerprint') != fingerprint:
+        return None
+
+    try:
+        df = read_fragment(base_path)
+    except Exception:
+        return None
+    if df.empty:
+        return None
+    # Touch the entry so disk eviction treats it as recently used
+    for path in get_fragment_data_files(base_path):
+        os.utime(path)
+    _remember(key, fingerprint, df)
+    return df.copy()
+
+def memo_put(memo_dir, key, fingerprint, df, persist=True):
+    """Memoises a result in memory and, if persist is True, in the shared on-disk store."""
+    if not MEMO_ENABLED or fingerprint is None:
+        return
+    _remember(key, fingerprint, df.copy())
+    if not persist or df.empty:
+        return
+
+    os.makedirs(memo_dir, exist_ok=True)
+    base_path = os.path.join(memo_dir, key)
+    try:
+        # Write then rename, as other processes may be reading the shared store
+        tmp_path = write_fragment(df, base_path + '.tmp')
+        os.replace(tmp_path, base_path + os.path.splitext(tmp_path)[1])
+        with open(base_path + MEMO_META_EXTENSION + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint}, f)
+        os.replace(base_path + MEMO_META_EXTENSION + '.tmp', base_path + MEMO_META_EXTENSION)
+    except (OSError, ValueError) as e:
+        print(f"  - Could not persist memo {key}: {e}")
+        return
+    _evict_disk(os.path.dirname(os.path.dirname(memo_dir)))
+
+def _evict_disk(cache_root):
+    """Deletes the least recently used on-disk memo entries once the store exceeds DISK_MAX_BYTES."""
+    entries = []
+    total = 0
+    for meta_path in glob.glob(os.path.join(cache_root, '*', 'memo', '*' + MEMO_META_EXTENSION)):
+        base_path = meta_path[:-len(MEMO_META_EXTENSION)]
+        data_files = get_fragment_data_files(base_path)
+        try:
+            size = sum(os.path.getsize(p) for p in data_files)
+            last_used = max((os.path.getmtime(p) for p in data_files), default=0)
+        except OSError:
+            continue
+        entries.append((last_used, size, meta_path, data_files))
+        total += size
+
+    for _, size, meta_path, data_files in sorted(entries):
+        if total <= DISK_MAX_BYTES:
+            break
+        for path in data_files + [meta_path]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
@@ -0,0 +1,143 @@
+"""
+Structured instrumentation of the cache and the Search Analytics API.
+When GSC_METRICS_FILE is set, cache hits and misses, API calls (with rows and
+latency), retries and the bytes of cached data read and written are appended
+to it as JSON lines, tagged with the property and the report that caused
+them. Several processes can append to the same file, so a batch run points
+every worker at one file and summarises it at the end (see
+run-monthly-reports.py). Without GSC_METRICS_FILE nothing is recorded.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import defaultdict
+
+METRICS_FILE = os.environ.get('GSC_METRICS_FILE')
+
+# Upper bounds (seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 30]
+
+_report = os.environ.get('GSC_METRICS_REPORT')
+_write_lock = threading.Lock()
+
+def set_report(report):
+    """Tags subsequent events with a report name (used by in-process batch workers)."""
+    global _report
+    _report = report
+
+def get_report():
+    return _report or os.path.basename(sys.argv[0]) or None
+
+def is_enabled():
+    return bool(METRICS_FILE)
+
+def record(event, site_url=None, **fields):
+    """Appends one event to the metrics file, if metrics are enabled."""
+    if not METRICS_FILE:
+        return
+    line = {'ts': round(time.time(), 3), 'pid': os.getpid(), 'report': get_report(), 'site_url': site_url, 'event': event}
+    line.update(fields)
+    data = (json.dumps(line) + '\n').encode('utf-8')
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(METRICS_FILE) or '.', exist_ok=True)
+            # A single O_APPEND write per line keeps lines from concurrent processes whole
+            fd = os.open(METRICS_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+    except OSError as e:
+        print(f"  - Could not write metrics to {METRICS_FILE}: {e}")
+
+def load_events(path):
+    """Reads the events from a metrics file, skipping any incomplete line."""
+    events = []
+    if not path or not os.path.exists(path):
+        return events
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarise(events, key='report'):
+    """
+    Aggregates events by 'report' or 'site_url'. Returns {name: totals} where
+    totals has hits, misses, memo_hits, api_calls, rows, bytes_read, bytes_written,
+    api_seconds, throttled, retried, failed and the API call latencies.
+    """
+    totals = defaultdict(lambda: {
+        'hits': 0, 'misses': 0, 'memo_hits': 0, 'api_calls': 0, 'rows': 0, 'bytes_read': 0, 'bytes_written': 0,
+        'api_seconds': 0.0, 'throttled': 0, 'retried': 0, 'failed': 0, 'latencies': []
+    })
+    for event in events:
+        row = totals[event.get(key) or 'unknown']
+        name = event.get('event')
+        if name == 'cache_hit':
+            row['hits'] += 1
+        elif name == 'cache_miss':
+            row['misses'] += 1
+        elif name == 'memo_hit':
+            row['memo_hits'] += 1
+        elif name == 'api_call':
+            row['api_calls'] += 1
+            row['rows'] += event.get('rows', 0)
+            row['api_seconds'] += event.get('latency', 0.0)
+            row['latencies'].append(event.get('latency', 0.0))
+        elif name == 'fragment_read':
+            row['bytes_read'] += event.get('bytes', 0)
+        elif name == 'fragment_write':
+            row['bytes_written'] += event.get('bytes', 0)
+        elif name in ('throttled', 'retried', 'failed'):
+            row[name] += 1
+    return dict(totals)
+
+def latency_histogram(latencies):
+    """Returns [(label, count)] for the LATENCY_BUCKETS."""
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for latency in latencies:
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency < bound), len(LATENCY_BUCKETS))
+        counts[index] += 1
+    labels = [f"<{bound:g}s" for bound in LATENCY_BUCKETS] + [f">={LATENCY_BUCKETS[-1]:g}s"]
+    return list(zip(labels, counts))
+
+def print_metrics_summary(path, top=10):
+    """Prints cache and API cost per report, the costliest properties and the API latency histogram."""
+    events = load_events(path)
+    if not events:
+        return
+    by_report = summarise(events, 'report')
+    print(f"\n{'='*50}")
+    print("Cache and API Summary")
+    print(f"{'='*50}")
+    width = max(len('Report'), max(len(name) for name in by_report))
+    print(f"{'Report':<{width}}  {'Hits':>6}  {'Misses':>6}  {'Hit %':>6}  {'Memo':>5}  {'API calls':>9}  {'Rows':>10}  {'MB read':>8}  {'MB written':>10}  {'API time':>8}")
+    all_latencies = []
+    for name, row in sorted(by_report.items(), key=lambda item: (-item[1]['api_calls'], item[0])):
+        lookups = row['hits'] + row['misses']
+        hit_rate = f"{100 * row['hits'] / lookups:.0f}%" if lookups else '-'
+        print(f"{name:<{width}}  {row['hits']:>6}  {row['misses']:>6}  {hit_rate:>6}  {row['memo_hits']:>5}  {row['api_calls']:>9}  {row['rows']:>10,}  "
+              f"{row['bytes_read'] / 1048576:>8.1f}  {row['bytes_written'] / 1048576:>10.1f}  {row['api_seconds']:>7.1f}s")
+        all_latencies.extend(row['latencies'])
+
+    by_property = summarise(events, 'site_url')
+    costly = sorted(((name, row) for name, row in by_property.items() if row['api_calls']), key=lambda item: -item[1]['api_calls'])[:top]
+    if costly:
+        print("\nProperties by API calls:")
+        for name, row in costly:
+            print(f"  {name}: {row['api_calls']} calls, {row['rows']:,} rows, {row['throttled']} throttled, {row['retried']} retried, {row['failed']} failed")
+    if all_latencies:
+        histogram = ', '.join(f"{label}: {count}" for label, count in latency_histogram(all_latencies))
+        print(f"\nAPI latency: p50 {_percentile(all_latencies, 0.5):.2f}s, p95 {_percentile(all_latencies, 0.95):.2f}s ({histogram})")
+    print(f"Metrics saved to: {path}")
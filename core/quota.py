@@ -0,0 +1,164 @@
+"""
+Rate limiting and retry handling for GSC API requests.
+Keeps concurrent fetches within the Search Console quotas (1,200 queries per
+minute per site and per user for the Search Analytics API) and retries
+throttled or failed requests with exponential backoff.
+"""
+import os
+import time
+import random
+import socket
+import threading
+from googleapiclient.errors import HttpError
+from core.client import get_thread_http
+from core import metrics
+
+# Query budget shared by every thread in the process (per-user/project quota)
+API_QUERIES_PER_MINUTE = int(os.environ.get('GSC_QPM_LIMIT', 1200))
+# Query budget for each individual property (per-site quota)
+PROPERTY_QUERIES_PER_MINUTE = int(os.environ.get('GSC_PROPERTY_QPM_LIMIT', 1200))
+
+# Throttling and server errors are retried; other client errors are not
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ATTEMPTS = 6
+# A timed-out request has already cost minutes, so give up sooner
+TIMEOUT_ATTEMPTS = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at rate_per_minute
+    and up to `capacity` tokens can be spent in a burst.
+    The rate adapts to throttling: it halves on every 429 and creeps back up
+    to the configured rate on success.
+    """
+    def __init__(self, rate_per_minute, capacity=None, min_rate_per_minute=60):
+        self.max_rate = rate_per_minute / 60.0
+        self.min_rate = min(min_rate_per_minute / 60.0, self.max_rate)
+        self.rate = self.max_rate
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate * 5)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available. Returns the number of seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def throttle(self):
+        """Halves the refill rate after the API reports throttling."""
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        """Increases the refill rate by 5% after a successful request."""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate * 1.05)
+
+_api_budget = TokenBucket(API_QUERIES_PER_MINUTE)
+_property_budgets = {}
+_property_budgets_lock = threading.Lock()
+
+_stats = {'requests': 0, 'throttled': 0, 'retried': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+def count_event(name, site_url=None):
+    with _stats_lock:
+        _stats[name] += 1
+    # Successful requests are recorded with their latency by the caller
+    if name != 'requests':
+        metrics.record(name, site_url)
+
+def get_request_stats():
+    """Returns a snapshot of the request counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+def get_property_budget(site_url):
+    """Returns the adaptive token bucket for a property."""
+    with _property_budgets_lock:
+        if site_url not in _property_budgets:
+            _property_budgets[site_url] = TokenBucket(PROPERTY_QUERIES_PER_MINUTE)
+        return _property_budgets[site_url]
+
+def is_retryable(error):
+    """Returns True if an HttpError is worth retrying."""
+    return isinstance(error, HttpError) and error.resp.status in RETRYABLE_STATUSES
+
+def _get_retry_after(error):
+    """Returns the Retry-After header of an HttpError in seconds, if present."""
+    try:
+        return float(error.resp.get('retry-after'))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given (1-based) attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def execute_query(service, site_url, body, retry_timeouts=True):
+    """
+    Executes a Search Analytics query through the shared rate limiters.
+    Retries timeouts, throttling and server errors with exponential backoff
+    (honouring Retry-After). Raises the last error once retries are exhausted.
+    With retry_timeouts=False timeouts are raised immediately so the caller
+    can adjust the request (e.g. shrink the page size) before retrying.
+    """
+    property_budget = get_property_budget(site_url)
+    http_attempts = 0
+    timeout_attempts = 0
+
+    while True:
+        property_budget.acquire()
+        _api_budget.acquire()
+        count_event('requests')
+        try:
+            response = service.searchanalytics().query(siteUrl=site_url, body=body).execute(http=get_thread_http(service))
+            property_budget.recover()
+            _api_budget.recover()
+            return response
+        except (socket.timeout, TimeoutError):
+            timeout_attempts += 1
+            if not retry_timeouts:
+                raise
+            if timeout_attempts >= TIMEOUT_ATTEMPTS:
+                count_event('failed', site_url)
+                raise
+            count_event('retried', site_url)
+            print(f"    - Timeout occurred. Retrying (attempt {timeout_attempts}/{TIMEOUT_ATTEMPTS})...")
+            time.sleep(backoff_delay(timeout_attempts))
+        except HttpError as e:
+            if not is_retryable(e):
+                count_event('failed', site_url)
+                raise
+            http_attempts += 1
+            if e.resp.status == 429:
+                count_event('throttled', site_url)
+                property_budget.throttle()
+                _api_budget.throttle()
+            if http_attempts >= RETRY_ATTEMPTS:
+                count_event('failed', site_url)
+                raise
+            count_event('retried', site_url)
+            retry_after = _get_retry_after(e)
+            delay = retry_after if retry_after is not None else backoff_delay(http_attempts)
+            print(f"    - HTTP {e.resp.status} received. Retrying in {delay:.1f}s (attempt {http_attempts}/{RETRY_ATTEMPTS})...")
+            time.sleep(delay)
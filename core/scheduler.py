@@ -0,0 +1,226 @@
+"""
+Parallel scheduler for batch report runs.
+Runs (site, report) jobs across a pool of workers. Reports which read another
+report's output for the same site wait for that report to finish, and the API
+query budget is divided between the workers so that concurrent processes
+together stay within the Search Console quotas.
+
+In-process mode keeps a pool of long-lived worker processes which import the
+libraries and authenticate once, then execute each report script's __main__
+block directly. A job only falls back to a fresh interpreter (subprocess) if
+its worker dies.
+"""
+import io
+import os
+import sys
+import time
+import runpy
+import traceback
+import subprocess
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from core.quota import API_QUERIES_PER_MINUTE, PROPERTY_QUERIES_PER_MINUTE
+
+# Number of jobs run at once by the batch runners
+BATCH_WORKERS = int(os.environ.get('GSC_BATCH_WORKERS', os.cpu_count() or 1))
+
+# Reports which read the output of other reports for the same site
+REPORT_DEPENDENCIES = {
+    'historical_summary_report.py': ['monthly_summary_report.py'],
+}
+
+class Job:
+    """A single report run for a single site."""
+    def __init__(self, site, script, command):
+        self.site = site
+        self.script = script
+        self.command = command
+        self.depends_on = []
+        self.returncode = None
+        self.duration = 0.0
+        self.output = ''
+
+    @property
+    def label(self):
+        return f"{os.path.basename(self.script)} for {self.site}"
+
+def build_jobs(sites, scripts, extra_args=None):
+    """
+    Creates a job per (site, script) using the current interpreter, with
+    dependencies between reports of the same site resolved from REPORT_DEPENDENCIES.
+    """
+    jobs = []
+    for site in sites:
+        site_jobs = {}
+        for script in scripts:
+            job = Job(site, script, [sys.executable, script, site] + list(extra_args or []))
+            site_jobs[os.path.basename(script)] = job
+            jobs.append(job)
+        for name, job in site_jobs.items():
+            job.depends_on = [site_jobs[dep] for dep in REPORT_DEPENDENCIES.get(name, []) if dep in site_jobs]
+    return jobs
+
+def get_worker_env(workers):
+    """
+    Returns the environment for job processes. Each process has its own rate
+    limiter, so the query budgets are split evenly between concurrent workers.
+    """
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.getcwd()
+    env['GSC_QPM_LIMIT'] = str(max(1, API_QUERIES_PER_MINUTE // workers))
+    env['GSC_PROPERTY_QPM_LIMIT'] = str(max(1, PROPERTY_QUERIES_PER_MINUTE // workers))
+    return env
+
+def _run_job(job, env, stream):
+    start = time.time()
+    # Metrics recorded by the job are attributed to its report
+    env = dict(env, GSC_METRICS_REPORT=os.path.basename(job.script))
+    try:
+        if stream:
+            process = subprocess.run(job.command, env=env)
+        else:
+            # Output is collected and printed in one block so parallel jobs do not interleave
+            process = subprocess.run(job.command, env=env, capture_output=True, text=True)
+            job.output = (process.stdout or '') + (process.stderr or '')
+        job.returncode = process.returncode
+    except Exception as e:
+        job.output += f"An unexpected error occurred: {e}\n"
+        job.returncode = -1
+    job.duration = time.time() - start
+    return job
+
+def _init_worker(workers):
+    """
+    Sets up an in-process worker: a share of the query budget and of the memo
+    memory budget, and one authenticated service.
+    """
+    from core import quota, memo
+    from core.client import get_gsc_service, set_shared_service
+    # Workers live for the whole batch, so together they stay within GSC_MEMO_MAX_MB
+    memo.MEMORY_MAX_BYTES = memo.MEMORY_MAX_BYTES // workers
+    quota.PROPERTY_QUERIES_PER_MINUTE = max(1, PROPERTY_QUERIES_PER_MINUTE // workers)
+    quota._api_budget = quota.TokenBucket(max(1, API_QUERIES_PER_MINUTE // workers))
+    quota._property_budgets.clear()
+    set_shared_service(get_gsc_service())
+
+def _run_in_process(command, stream):
+    """
+    Runs a report script's __main__ block in the current process with the
+    given arguments. Returns (returncode, output, duration).
+    """
+    from core import metrics
+    script, args = command[1], command[2:]
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    metrics.set_report(os.path.basename(script))
+    buffer = io.StringIO()
+    returncode = 0
+    start = time.time()
+    sys.argv = [script] + args
+    with contextlib.ExitStack() as stack:
+        if not stream:
+            stack.enter_context(contextlib.redirect_stdout(buffer))
+            stack.enter_context(contextlib.redirect_stderr(buffer))
+        try:
+            runpy.run_path(script, run_name='__main__')
+        except SystemExit as e:
+            if isinstance(e.code, int) or e.code is None:
+                returncode = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except Exception:
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            # Reports append the repository root to sys.path on every run
+            sys.argv, sys.path[:] = saved_argv, saved_path
+            metrics.set_report(None)
+    return returncode, buffer.getvalue(), time.time() - start
+
+def run_jobs(jobs, workers=None, in_process=False):
+    """
+    Runs jobs on up to `workers` workers at once (default GSC_BATCH_WORKERS),
+    starting each job only once its dependencies have finished. A job whose
+    dependency failed still runs, as it may find older output to work from.
+    With in_process=True jobs run inside long-lived worker processes (see the
+    module docstring); otherwise each job is a separate interpreter.
+    With a single worker, job output is streamed as it is produced.
+    Returns the jobs with their exit codes and durations filled in.
+    """
+    workers = max(1, min(workers or BATCH_WORKERS, len(jobs) or 1))
+    env = get_worker_env(workers)
+    stream = workers == 1
+    pending = list(jobs)
+    done = set()
+    running = {}
+
+    process_pool = None
+    if in_process:
+        # Authenticate once up front so workers never start competing browser flows
+        try:
+            from core.client import get_gsc_service
+            get_gsc_service()
+        except Exception as e:
+            print(f"Could not authenticate for in-process runs ({e}). Falling back to subprocesses.")
+            in_process = False
+    if in_process:
+        process_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,))
+
+    def submit(job):
+        if process_pool is not None:
+            return process_pool.submit(_run_in_process, job.command, stream)
+        return thread_pool.submit(_run_job, job, env, stream)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gsc-batch') as thread_pool:
+        try:
+            while pending or running:
+                ready = [job for job in pending if all(dep in done for dep in job.depends_on)]
+                if not ready and not running:
+                    raise ValueError("Circular report dependencies: " + ', '.join(job.label for job in pending))
+                for job in ready[:workers - len(running)]:
+                    pending.remove(job)
+                    print(f"\n>>> Starting {job.label} ({len(done) + len(running) + 1}/{len(jobs)})")
+                    if stream:
+                        print(f"Command: {' '.join(job.command)}")
+                    running[submit(job)] = job
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        # A worker died (or could not start), so stop using in-process workers
+                        print(f"--- In-process worker failed while running {job.label}. Falling back to subprocesses.")
+                        if process_pool is not None:
+                            process_pool.shutdown(wait=False, cancel_futures=True)
+                            process_pool = None
+                        running[submit(job)] = job
+                        continue
+                    if isinstance(result, tuple):
+                        job.returncode, job.output, job.duration = result
+                    done.add(job)
+                    if job.output:
+                        print(f"\n{'-'*20} Output of {job.label} {'-'*20}")
+                        print(job.output.rstrip())
+                    status = 'SUCCESS' if job.returncode == 0 else f"FAILURE (exit code {job.returncode})"
+                    print(f"--- {status}: {job.label} in {job.duration:.1f}s")
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown(wait=True)
+    return jobs
+
+def print_summary(jobs):
+    """Prints a table of job results and returns the number of failed jobs."""
+    failed = [job for job in jobs if job.returncode != 0]
+    site_width = max([len('Site')] + [len(job.site) for job in jobs])
+    script_width = max([len('Report')] + [len(job.script) for job in jobs])
+
+    print(f"\n{'='*50}")
+    print(f"Batch Summary: {len(jobs) - len(failed)} succeeded, {len(failed)} failed")
+    print(f"{'='*50}")
+    print(f"{'Site':<{site_width}}  {'Report':<{script_width}}  {'Exit':>4}  {'Time':>8}")
+    for job in jobs:
+        print(f"{job.site:<{site_width}}  {job.script:<{script_width}}  {job.returncode:>4}  {job.duration:>7.1f}s")
+    return len(failed)
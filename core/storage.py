@@ -0,0 +1,195 @@
+"""
+Storage backends for cached GSC fragments.
+Fragments are stored in a typed columnar format (Parquet) where pyarrow is
+available, falling back to plain CSV. Legacy CSV fragments are migrated to the
+active format the first time they are read.
+"""
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# Low-cardinality or heavily repeated string columns which benefit from dictionary encoding
+DICTIONARY_COLUMNS = ['query', 'page', 'date', 'country', 'device', 'searchAppearance']
+
+class CsvFragmentStore:
+    """Plain CSV storage. Always available, used for legacy fragments."""
+    name = 'csv'
+    extension = '.csv'
+
+    def read(self, path, columns=None):
+        usecols = (lambda c: c in columns) if columns else None
+        # Dimensions are always strings: type inference turns numeric queries into ints
+        dtype = {c: str for c in DICTIONARY_COLUMNS}
+        return pd.read_csv(path, usecols=usecols, dtype=dtype)
+
+    def write(self, df, path):
+        df.to_csv(path, index=False)
+
+    def open_writer(self, path):
+        return _CsvFragmentWriter(path)
+
+class _CsvFragmentWriter:
+    """Appends batches to a CSV file, writing the header once."""
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+class ParquetFragmentStore:
+    """Columnar Parquet storage with dictionary-encoded dimension columns."""
+    name = 'parquet'
+    extension = '.parquet'
+
+    def read(self, path, columns=None):
+        if columns:
+            available = pq.read_schema(path).names
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(path, columns=columns)
+
+    def write(self, df, path):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        dictionary_cols = [c for c in DICTIONARY_COLUMNS if c in df.columns]
+        pq.write_table(table, path, compression='zstd', use_dictionary=dictionary_cols or False)
+
+    def open_writer(self, path):
+        return _ParquetFragmentWriter(path)
+
+class _ParquetFragmentWriter:
+    """Appends batches to a Parquet file as row groups. The schema is fixed by the first batch."""
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            dictionary_cols = [c for c in DICTIONARY_COLUMNS if c in df.columns]
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression='zstd', use_dictionary=dictionary_cols or False)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+FRAGMENT_STORES = {'csv': CsvFragmentStore()}
+if HAS_PARQUET:
+    FRAGMENT_STORES['parquet'] = ParquetFragmentStore()
+
+def register_fragment_store(store):
+    """Registers an additional storage backend (any object with name, extension, read, write and open_writer)."""
+    FRAGMENT_STORES[store.name] = store
+
+def get_fragment_store(name=None):
+    """
+    Returns the active storage backend.
+    Priority: name argument, GSC_CACHE_FORMAT environment variable, Parquet if available, CSV.
+    """
+    name = name or os.environ.get('GSC_CACHE_FORMAT') or ('parquet' if HAS_PARQUET else 'csv')
+    if name not in FRAGMENT_STORES:
+        print(f"  - Cache format '{name}' is not available. Falling back to CSV.")
+        name = 'csv'
+    return FRAGMENT_STORES[name]
+
+def get_fragment_data_files(base_path):
+    """Returns every existing data file for a fragment base path (path without extension)."""
+    return [base_path + store.extension for store in FRAGMENT_STORES.values() if os.path.exists(base_path + store.extension)]
+
+def find_fragment(base_path):
+    """
+    Locates the data file for a fragment, preferring the active format.
+    Returns (path, store) or (None, None) if the fragment is not cached.
+    """
+    active = get_fragment_store()
+    stores = [active] + [s for s in FRAGMENT_STORES.values() if s is not active]
+    for store in stores:
+        path = base_path + store.extension
+        if os.path.exists(path):
+            return path, store
+    return None, None
+
+def fragment_exists(base_path):
+    return find_fragment(base_path)[0] is not None
+
+def write_fragment(df, base_path):
+    """Writes a fragment in the active format and returns the path written."""
+    store = get_fragment_store()
+    path = base_path + store.extension
+    store.write(df, path)
+    return path
+
+def merge_fragments(part_base_paths, base_path):
+    """
+    Streams several fragments (e.g. downloaded pages) into a single fragment,
+    holding only one part in memory at a time. Returns the number of rows written.
+    """
+    store = get_fragment_store()
+    path = base_path + store.extension
+    tmp_path = base_path + '.tmp' + store.extension
+    rows = 0
+    writer = store.open_writer(tmp_path)
+    try:
+        for part_base_path in part_base_paths:
+            part_df = read_fragment(part_base_path)
+            if not part_df.empty:
+                writer.write(part_df)
+                rows += len(part_df)
+    finally:
+        writer.close()
+    if rows:
+        os.replace(tmp_path, path)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return rows
+
+def read_fragment(base_path, columns=None):
+    """
+    Reads a cached fragment, optionally projecting to a subset of columns.
+    Fragments stored in a non-active format are converted on first touch.
+    """
+    active = get_fragment_store()
+    # Another process may migrate the fragment between locating and reading it,
+    # in which case it is located again
+    for _ in range(3):
+        path, store = find_fragment(base_path)
+        if path is None:
+            return pd.DataFrame()
+        try:
+            df = store.read(path, columns if store is active else None)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return pd.DataFrame()
+
+    if store is active:
+        return df
+
+    # Migrate the full fragment through a temporary file, as other processes may be reading it
+    tmp_base = f"{base_path}.{os.getpid()}.tmp"
+    try:
+        os.replace(write_fragment(df, tmp_base), base_path + active.extension)
+        os.remove(path)
+    except FileNotFoundError:
+        # Already migrated by another process
+        pass
+    except Exception as e:
+        print(f"  - Could not migrate {os.path.basename(path)} to {active.name}: {e}")
+        for tmp_path in get_fragment_data_files(tmp_base):
+            os.remove(tmp_path)
+    if columns:
+        return df[[c for c in columns if c in df.columns]]
+    return df
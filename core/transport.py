@@ -0,0 +1,73 @@
+"""
+HTTP transports for the GSC API client.
+googleapiclient talks to httplib2, which opens a new TLS connection per
+connection object and has no pooling. Where requests is available, API calls
+go through a google-auth AuthorizedSession with a pooled, keep-alive adapter
+instead, wrapped in the small httplib2-compatible interface googleapiclient
+expects. Timeouts are applied per request rather than through the
+process-wide socket default.
+"""
+import os
+import socket
+import httplib2
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from google.auth.transport.requests import AuthorizedSession
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+# 'pooled' (requests with connection pooling, the default where available) or 'httplib2'
+HTTP_TRANSPORT = os.environ.get('GSC_HTTP_TRANSPORT', 'pooled')
+# Connections kept alive per host; should cover the number of concurrent fetch threads
+HTTP_POOL_SIZE = int(os.environ.get('GSC_HTTP_POOL_SIZE', 16))
+# Seconds to wait for a connection, and for a response once connected
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('GSC_HTTP_CONNECT_TIMEOUT', 30))
+HTTP_TIMEOUT = float(os.environ.get('GSC_HTTP_TIMEOUT', 300))
+
+class PooledHttp:
+    """
+    httplib2-compatible wrapper around an AuthorizedSession. The session's
+    connection pool is thread-safe, so one instance is shared by every thread.
+    """
+    def __init__(self, credentials, pool_size=HTTP_POOL_SIZE, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT)):
+        self.credentials = credentials
+        self.timeout = timeout
+        self.session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.headers['accept-encoding'] = 'gzip'
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=None, connection_type=None):
+        try:
+            response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        except requests.exceptions.Timeout as e:
+            # Callers handle timeouts as socket timeouts, as they are with httplib2
+            raise socket.timeout(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionError(str(e)) from e
+
+        info = {key.lower(): value for key, value in response.headers.items()}
+        info['status'] = str(response.status_code)
+        # requests has already decompressed the body
+        info.pop('content-encoding', None)
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        self.session.close()
+
+def use_pooled_transport():
+    """Returns True if API calls should use the pooled transport."""
+    if HTTP_TRANSPORT == 'httplib2':
+        return False
+    if not HAS_REQUESTS:
+        if HTTP_TRANSPORT == 'pooled' and 'GSC_HTTP_TRANSPORT' in os.environ:
+            print("  - The pooled HTTP transport needs the requests package. Falling back to httplib2.")
+        return False
+    return True
+
+def build_httplib2():
+    """Returns a plain httplib2 connection with the configured response timeout."""
+    return httplib2.Http(timeout=HTTP_TIMEOUT)
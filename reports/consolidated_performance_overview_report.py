@@ -16,6 +16,7 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service, get_available_properties
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 from urllib.parse import urlparse
 
 def get_sort_key(site_url):
@@ -51,6 +52,8 @@ def create_consolidated_html(df_types, df_appearances, date_range_str):
     df_types_disp['impressions'] = pd.to_numeric(df_types_disp['impressions'], errors='coerce').fillna(0)
     df_types_disp['ctr'] = pd.to_numeric(df_types_disp['ctr'], errors='coerce').fillna(0)
     df_types_disp['position'] = pd.to_numeric(df_types_disp['position'], errors='coerce').fillna(0)
+    # Formatted for display once for all properties
+    df_types_fmt = format_table(df_types_disp)
 
     unique_sites_types = sorted(df_types_disp['site_url'].unique(), key=get_sort_key)
     types_tables_html = []
@@ -64,12 +67,8 @@ def create_consolidated_html(df_types, df_appearances, date_range_str):
         tot_ctr = tot_clicks / tot_imps if tot_imps > 0 else 0
         tot_pos = site_df['position'].mean()
         
-        # Format the values for display
-        site_df_disp = site_df.copy()
-        site_df_disp['clicks'] = site_df_disp['clicks'].apply(lambda x: f"{x:,.0f}")
-        site_df_disp['impressions'] = site_df_disp['impressions'].apply(lambda x: f"{x:,.0f}")
-        site_df_disp['ctr'] = site_df_disp['ctr'].apply(lambda x: f"{x:.2%}")
-        site_df_disp['position'] = site_df_disp['position'].apply(lambda x: f"{x:.2f}")
+        # Take the values formatted for display
+        site_df_disp = df_types_fmt[df_types_fmt['site_url'] == site]
         
         # Drop site_url and rename columns
         site_df_disp = site_df_disp.drop(columns=['site_url'])
@@ -113,6 +112,7 @@ def create_consolidated_html(df_types, df_appearances, date_range_str):
     df_apps_disp['impressions'] = pd.to_numeric(df_apps_disp['impressions'], errors='coerce').fillna(0)
     df_apps_disp['ctr'] = pd.to_numeric(df_apps_disp['ctr'], errors='coerce').fillna(0)
     df_apps_disp['position'] = pd.to_numeric(df_apps_disp['position'], errors='coerce').fillna(0)
+    df_apps_fmt = format_table(df_apps_disp)
 
     unique_sites_apps = sorted(df_apps_disp['site_url'].unique(), key=get_sort_key)
     apps_tables_html = []
@@ -126,12 +126,8 @@ def create_consolidated_html(df_types, df_appearances, date_range_str):
         tot_ctr = tot_clicks / tot_imps if tot_imps > 0 else 0
         tot_pos = site_df['position'].mean()
         
-        # Format the values for display
-        site_df_disp = site_df.copy()
-        site_df_disp['clicks'] = site_df_disp['clicks'].apply(lambda x: f"{x:,.0f}")
-        site_df_disp['impressions'] = site_df_disp['impressions'].apply(lambda x: f"{x:,.0f}")
-        site_df_disp['ctr'] = site_df_disp['ctr'].apply(lambda x: f"{x:.2%}")
-        site_df_disp['position'] = site_df_disp['position'].apply(lambda x: f"{x:.2f}")
+        # Take the values formatted for display
+        site_df_disp = df_apps_fmt[df_apps_fmt['site_url'] == site]
         
         # Drop site_url and rename columns
         site_df_disp = site_df_disp.drop(columns=['site_url'])
@@ -276,6 +272,9 @@ def create_property_grouped_html(df_types, df_appearances, date_range_str):
     df_apps_disp['impressions'] = pd.to_numeric(df_apps_disp['impressions'], errors='coerce').fillna(0)
     df_apps_disp['ctr'] = pd.to_numeric(df_apps_disp['ctr'], errors='coerce').fillna(0)
     df_apps_disp['position'] = pd.to_numeric(df_apps_disp['position'], errors='coerce').fillna(0)
+    # Formatted for display once for all properties
+    df_types_fmt = format_table(df_types_disp)
+    df_apps_fmt = format_table(df_apps_disp)
 
     # Get a list of all unique site URLs across both tables
     unique_sites = list(set(df_types_disp['site_url'].unique()) | set(df_apps_disp['site_url'].unique()))
@@ -336,11 +335,7 @@ def create_property_grouped_html(df_types, df_appearances, date_range_str):
             tot_ctr_t = tot_clicks_t / tot_imps_t if tot_imps_t > 0 else 0
             tot_pos_t = site_types_df['position'].mean()
             
-            site_types_df_disp = site_types_df.copy()
-            site_types_df_disp['clicks'] = site_types_df_disp['clicks'].apply(lambda x: f"{x:,.0f}")
-            site_types_df_disp['impressions'] = site_types_df_disp['impressions'].apply(lambda x: f"{x:,.0f}")
-            site_types_df_disp['ctr'] = site_types_df_disp['ctr'].apply(lambda x: f"{x:.2%}")
-            site_types_df_disp['position'] = site_types_df_disp['position'].apply(lambda x: f"{x:.2f}")
+            site_types_df_disp = df_types_fmt[df_types_fmt['site_url'] == site]
             
             site_types_df_disp = site_types_df_disp.drop(columns=['site_url'])
             site_types_df_disp = site_types_df_disp.rename(columns={
@@ -375,11 +370,7 @@ def create_property_grouped_html(df_types, df_appearances, date_range_str):
             tot_ctr_a = tot_clicks_a / tot_imps_a if tot_imps_a > 0 else 0
             tot_pos_a = site_apps_df['position'].mean()
             
-            site_apps_df_disp = site_apps_df.copy()
-            site_apps_df_disp['clicks'] = site_apps_df_disp['clicks'].apply(lambda x: f"{x:,.0f}")
-            site_apps_df_disp['impressions'] = site_apps_df_disp['impressions'].apply(lambda x: f"{x:,.0f}")
-            site_apps_df_disp['ctr'] = site_apps_df_disp['ctr'].apply(lambda x: f"{x:.2%}")
-            site_apps_df_disp['position'] = site_apps_df_disp['position'].apply(lambda x: f"{x:.2f}")
+            site_apps_df_disp = df_apps_fmt[df_apps_fmt['site_url'] == site]
             
             site_apps_df_disp = site_apps_df_disp.drop(columns=['site_url'])
             site_apps_df_disp = site_apps_df_disp.rename(columns={
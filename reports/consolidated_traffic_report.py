@@ -8,6 +8,7 @@ from jinja2 import Environment, FileSystemLoader
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
+from core.formatting import format_table
 
 def generate_html_report(df, site_url, html_output_path):
     """Generates the HTML report."""
@@ -55,11 +56,13 @@ def generate_html_report(df, site_url, html_output_path):
         if col not in df_fmt.columns:
             df_fmt[col] = 0
 
+    columns = {}
     for col in df_fmt.columns:
         if 'clicks' in col or 'impressions' in col:
-            df_fmt[col] = df_fmt[col].apply(lambda x: f"{x:,.0f}")
+            columns[col] = 'int'
         elif 'ctr' in col:
-            df_fmt[col] = df_fmt[col].apply(lambda x: f"{x:.2%}")
+            columns[col] = 'percent'
+    df_fmt = format_table(df_fmt, columns)
 
     monthly_clicks_table = df_fmt[['month', 'web_clicks', 'discover_clicks', 'news_clicks', 'total_clicks']].style.set_table_attributes('class="table table-bordered table-sm"').set_table_styles(styles).hide(axis='index').to_html()
     monthly_imps_table = df_fmt[['month', 'web_impressions', 'discover_impressions', 'news_impressions', 'total_impressions']].style.set_table_attributes('class="table table-bordered table-sm"').set_table_styles(styles).hide(axis='index').to_html()
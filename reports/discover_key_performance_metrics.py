@@ -11,16 +11,14 @@ from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def create_single_site_html_report(df, report_title, full_period_str):
     """Generates a simplified HTML report for a single site, including a chart."""
     df_table = df.drop(columns=['month_date']).copy()
     if 'site_url' in df_table.columns:
         df_table = df_table.drop(columns=['site_url'])
-        
-    df_table['clicks'] = df_table['clicks'].apply(lambda x: f"{x:,.0f}")
-    df_table['impressions'] = df_table['impressions'].apply(lambda x: f"{x:,.0f}")
-    df_table['ctr'] = df_table['ctr'].apply(lambda x: f"{x:.2%}")
+    df_table = format_table(df_table, {'clicks': 'int', 'impressions': 'int', 'ctr': 'percent'})
     
     report_body = df_table.to_html(classes="table table-striped table-hover", index=False, border=0)
     chart_data = df.sort_values(by='month').to_json(orient='records')
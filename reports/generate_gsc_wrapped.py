@@ -12,7 +12,7 @@ from dateutil.relativedelta import relativedelta
 from jinja2 import Environment, FileSystemLoader
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
-from core.brand import get_brand_terms, classify_query
+from core.brand import get_brand_terms, classify_queries
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
 
 def generate_wrapped_narrative(wrapped_data):
@@ -83,7 +83,7 @@ def run_report(service, site_url, start_date, end_date, brand_terms=None):
         brand_terms = get_brand_terms(site_url)
     
     if brand_terms:
-        df_queries['is_brand'] = df_queries['query'].apply(lambda x: classify_query(x, brand_terms))
+        df_queries['is_brand'] = classify_queries(df_queries['query'], brand_terms, site_url)
         
         top_brand = df_queries[df_queries['is_brand']].head(5)
         top_non_brand = df_queries[~df_queries['is_brand']].head(5)
@@ -11,58 +11,32 @@ from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
-from core.brand import get_brand_terms, classify_query
+from core.brand import get_brand_terms, classify_queries
 from core.date_utils import parse_standard_date_args
+from core.grouped_tables import build_groups, render_template
 
 def generate_accordion_html(df, primary_dim, secondary_dim, report_limit, sub_table_limit, accordion_suffix=""):
     """Generates the accordion HTML for the report."""
-    accordion_id = f"accordion-{primary_dim}{accordion_suffix}"
-    html_parts = [f'<div class="accordion mt-3" id="{accordion_id}">']
-
     primary_totals = df.groupby(primary_dim).agg(
         total_clicks=('clicks', 'sum'),
         total_impressions=('impressions', 'sum')
     ).sort_values(by='total_clicks', ascending=False).head(report_limit).reset_index()
 
-    for i, row in primary_totals.iterrows():
-        primary_val = row[primary_dim]
-        
-        sub_df = df[df[primary_dim] == primary_val].head(sub_table_limit).copy()
-        
-        # Format for table display
-        if secondary_dim == 'page':
-            sub_df['page'] = sub_df['page'].apply(lambda x: f'<a href="{x}" target="_blank" class="text-break">{x}</a>')
-
-        sub_df['ctr'] = sub_df['ctr'].apply(lambda x: f"{x:.2%}")
-        sub_df['position'] = sub_df['position'].apply(lambda x: f"{x:.2f}")
-
-        table_html = sub_df[[secondary_dim, 'clicks', 'impressions', 'ctr', 'position']].to_html(
-            classes="table table-sm table-striped", index=False, border=0, escape=False
-        )
-
-        html_parts.append(f"""
-        <div class="accordion-item">
-            <h2 class="accordion-header">
-                <button class="accordion-button collapsed" type="button" data-bs-toggle="collapse" data-bs-target="#collapse-{primary_dim}{accordion_suffix}-{i}">
-                    <div class="d-flex w-100 align-items-center">
-                        <span class="text-truncate" style="max-width: 60%;">{primary_val}</span>
-                        <div class="ms-auto me-5 text-nowrap">
-                            <span class="me-4">Clicks: <strong>{row['total_clicks']:,}</strong></span>
-                            <span>Impressions: <strong>{row['total_impressions']:,}</strong></span>
-                        </div>
-                    </div>
-                </button>
-            </h2>
-            <div id="collapse-{primary_dim}{accordion_suffix}-{i}" class="accordion-collapse collapse" data-bs-parent="#{accordion_id}">
-                <div class="accordion-body">
-                    {table_html}
-                </div>
-            </div>
-        </div>
-        """)
-    
-    html_parts.append('</div>')
-    return "".join(html_parts)
+    groups = build_groups(
+        primary_totals, df, primary_dim,
+        [(secondary_dim, 'link' if secondary_dim == 'page' else 'text'), ('clicks', 'int'), ('impressions', 'int'), ('ctr', 'percent'), ('position', 'decimal')],
+        limit=sub_table_limit,
+        summary_formats={'total_clicks': 'int', 'total_impressions': 'int'}
+    )
+    return render_template(
+        'grouped-accordion.html',
+        accordion_id=f"accordion-{primary_dim}{accordion_suffix}",
+        label_header=primary_dim.title(),
+        summary_headers=['Clicks', 'Impressions'],
+        summary_fields=['total_clicks', 'total_impressions'],
+        detail_headers=[secondary_dim, 'clicks', 'impressions', 'ctr', 'position'],
+        groups=groups
+    )
 
 def create_html_report(data_df, site_url, start_date, end_date, report_limit, sub_table_limit, brand_terms=None):
     """Generates the interactive HTML report."""
@@ -96,7 +70,7 @@ def create_html_report(data_df, site_url, start_date, end_date, report_limit, su
     """
 
     if has_brands:
-        data_df['is_brand'] = data_df['query'].apply(lambda x: classify_query(x, brand_terms))
+        data_df['is_brand'] = classify_queries(data_df['query'], brand_terms, site_url)
         brand_df = data_df[data_df['is_brand']].copy()
         non_brand_df = data_df[~data_df['is_brand']].copy()
         
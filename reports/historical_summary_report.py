@@ -7,19 +7,14 @@ import json
 from datetime import datetime
 from core.naming import get_output_dir, get_filename_slug
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 from jinja2 import Environment, FileSystemLoader
 
 def create_historical_report(df, report_title, site_url):
     """Generates a historical HTML report."""
     
     # --- Data Preparation ---
-    report_df = df.copy()
-    report_df['clicks'] = report_df['clicks'].apply(lambda x: f"{x:,.0f}")
-    report_df['impressions'] = report_df['impressions'].apply(lambda x: f"{x:,.0f}")
-    report_df['ctr'] = report_df['ctr'].apply(lambda x: f"{x:.2%}")
-    report_df['position'] = report_df['position'].apply(lambda x: f"{x:,.2f}")
-    report_df['queries'] = report_df['queries'].apply(lambda x: f"{x:,.0f}")
-    report_df['pages'] = report_df['pages'].apply(lambda x: f"{x:,.0f}")
+    report_df = format_table(df)
 
     report_df = report_df.rename(columns={
         'month': 'Month',
@@ -12,6 +12,7 @@ from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
+from core.formatting import format_table
 
 def create_html_report(site_url, start_date, end_date, data_payload):
     """Generates the Image Success Report HTML."""
@@ -27,13 +28,7 @@ def create_html_report(site_url, start_date, end_date, data_payload):
 
     def to_html_table(df, title, limit=50):
         if df.empty: return "<p class='text-muted'>No data available.</p>"
-        display_df = df.head(limit).copy()
-        if 'clicks' in display_df.columns: display_df['clicks'] = display_df['clicks'].apply(lambda x: f"{int(x):,}")
-        if 'impressions' in display_df.columns: display_df['impressions'] = display_df['impressions'].apply(lambda x: f"{int(x):,}")
-        if 'ctr' in display_df.columns: display_df['ctr'] = display_df['ctr'].apply(lambda x: f"{x:.2%}")
-        if 'position' in display_df.columns: display_df['position'] = display_df['position'].apply(lambda x: f"{x:.2f}")
-        if 'page' in display_df.columns:
-            display_df['page'] = display_df['page'].apply(lambda x: f'<a href="{x}" target="_blank" class="text-break">{x}</a>')
+        display_df = format_table(df.head(limit), {'clicks': 'int', 'impressions': 'int', 'ctr': 'percent', 'position': 'decimal', 'page': 'link'})
         return f"<h5>{title}</h5>" + display_df.to_html(classes="table table-striped table-hover table-sm", index=False, escape=False, border=0)
 
     history_json = {
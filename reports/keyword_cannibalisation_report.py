@@ -6,70 +6,30 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pandas as pd
-import html
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.grouped_tables import build_groups, render_template
 
 def generate_accordion_html(report_df, top_100_cannibalised):
     """Generates the Bootstrap accordion HTML for the report."""
-    accordion_id = "cannibalisationAccordion"
-    header = """
-    <div class="row fw-bold border-bottom pb-2 mb-2">
-        <div class="col-md-6">Keyword</div>
-        <div class="col-md-2 text-end">Clicks</div>
-        <div class="col-md-2 text-end">Impressions</div>
-        <div class="col-md-2 text-end">Pages</div>
-    </div>
-    """
-    html_parts = [header, f'<div class="accordion" id="{accordion_id}">']
-
-    for index, summary_row in top_100_cannibalised.iterrows():
-        query = summary_row['query']
-        total_clicks = summary_row['total_clicks']
-        total_impressions = summary_row['total_impressions']
-        page_count = summary_row['page_count']
-
-        collapse_id = f"collapse-{index}"
-        header_id = f"header-{index}"
-        
-        pages_for_query_df = report_df[report_df['query'] == query].copy()
-        pages_for_query_df.sort_values(by=['clicks', 'impressions'], ascending=[False, False], inplace=True)
-
-        sub_group_html_df = pages_for_query_df.copy()
-        sub_group_html_df['page'] = sub_group_html_df['page'].apply(lambda x: f'<a href="{x}" target="_blank">{x}</a>')
-        sub_group_html_df['ctr'] = sub_group_html_df['ctr'].apply(lambda x: f"{x:.2%}")
-        sub_group_html_df['position'] = sub_group_html_df['position'].apply(lambda x: f"{x:.2f}")
-        sub_group_html_df['clicks'] = sub_group_html_df['clicks'].apply(lambda x: f"{x:,.0f}")
-        sub_group_html_df['impressions'] = sub_group_html_df['impressions'].apply(lambda x: f"{x:,.0f}")
-
-        sub_table_html = sub_group_html_df[['page', 'clicks', 'impressions', 'ctr', 'position']].to_html(
-            classes="table table-sm table-striped", index=False, border=0, escape=False
-        )
-
-        accordion_item = f"""
-        <div class="accordion-item">
-            <h2 class="accordion-header" id="{header_id}">
-                <button class="accordion-button collapsed" type="button" data-bs-toggle="collapse" data-bs-target="#{collapse_id}">
-                    <div class="row w-100 align-items-center">
-                        <div class="col-md-6 text-start"><strong>{html.escape(query)}</strong></div>
-                        <div class="col-md-2 text-end">{total_clicks:,.0f}</div>
-                        <div class="col-md-2 text-end">{total_impressions:,.0f}</div>
-                        <div class="col-md-2 text-end">{page_count}</div>
-                    </div>
-                </button>
-            </h2>
-            <div id="{collapse_id}" class="accordion-collapse collapse" data-bs-parent="#{accordion_id}">
-                <div class="accordion-body"><div class="table-responsive">{sub_table_html}</div></div>
-            </div>
-        </div>
-        """
-        html_parts.append(accordion_item)
-
-    html_parts.append('</div>')
-    return "".join(html_parts)
+    pages_df = report_df.sort_values(by=['clicks', 'impressions'], ascending=[False, False], kind='stable')
+    groups = build_groups(
+        top_100_cannibalised, pages_df, 'query',
+        [('page', 'link'), ('clicks', 'int'), ('impressions', 'int'), ('ctr', 'percent'), ('position', 'decimal')],
+        summary_formats={'total_clicks': 'int', 'total_impressions': 'int', 'page_count': 'int'}
+    )
+    return render_template(
+        'grouped-accordion.html',
+        accordion_id="cannibalisationAccordion",
+        label_header='Keyword',
+        summary_headers=['Clicks', 'Impressions', 'Pages'],
+        summary_fields=['total_clicks', 'total_impressions', 'page_count'],
+        detail_headers=['page', 'clicks', 'impressions', 'ctr', 'position'],
+        groups=groups
+    )
 
 def create_html_report(site_url, start_date, end_date, report_df, top_100_cannibalised):
     """Generates the full HTML report."""
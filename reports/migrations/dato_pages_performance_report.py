@@ -16,9 +16,10 @@ from dateutil.relativedelta import relativedelta
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.naming import get_output_dir, get_filename_slug
-from core.cache import fetch_with_cache
+from core.cache import fetch_with_cache, aggregate_metrics
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
+from core.grouped_tables import build_groups, render_template, spread_top_rows
 
 def clean_url(url):
     """Normalises URLs by stripping whitespace, converting to lowercase, and removing trailing slashes."""
@@ -113,82 +114,19 @@ def build_html_report(df_dato_grouped, df_dato_detail, start_date, end_date, sit
     """
     
     # Construct rows for the Dato pages table
-    table_rows = []
-    for i, row in df_dato_grouped.head(limit).reset_index(drop=True).iterrows():
-        page_url = row['page']
-        clicks = int(row['clicks'])
-        impressions = int(row['impressions'])
-        ctr = float(row['ctr'])
-        position = float(row['position'])
-        unique_queries = int(row['unique_queries'])
-        
-        # Get top queries for this page
-        page_queries = df_dato_detail[df_dato_detail['page'] == page_url].head(queries_limit)
-        queries_list = page_queries['query'].tolist()
-        queries_str_attr = html.escape(", ".join(queries_list))
-        
-        # Build nested sub-table for top queries
-        sub_table_header = """
-        <table class="table table-sm table-bordered mt-2 mb-0">
-            <thead class="table-secondary">
-                <tr>
-                    <th>Search Query</th>
-                    <th class="text-end" style="width: 120px;">Clicks</th>
-                    <th class="text-end" style="width: 150px;">Impressions</th>
-                    <th class="text-end" style="width: 100px;">CTR</th>
-                    <th class="text-end" style="width: 100px;">Avg. Position</th>
-                </tr>
-            </thead>
-            <tbody>
-        """
-        sub_table_body = ""
-        for _, q_row in page_queries.iterrows():
-            q_ctr = float(q_row['ctr'])
-            q_pos = float(q_row['position'])
-            sub_table_body += f"""
-                <tr>
-                    <td><code>{html.escape(q_row['query'])}</code></td>
-                    <td class="text-end">{int(q_row['clicks']):,}</td>
-                    <td class="text-end">{int(q_row['impressions']):,}</td>
-                    <td class="text-end">{q_ctr:.2%}</td>
-                    <td class="text-end">{q_pos:.2f}</td>
-                </tr>
-            """
-        sub_table_footer = "</tbody></table>"
-        sub_table_html = sub_table_header + sub_table_body + sub_table_footer
-        
-        collapse_id = f"collapse-page-{i}"
-        
-        row_html = f"""
-        <tr class="main-row" data-bs-toggle="collapse" data-bs-target="#{collapse_id}" style="cursor: pointer;" data-queries="{queries_str_attr}" data-collapse-target="{collapse_id}">
-            <td class="text-center fw-bold">{i + 1}</td>
-            <td class="page-url-cell"><a href="{page_url}" target="_blank" onclick="event.stopPropagation();" class="text-break">{html.escape(page_url)}</a></td>
-            <td class="text-end fw-bold">{clicks:,}</td>
-            <td class="text-end">{impressions:,}</td>
-            <td class="text-end">{ctr:.2%}</td>
-            <td class="text-end">{position:.2f}</td>
-            <td class="text-end">{unique_queries:,}</td>
-            <td class="text-center">
-                <button class="btn btn-xs btn-outline-primary py-0 px-2" style="font-size: 0.75rem;">Show Queries</button>
-            </td>
-        </tr>
-        <tr class="collapse-row">
-            <td colspan="8" class="p-0 border-0">
-                <div id="{collapse_id}" class="collapse">
-                    <div class="p-3 bg-light border-start border-primary border-4">
-                        <div class="d-flex align-items-center mb-2">
-                            <h6 class="mb-0 text-primary fw-bold">Top Queries driving traffic to this page:</h6>
-                            <span class="text-muted ms-3" style="font-size: 0.85rem;">Showing top {len(page_queries)} of {unique_queries} total queries</span>
-                        </div>
-                        {sub_table_html}
-                    </div>
-                </div>
-            </td>
-        </tr>
-        """
-        table_rows.append(row_html)
-        
-    table_rows_html = "\n".join(table_rows)
+    page_groups = build_groups(
+        df_dato_grouped.head(limit), df_dato_detail, 'page',
+        [('query', 'code'), ('clicks', 'int'), ('impressions', 'int'), ('ctr', 'percent'), ('position', 'decimal')],
+        limit=queries_limit,
+        summary_formats={'clicks': 'int', 'impressions': 'int', 'ctr': 'percent', 'position': 'decimal', 'unique_queries': 'int'}
+    )
+    for group in page_groups:
+        group['queries'] = html.escape(", ".join(group['detail']['query']))
+    table_rows_html = render_template(
+        'collapsible-table-rows.html',
+        groups=page_groups,
+        summary_fields=['clicks', 'impressions', 'ctr', 'position', 'unique_queries']
+    )
     
     # Build complete HTML report page
     html_content = f"""<!DOCTYPE html>
@@ -444,16 +382,7 @@ def run_report(service, site_url, start_date, end_date, limit=100, queries_limit
     
     # 4. Group Dato pages
     if not df_dato.empty:
-        df_dato_grouped = df_dato.groupby('page').apply(
-            lambda group: pd.Series({
-                'clicks': group['clicks'].sum(),
-                'impressions': group['impressions'].sum(),
-                'position': (group['position'] * group['impressions']).sum() / group['impressions'].sum() if group['impressions'].sum() > 0 else group['position'].mean(),
-                'unique_queries': group['query'].nunique()
-            })
-        ).reset_index()
-        
-        df_dato_grouped['ctr'] = df_dato_grouped['clicks'] / df_dato_grouped['impressions']
+        df_dato_grouped = aggregate_metrics(df_dato, ['page'], unique_queries=('query', 'nunique'))
         df_dato_grouped = df_dato_grouped.sort_values(by='clicks', ascending=False)
         df_dato_sorted = df_dato.sort_values(by=['page', 'clicks'], ascending=[True, False])
     else:
@@ -467,45 +396,16 @@ def run_report(service, site_url, start_date, end_date, limit=100, queries_limit
     csv_path = os.path.join(output_dir, f"{file_prefix}.csv")
     html_path = os.path.join(output_dir, f"{file_prefix}.html")
     
-    # Construct rows for CSV export
-    csv_rows = []
-    for _, row in df_dato_grouped.iterrows():
-        page_url = row['page']
-        page_queries = df_dato_sorted[df_dato_sorted['page'] == page_url].head(5)
-        
-        row_dict = {
-            'page': page_url,
-            'clicks': int(row['clicks']),
-            'impressions': int(row['impressions']),
-            'ctr': float(row['ctr']),
-            'position': float(row['position']),
-            'unique_queries': int(row['unique_queries'])
-        }
-        
-        # Add top 5 queries columns
-        for i in range(5):
-            query_val = ""
-            query_clicks = ""
-            query_impressions = ""
-            query_ctr = ""
-            query_position = ""
-            if i < len(page_queries):
-                q_row = page_queries.iloc[i]
-                query_val = q_row['query']
-                query_clicks = int(q_row['clicks'])
-                query_impressions = int(q_row['impressions'])
-                query_ctr = float(q_row['ctr'])
-                query_position = float(q_row['position'])
-                
-            row_dict[f'top_query_{i+1}'] = query_val
-            row_dict[f'top_query_{i+1}_clicks'] = query_clicks
-            row_dict[f'top_query_{i+1}_impressions'] = query_impressions
-            row_dict[f'top_query_{i+1}_ctr'] = query_ctr
-            row_dict[f'top_query_{i+1}_position'] = query_position
-            
-        csv_rows.append(row_dict)
-        
-    df_csv = pd.DataFrame(csv_rows)
+    # Construct rows for CSV export, spreading each page's top 5 queries across columns
+    top_queries = spread_top_rows(df_dato_sorted, 'page', ['query', 'clicks', 'impressions', 'ctr', 'position'], 5)
+    df_csv = df_dato_grouped[['page', 'clicks', 'impressions', 'ctr', 'position', 'unique_queries']].astype(
+        {'clicks': int, 'impressions': int, 'ctr': float, 'position': float, 'unique_queries': int}
+    )
+    for i in range(1, 6):
+        for field, suffix in [('query', ''), ('clicks', '_clicks'), ('impressions', '_impressions'), ('ctr', '_ctr'), ('position', '_position')]:
+            values = df_csv['page'].map(top_queries[(field, i)])
+            # Pages with fewer queries leave the remaining columns blank
+            df_csv[f'top_query_{i}{suffix}'] = values.astype('Int64') if field in ('clicks', 'impressions') else values
     df_csv.to_csv(csv_path, index=False, encoding='utf-8')
     
     # 6. Generate and save HTML
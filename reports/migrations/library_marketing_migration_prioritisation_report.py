@@ -21,7 +21,7 @@ from urllib.parse import urlparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.naming import get_output_dir, get_filename_slug
-from core.cache import fetch_with_cache
+from core.cache import fetch_with_cache, aggregate_metrics
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
 
@@ -267,18 +267,7 @@ def run_report(service, site_url, start_date, end_date, limit=100, max_rows=1000
         print("Error: No keyword-level data found.")
         return
         
-    df_pages = df_raw.groupby('page').agg(
-        clicks=('clicks', 'sum'),
-        impressions=('impressions', 'sum'),
-        unique_queries=('query', 'nunique')
-    ).reset_index()
-    
-    weighted_pos = df_raw.groupby('page').apply(
-        lambda g: (g['position'] * g['impressions']).sum() / g['impressions'].sum() if g['impressions'].sum() > 0 else g['position'].mean()
-    ).reset_index(name='position')
-    
-    df_pages = df_pages.merge(weighted_pos, on='page')
-    df_pages['ctr'] = df_pages['clicks'] / df_pages['impressions']
+    df_pages = aggregate_metrics(df_raw, ['page'], unique_queries=('query', 'nunique'))
     df_pages = df_pages.sort_values(by='clicks', ascending=False)
     
     df_raw_sorted = df_raw.sort_values(by=['page', 'clicks'], ascending=[True, False])
@@ -21,7 +21,7 @@ from html.parser import HTMLParser
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.naming import get_output_dir, get_filename_slug
-from core.cache import fetch_with_cache
+from core.cache import fetch_with_cache, aggregate_metrics
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
 
@@ -140,24 +140,11 @@ def build_report_data(df_raw, target_links, include_queries=True):
     df_matched['title'] = df_matched['page_lower'].map(lambda x: target_urls_lower[x][1])
     
     if include_queries:
-        df_pages = df_matched.groupby(['original_url', 'title']).agg(
-            clicks=('clicks', 'sum'),
-            impressions=('impressions', 'sum'),
-            unique_queries=('query', 'nunique')
-        ).reset_index()
-        weighted_pos = df_matched.groupby(['original_url', 'title']).apply(
-            lambda g: (g['position'] * g['impressions']).sum() / g['impressions'].sum() if g['impressions'].sum() > 0 else g['position'].mean()
-        ).reset_index(name='position')
-        df_pages = df_pages.merge(weighted_pos, on=['original_url', 'title'])
+        df_pages = aggregate_metrics(df_matched, ['original_url', 'title'], unique_queries=('query', 'nunique'))
     else:
-        df_pages = df_matched.groupby(['original_url', 'title']).agg(
-            clicks=('clicks', 'sum'),
-            impressions=('impressions', 'sum'),
-            position=('position', 'mean')
-        ).reset_index()
+        df_pages = aggregate_metrics(df_matched, ['original_url', 'title'])
         df_pages['unique_queries'] = 0
         
-    df_pages['ctr'] = df_pages['clicks'] / df_pages['impressions']
     df_pages = df_pages.sort_values(by='clicks', ascending=False)
     
     df_queries_sorted = df_matched.sort_values(by=['original_url', 'clicks'], ascending=[True, False]) if include_queries else pd.DataFrame()
@@ -13,6 +13,7 @@ from jinja2 import Environment
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 SEARCH_TYPES = ['web', 'image', 'video', 'news', 'discover', 'googleNews']
 
@@ -213,12 +214,13 @@ def create_search_type_report_html(df, report_title, date_range, site_url):
     summary_table = summary_df.style.set_table_attributes('class="table table-bordered table-sm"').set_table_styles(styles).hide(axis='index').to_html()
 
     # Format numeric columns for display
-    data_table_df = df_html.copy()
-    for col in data_table_df.columns:
+    columns = {}
+    for col in df_html.columns:
         if 'clicks' in col or 'impressions' in col:
-            data_table_df[col] = data_table_df[col].apply(lambda x: f"{int(x):,}")
+            columns[col] = 'int'
         elif 'ctr' in col:
-            data_table_df[col] = data_table_df[col].apply(lambda x: f"{x:.2%}" if pd.notnull(x) and x != 0 else '0.00%')
+            columns[col] = 'percent'
+    data_table_df = format_table(df_html, columns, fill_value=0)
 
     # Rename columns for presentation
     column_rename_map = {
@@ -12,6 +12,7 @@ from urllib.parse import urlparse
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 from jinja2 import Environment, FileSystemLoader
 
 def get_sort_key(site_url):
@@ -45,14 +46,7 @@ def create_summary_report_html(df, report_title, date_range_str, site_url=None):
     report_df = report_df.sort_values(by=['sort_key', 'clicks'], ascending=[True, False]).drop(columns=['sort_key'])
 
     # Format numbers
-    report_df['clicks'] = report_df['clicks'].apply(lambda x: f"{x:,.0f}")
-    report_df['impressions'] = report_df['impressions'].apply(lambda x: f"{x:,.0f}")
-    report_df['ctr'] = report_df['ctr'].apply(lambda x: f"{x:.2%}")
-    report_df['position'] = report_df['position'].apply(lambda x: f"{x:,.2f}")
-    if 'queries' in report_df.columns:
-        report_df['queries'] = report_df['queries'].apply(lambda x: f"{x:,.0f}")
-    if 'pages' in report_df.columns:
-        report_df['pages'] = report_df['pages'].apply(lambda x: f"{x:,.0f}")
+    report_df = format_table(report_df)
 
     report_df = report_df.rename(columns={
         'site_url': 'Property',
@@ -11,31 +11,12 @@ from datetime import datetime
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def create_html_report(df, report_title, period_str, summary_data, limit=None, total_rows=None, search_type='web'):
     """Generates an HTML report from the DataFrame."""
-    df_html = df.copy()
-
     # Format numeric columns
-    df_html['clicks'] = pd.to_numeric(df_html['clicks'], errors='coerce').fillna(0).astype(int)
-    df_html['impressions'] = pd.to_numeric(df_html['impressions'], errors='coerce').fillna(0).astype(int)
-    df_html['ctr'] = pd.to_numeric(df_html['ctr'], errors='coerce').fillna(0.0)
-    
-    if 'position' in df_html.columns:
-        df_html['position'] = pd.to_numeric(df_html['position'], errors='coerce').fillna(0.0)
-    
-    if 'Query #' in df_html.columns:
-        df_html['Query #'] = pd.to_numeric(df_html['Query #'], errors='coerce').fillna(0).astype(int)
-
-    df_html['clicks'] = df_html['clicks'].apply(lambda x: f"{x:,}") 
-    df_html['impressions'] = df_html['impressions'].apply(lambda x: f"{x:,}") 
-    df_html['ctr'] = df_html['ctr'].apply(lambda x: f"{x:.2%}") 
-    
-    if 'position' in df_html.columns:
-        df_html['position'] = df_html['position'].apply(lambda x: f"{x:.2f}") 
-
-    if 'Query #' in df_html.columns:
-        df_html['Query #'] = df_html['Query #'].apply(lambda x: f"{x:,}")
+    df_html = format_table(df, {'clicks': 'int', 'impressions': 'int', 'ctr': 'percent', 'position': 'decimal', 'Query #': 'int'}, fill_value=0)
 
     truncation_alert_html = ""
     if limit is not None and total_rows is not None and total_rows > limit:
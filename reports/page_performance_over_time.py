@@ -12,6 +12,7 @@ from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
+from core.formatting import format_table
 
 def create_html_report(site_url, df, top_pages_list):
     """Generates the HTML report with Chart.js line charts."""
@@ -38,7 +39,7 @@ def create_html_report(site_url, df, top_pages_list):
     table_df = table_df.sort_values(by='Total Clicks', ascending=False).reset_index()
     
     # Make URLs clickable in the table
-    table_df['page'] = table_df['page'].apply(lambda x: f'<a href="{x}" target="_blank" class="text-break">{x}</a>')
+    table_df = format_table(table_df, {'page': 'link'})
     table_html = table_df.to_html(classes="table table-striped table-hover table-sm", border=0, index=False, escape=False)
 
     html_template = f"""
@@ -13,6 +13,7 @@ from urllib.parse import urlparse
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def find_covering_site(service, page_url):
     """
@@ -76,11 +77,7 @@ def create_html_report(page_url, site_url, start_date, end_date, df_combined):
     df_table = df_table.reset_index()
 
     # Format for display
-    df_html = df_table.copy()
-    df_html['clicks'] = df_html['clicks'].apply(lambda x: f"{int(x):,}")
-    df_html['impressions'] = df_html['impressions'].apply(lambda x: f"{int(x):,}")
-    df_html['ctr'] = df_html['ctr'].apply(lambda x: f"{x:.2%}")
-    df_html['position'] = df_html['position'].apply(lambda x: f"{x:.2f}")
+    df_html = format_table(df_table)
 
     table_html = df_html.to_html(classes="table table-striped table-hover", index=False, border=0)
 
@@ -25,6 +25,7 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 from jinja2 import Environment, FileSystemLoader
 
@@ -36,21 +37,9 @@ def create_html_report(page_title, current_period_str, previous_period_str, df_b
         if df.empty:
             return "<p>No data available for this section.</p>"
         
-        df = df.copy()
-        # Format CTR and Position columns first
-        for col_name in ['ctr_current', 'ctr_previous']:
-            if col_name in df.columns:
-                df[col_name] = df[col_name].apply(lambda x: f"{x:.2%}")
-        for col_name in ['position_current', 'position_previous']:
-            if col_name in df.columns:
-                df[col_name] = df[col_name].apply(lambda x: f"{x:.2f}")
-
-        # Format Clicks and Impressions columns with comma separators
-        for col in df.columns:
-            if 'clicks' in col or 'impressions' in col:
-                # Ensure the column is numeric before formatting
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                df[col] = df[col].apply(lambda x: f"{int(x):,}") # Format as integer with commas
+        # Format CTR and Position columns, then Clicks and Impressions columns with comma separators
+        df = format_table(df, {'ctr_current': 'percent', 'ctr_previous': 'percent', 'position_current': 'decimal', 'position_previous': 'decimal'})
+        df = format_table(df, {col: 'int' for col in df.columns if 'clicks' in col or 'impressions' in col}, fill_value=0)
 
         return df.to_html(classes="table table-striped table-hover", index=False, table_id=table_id, border=0)
 
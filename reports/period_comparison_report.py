@@ -16,6 +16,7 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 from jinja2 import Environment, FileSystemLoader
 
 def apply_delta_formatting(val, is_pct=False):
@@ -48,18 +49,9 @@ def create_html_report(page_title, current_period_str, previous_period_str, char
         if df.empty:
             return "<p>No data available for this section.</p>"
         
-        df = df.copy()
-        
-        # Format base metrics
-        for col_name in ['CTR (Current)', 'CTR (Previous)']:
-            if col_name in df.columns:
-                df[col_name] = df[col_name].apply(lambda x: f"{x:.2%}" if pd.notnull(x) else "-")
-        for col_name in ['Pos (Current)', 'Pos (Previous)']:
-            if col_name in df.columns:
-                df[col_name] = df[col_name].apply(lambda x: f"{x:.2f}" if pd.notnull(x) else "-")
-        for col in ['Clicks (Current)', 'Clicks (Previous)', 'Impr. (Current)', 'Impr. (Previous)']:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).apply(lambda x: f"{int(x):,}")
+        # Format base metrics; a query missing from one period has no CTR or position but zero clicks
+        df = format_table(df, {'CTR (Current)': 'percent', 'CTR (Previous)': 'percent', 'Pos (Current)': 'decimal', 'Pos (Previous)': 'decimal'})
+        df = format_table(df, dict.fromkeys(['Clicks (Current)', 'Clicks (Previous)', 'Impr. (Current)', 'Impr. (Previous)'], 'int'), fill_value=0)
 
         # Apply delta styling
         if 'Clicks Delta' in df.columns:
@@ -12,18 +12,12 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def create_html_report(df, report_title, period_str):
     """Generates an HTML report from the DataFrame."""
-    df_html = df.copy()
-
     # Format numeric columns
-    df_html['clicks'] = pd.to_numeric(df_html['clicks'], errors='coerce').fillna(0).apply(lambda x: f"{x:,.0f}")
-    df_html['impressions'] = pd.to_numeric(df_html['impressions'], errors='coerce').fillna(0).apply(lambda x: f"{x:,.0f}")
-    df_html['queries'] = pd.to_numeric(df_html['queries'], errors='coerce').fillna(0).apply(lambda x: f"{x:,.0f}")
-    df_html['pages'] = pd.to_numeric(df_html['pages'], errors='coerce').fillna(0).apply(lambda x: f"{x:,.0f}")
-    df_html['ctr'] = pd.to_numeric(df_html['ctr'], errors='coerce').fillna(0).apply(lambda x: f"{x:.2%}")
-    df_html['position'] = pd.to_numeric(df_html['position'], errors='coerce').fillna(0).apply(lambda x: f"{x:.2f}")
+    df_html = format_table(df, fill_value=0)
 
     table_html = df_html.to_html(classes="table table-striped table-hover", index=False, border=0)
 
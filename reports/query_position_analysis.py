@@ -12,14 +12,12 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
+from core.formatting import format_table
 
 def create_html_report(df, report_title, period_str):
     """Generates an HTML report with Chart.js visualizations."""
-    df_table = df.copy()
     # Format for table
-    for col in df_table.columns:
-        if ('clicks' in col or 'impressions' in col) and col != 'month':
-            df_table[col] = df_table[col].apply(lambda x: f"{x:,.0f}")
+    df_table = format_table(df, {col: 'int' for col in df.columns if ('clicks' in col or 'impressions' in col) and col != 'month'})
     
     report_body = df_table.to_html(classes="table table-striped table-hover", index=False, border=0)
     chart_data = df.sort_values(by='month').to_json(orient='records')
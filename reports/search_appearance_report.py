@@ -16,6 +16,7 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service, get_available_properties
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def create_html_report(df, report_title, date_range_str, site_url=None):
     """Generates the HTML report using the standard template."""
@@ -28,11 +29,7 @@ def create_html_report(df, report_title, date_range_str, site_url=None):
     report_df['position'] = pd.to_numeric(report_df['position'], errors='coerce').fillna(0)
 
     # Apply formatting for display
-    report_df_disp = report_df.copy()
-    report_df_disp['clicks'] = report_df_disp['clicks'].apply(lambda x: f"{x:,.0f}")
-    report_df_disp['impressions'] = report_df_disp['impressions'].apply(lambda x: f"{x:,.0f}")
-    report_df_disp['ctr'] = report_df_disp['ctr'].apply(lambda x: f"{x:.2%}")
-    report_df_disp['position'] = report_df_disp['position'].apply(lambda x: f"{x:.2f}")
+    report_df_disp = format_table(report_df)
 
     # Column renaming for readability
     rename_cols = {
@@ -12,21 +12,22 @@ from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.client import get_gsc_service
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 SEARCH_TYPES = ['web', 'image', 'video', 'news', 'discover', 'googleNews']
 
 def create_html_report(df, report_title, period_str):
     """Generates an HTML report from the DataFrame."""
-    df_html = df.copy()
-
-    # Format numeric columns
-    for col in df_html.columns:
+    # Format numeric columns (one set of metrics per search type, e.g. web_clicks)
+    columns = {}
+    for col in df.columns:
         if any(suffix in col for suffix in ['_clicks', '_impressions']):
-            df_html[col] = pd.to_numeric(df_html[col], errors='coerce').fillna(0).apply(lambda x: f"{x:,.0f}")
+            columns[col] = 'int'
         elif '_ctr' in col:
-            df_html[col] = pd.to_numeric(df_html[col], errors='coerce').fillna(0).apply(lambda x: f"{x:.2%}")
+            columns[col] = 'percent'
         elif '_position' in col:
-            df_html[col] = pd.to_numeric(df_html[col], errors='coerce').fillna(0).apply(lambda x: f"{x:.2f}")
+            columns[col] = 'decimal'
+    df_html = format_table(df, columns, fill_value=0)
 
     table_html = df_html.to_html(classes="table table-striped table-hover", index=False, border=0)
 
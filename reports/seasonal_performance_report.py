@@ -12,15 +12,13 @@ from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def create_seasonal_report_html(df, report_title, years_list):
     """Generates the HTML report for seasonal comparison."""
     
-    display_df = df.copy()
-    
     # Make URLs clickable and open in new window
-    if 'page' in display_df.columns:
-        display_df['page'] = display_df['page'].apply(lambda x: f'<a href="{x}" target="_blank" class="text-break">{x}</a>')
+    display_df = format_table(df, {'page': 'link'})
 
     table_html = display_df.to_html(classes="table table-striped table-hover", index=False, border=0, escape=False)
     
@@ -11,21 +11,26 @@ import numpy as np
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
-from core.cache import fetch_with_cache
+from core.cache import query_cache
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
+from core.formatting import format_table
+
+# How the spike table's columns are shown
+SPIKE_COLUMNS = {
+    'clicks': 'int',
+    'impressions': 'int',
+    'avg_clicks': 'number',
+    'avg_impressions': 'number',
+    'clicks_z_score': 'decimal',
+    'impressions_z_score': 'decimal',
+}
 
 def create_report_html(spikes_df, report_title, site_url, months_count):
     """Generates the HTML report for spikes."""
     if spikes_df.empty:
         return f"<html><head><title>{report_title}</title></head><body><h1>{report_title}</h1><p>No spikes detected.</p></body></html>"
 
-    display_df = spikes_df.copy()
-    display_df['clicks'] = display_df['clicks'].apply(lambda x: f"{x:,}")
-    display_df['impressions'] = display_df['impressions'].apply(lambda x: f"{x:,}")
-    display_df['avg_clicks'] = display_df['avg_clicks'].apply(lambda x: f"{x:,.2f}")
-    display_df['avg_impressions'] = display_df['avg_impressions'].apply(lambda x: f"{x:,.2f}")
-    display_df['clicks_z_score'] = display_df['clicks_z_score'].apply(lambda x: f"{x:.2f}" if not pd.isna(x) else "N/A")
-    display_df['impressions_z_score'] = display_df['impressions_z_score'].apply(lambda x: f"{x:.2f}" if not pd.isna(x) else "N/A")
+    display_df = format_table(spikes_df, SPIKE_COLUMNS, na_rep="N/A")
 
     table_html = display_df.to_html(classes="table table-striped table-hover", index=False, border=0)
     
@@ -62,35 +67,17 @@ def run_report(service, site_url, start_date, end_date, threshold=2.0, min_click
     """Executes the seasonal query spike report."""
     print(f"Running Seasonal Query Spike Report for {site_url} (target: {end_date}, threshold {threshold})...")
     
-    all_data_frames = []
     end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-    
-    first_of_end_month = end_dt.replace(day=1)
-    for i in range(16):
-        month_dt = first_of_end_month - relativedelta(months=i)
-        month_str = month_dt.strftime('%Y-%m')
-        
-        # Calculate start and end date for the month
-        m_start = month_dt.strftime('%Y-%m-%d')
-        import calendar
-        last_day = calendar.monthrange(month_dt.year, month_dt.month)[1]
-        m_end = f"{month_dt.year:04d}-{month_dt.month:02d}-{last_day:02d}"
-        if i == 0:
-            m_end = end_date
-        
-        # Use core cache
-        df_month = fetch_with_cache(service, site_url, m_start, m_end, ['query'], 'web')
-        
-        if df_month is not None and not df_month.empty:
-            df_month['month'] = month_str
-            df_month = df_month[['month', 'query', 'clicks', 'impressions']]
-            all_data_frames.append(df_month)
+    first_month_start = (end_dt.replace(day=1) - relativedelta(months=15)).strftime('%Y-%m-%d')
+
+    # One grouped query over the 16 monthly fragments rather than a DataFrame per month
+    df = query_cache(service, site_url, first_month_start, end_date, ['query'], 'web', by_month=True)
 
-    if not all_data_frames:
+    if df.empty:
         print("No data found.")
         return None
 
-    df = pd.concat(all_data_frames, ignore_index=True)
+    df = df[['month', 'query', 'clicks', 'impressions']]
     
     stats = df.groupby('query').agg({
         'clicks': ['mean', 'std', 'count'],
@@ -6,23 +6,82 @@ Refactored for modular GSC Exporter.
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gzip
 import pandas as pd
 from datetime import datetime
+from urllib.parse import urljoin, urlparse
+from xml.sax.saxutils import escape
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache, _get_monthly_chunks
 from core.date_utils import parse_standard_date_args, get_month_range_lookback
 
-def generate_xml_sitemap(urls):
-    """Generates a standard XML sitemap string."""
-    xml_header = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml_header += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-    
-    xml_body = ""
-    for url in urls:
-        xml_body += f"  <url>\n    <loc>{url}</loc>\n  </url>\n"
-        
-    xml_footer = '</urlset>'
-    return xml_header + xml_body + xml_footer
+# Sitemap protocol limits for a single sitemap file (the size is uncompressed)
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+SITEMAP_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_FOOTER = '</urlset>\n'
+
+# Characters the sitemap protocol requires to be entity-escaped in a <loc>
+_XML_ENTITIES = {'"': '&quot;', "'": '&apos;'}
+
+def _open_sitemap(path, gzip_output):
+    if gzip_output:
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+def write_sitemaps(urls, output_path, sitemap_base_url, gzip_output=False, max_urls=SITEMAP_MAX_URLS, max_bytes=SITEMAP_MAX_BYTES):
+    """
+    Streams urls into sitemap files, writing each entry as it goes rather than
+    building the document in memory. URLs are XML-escaped. A new file is
+    started whenever the next entry would break the protocol limits
+    (max_urls entries or max_bytes uncompressed), named output_path with
+    -1, -2, ... before the extension. If more than one file is needed, a
+    sitemap index listing them (under sitemap_base_url) is written to
+    output_path; otherwise the single sitemap takes that name. With
+    gzip_output the sitemap files are gzipped (.xml.gz); the index is not.
+    Returns (sitemap paths, index path or None).
+    """
+    root, _ = os.path.splitext(output_path)
+    suffix = '.xml.gz' if gzip_output else '.xml'
+    footer_bytes = len(SITEMAP_FOOTER.encode('utf-8'))
+    paths = []
+    f = None
+    count = size = 0
+    try:
+        for url in urls:
+            entry = f"  <url>\n    <loc>{escape(url, _XML_ENTITIES)}</loc>\n  </url>\n"
+            entry_bytes = len(entry.encode('utf-8'))
+            if f is None or count >= max_urls or size + entry_bytes + footer_bytes > max_bytes:
+                if f is not None:
+                    f.write(SITEMAP_FOOTER)
+                    f.close()
+                paths.append(f"{root}-{len(paths) + 1}{suffix}")
+                f = _open_sitemap(paths[-1], gzip_output)
+                f.write(SITEMAP_HEADER)
+                count, size = 0, len(SITEMAP_HEADER.encode('utf-8'))
+            f.write(entry)
+            count += 1
+            size += entry_bytes
+        if f is not None:
+            f.write(SITEMAP_FOOTER)
+    finally:
+        if f is not None:
+            f.close()
+
+    if len(paths) == 1:
+        single_path = root + suffix
+        os.replace(paths[0], single_path)
+        return [single_path], None
+
+    index_path = root + '.xml'
+    with open(index_path, 'w', encoding='utf-8') as index:
+        index.write('<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for path in paths:
+            loc = urljoin(sitemap_base_url, os.path.basename(path))
+            index.write(f"  <sitemap>\n    <loc>{escape(loc, _XML_ENTITIES)}</loc>\n  </sitemap>\n")
+        index.write('</sitemapindex>\n')
+    return paths, index_path
 
 def create_html_summary(site_url, start_date, end_date, monthly_stats, total_pages):
     """Generates an HTML summary report of the sitemap generation."""
@@ -85,8 +144,12 @@ def create_html_summary(site_url, start_date, end_date, monthly_stats, total_pag
 </html>
 """
 
-def run_report(service, site_url, start_date, end_date, min_impressions=0):
-    """Executes the sitemap generator report."""
+def run_report(service, site_url, start_date, end_date, min_impressions=0, gzip_output=False, sitemap_base_url=None):
+    """
+    Executes the sitemap generator report. Sitemaps beyond the protocol limits
+    are split and listed in a sitemap index; sitemap_base_url is where the
+    sitemap files will be published (default: the root of the site).
+    """
     print(f"Generating XML Sitemap for {site_url}...")
     
     # 1. Get Monthly Chunks for analysis
@@ -144,9 +207,10 @@ def run_report(service, site_url, start_date, end_date, min_impressions=0):
     html_path = os.path.join(output_dir, f"sitemap-summary{file_prefix}.html")
 
     # 4. Save XML
-    xml_content = generate_xml_sitemap(sorted_pages)
-    with open(xml_path, 'w', encoding='utf-8') as f:
-        f.write(xml_content)
+    if not sitemap_base_url:
+        first_url = urlparse(sorted_pages[0])
+        sitemap_base_url = f"{first_url.scheme}://{first_url.netloc}/"
+    sitemap_paths, index_path = write_sitemaps(sorted_pages, xml_path, sitemap_base_url, gzip_output)
     
     # 5. Save CSV
     pd.DataFrame(sorted_pages, columns=['url']).to_csv(csv_path, index=False)
@@ -156,7 +220,10 @@ def run_report(service, site_url, start_date, end_date, min_impressions=0):
     with open(html_path, 'w', encoding='utf-8') as f:
         f.write(html_content)
         
-    print(f"XML Sitemap saved to: {xml_path}")
+    if index_path:
+        print(f"XML Sitemap split into {len(sitemap_paths)} files, listed in the index: {index_path}")
+    else:
+        print(f"XML Sitemap saved to: {sitemap_paths[0]}")
     print(f"CSV URL list saved to: {csv_path}")
     print(f"HTML Summary saved to: {html_path}")
     return html_path
@@ -173,6 +240,8 @@ if __name__ == '__main__':
     parser.add_argument('--min-impressions', type=int, default=0, help='Minimum impressions to include a URL.')
     parser.add_argument('--last-month', action='store_true', help='Override lookback to use only last month.')
     parser.add_argument('--last-7-days', action='store_true', help='Override lookback to use only last 7 days.')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the sitemap files (.xml.gz).')
+    parser.add_argument('--sitemap-base-url', help='URL the sitemap files will be published under, used in the sitemap index (default: the root of the site).')
     
     args = parser.parse_args()
     
@@ -186,4 +255,4 @@ if __name__ == '__main__':
             end_date = latest.strftime('%Y-%m-%d')
             start_date, _ = get_month_range_lookback(end_date, args.lookback_months)
             
-        run_report(service, args.site_url, start_date, end_date, args.min_impressions)
+        run_report(service, args.site_url, start_date, end_date, args.min_impressions, args.gzip, args.sitemap_base_url)
@@ -12,15 +12,13 @@ from dateutil.relativedelta import relativedelta
 from core.naming import get_output_dir, get_filename_slug
 from core.cache import fetch_with_cache
 from core.date_utils import parse_standard_date_args
+from core.formatting import format_table
 
 def create_snapshot_html_report(page_title, period_str, summary_df, df_top_clicks, df_top_impressions, df_low_ctr, df_devices, df_countries):
     """Generates an HTML report from the snapshot analysis dataframes."""
     
     # Format and convert summary DataFrame to HTML
-    summary_df['Clicks'] = summary_df['Clicks'].apply(lambda x: f"{int(x):,}")
-    summary_df['Impressions'] = summary_df['Impressions'].apply(lambda x: f"{int(x):,}")
-    summary_df['CTR'] = summary_df['CTR'].apply(lambda x: f"{x:.2%}")
-    summary_df['Position'] = summary_df['Position'].apply(lambda x: f"{x:.2f}")
+    summary_df = format_table(summary_df, {'Clicks': 'int', 'Impressions': 'int', 'CTR': 'percent', 'Position': 'decimal'})
     summary_table_html = summary_df.to_html(classes="table table-striped table-hover", index=False, border=0, table_id="summary-table")
 
 
@@ -29,19 +27,10 @@ def create_snapshot_html_report(page_title, period_str, summary_df, df_top_click
         if df.empty:
             return "<p>No data available for this section.</p>"
         
-        df = df.copy()
-        # Custom styling for CTR and Position columns
-        if 'ctr' in df.columns:
-            df['ctr'] = df['ctr'].apply(lambda x: f"{x:.2%}")
-        if 'position' in df.columns:
-            df['position'] = df['position'].apply(lambda x: f"{x:.2f}")
-
-        # Add formatting for clicks and impressions
-        for col in df.columns:
-            if 'clicks' in col or 'impressions' in col:
-                # Ensure the column is numeric before formatting
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                df[col] = df[col].apply(lambda x: f"{int(x):,}") # Format as integer with commas
+        # Any clicks or impressions column is shown as a whole number with commas
+        columns = {col: 'int' for col in df.columns if 'clicks' in col or 'impressions' in col}
+        columns.update(ctr='percent', position='decimal')
+        df = format_table(df, columns, fill_value=0)
 
         return df.to_html(classes="table table-striped table-hover", index=False, table_id=table_id, border=0, float_format=float_format)
 
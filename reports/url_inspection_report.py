@@ -16,6 +16,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from core.naming import get_output_dir, get_filename_slug
 from core.date_utils import parse_standard_date_args
 from core.client import get_gsc_service, get_available_properties
+from core.inspection import inspect_urls, INSPECTION_FRESHNESS_DAYS
 
 def find_best_property(inspect_url, available_properties):
     """
@@ -150,19 +151,21 @@ def create_html_report(df, report_title, timestamp):
 </html>
 """
 
-def run_report(service, site_url, urls, site_list_name="report"):
-    """Executes the URL inspection report for a list of URLs."""
+def run_report(service, site_url, urls, site_list_name="report", freshness_days=INSPECTION_FRESHNESS_DAYS, workers=None):
+    """
+    Executes the URL inspection report for a list of URLs.
+    URLs are inspected concurrently within the property's quotas (see
+    core.inspection). URLs inspected within freshness_days are taken from the
+    local store, and URLs beyond today's quota are listed as deferred.
+    """
     print(f"Running URL Inspection Report for {len(urls)} URLs using property: {site_url}")
     
     request_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     current_date_str = datetime.now().strftime("%Y-%m-%d")
     
-    all_inspection_results = {}
-    
-    for url in urls:
-        print(f"Inspecting: {url}")
-        inspection_data = get_url_inspection_data(service, site_url, url)
-        all_inspection_results[url] = inspection_data
+    all_inspection_results, deferred = inspect_urls(service, site_url, urls, freshness_days, workers)
+    for url in deferred:
+        all_inspection_results[url] = {"error": "Deferred: the daily URL Inspection quota is used up. Re-run to resume."}
     
     # Paths
     slug = get_filename_slug(site_url)
@@ -196,6 +199,8 @@ if __name__ == '__main__':
     parser.add_argument('site_url_or_prop', nargs='?', help='GSC property OR a specific URL to inspect.')
     parser.add_argument('--url', help='Single URL to inspect (if first arg is the property).')
     parser.add_argument('--sites-file', help='File with a list of URLs to inspect.')
+    parser.add_argument('--freshness-days', type=float, default=INSPECTION_FRESHNESS_DAYS, help=f'Reuse results for URLs inspected within this many days (default {INSPECTION_FRESHNESS_DAYS:g}, 0 to always re-inspect).')
+    parser.add_argument('--workers', type=int, help='Number of concurrent inspections.')
     
     # Standard boilerplate for modular reports
     parser.add_argument('--start-date', help='Ignored for this report.')
@@ -223,7 +228,7 @@ if __name__ == '__main__':
         if args.site_url_or_prop:
             # Force all URLs in file to use the provided property
             site_url = normalize_property(args.site_url_or_prop, available_properties)
-            run_report(service, site_url, raw_urls)
+            run_report(service, site_url, raw_urls, freshness_days=args.freshness_days, workers=args.workers)
         else:
             # INTELLIGENT BATCH: Group URLs by their best property
             groups = defaultdict(list)
@@ -239,21 +244,21 @@ if __name__ == '__main__':
                 sys.exit(1)
                 
             for prop, urls in groups.items():
-                run_report(service, prop, urls)
+                run_report(service, prop, urls, freshness_days=args.freshness_days, workers=args.workers)
 
     # CASE 2: Single URL or Property provided via positional arg or --url
     elif args.site_url_or_prop:
         # User provided --url explicitly
         if args.url:
             site_url = normalize_property(args.site_url_or_prop, available_properties)
-            run_report(service, site_url, [args.url])
+            run_report(service, site_url, [args.url], freshness_days=args.freshness_days)
         else:
             # INTELLIGENT SINGLE: First arg is either a property or a specific URL
             prop = normalize_property(args.site_url_or_prop, available_properties)
             if prop in available_properties:
                 # It's a property. Inspect its root (if it's a URL-prefix property).
                 if prop.startswith('http'):
-                    run_report(service, prop, [prop])
+                    run_report(service, prop, [prop], freshness_days=args.freshness_days)
                 else:
                     print(f"Property '{prop}' is a domain property. Please provide a specific --url to inspect.")
             else:
@@ -261,7 +266,7 @@ if __name__ == '__main__':
                 best_prop = find_best_property(args.site_url_or_prop, available_properties)
                 if best_prop:
                     print(f"Intelligently detected property '{best_prop}' for URL '{args.site_url_or_prop}'")
-                    run_report(service, best_prop, [args.site_url_or_prop])
+                    run_report(service, best_prop, [args.site_url_or_prop], freshness_days=args.freshness_days)
                 else:
                     print(f"Error: Could not find an authorized GSC property for '{args.site_url_or_prop}'")
                     sys.exit(1)
@@ -6,7 +6,7 @@ defined in a text file. It defaults to a comprehensive set of monthly useful
 reports, but can also take a custom list of reports from a file.
 
 Usage:
-    python run-monthly-reports.py --sites-file <path_to_sites.txt> [--reports-file <path_to_reports.txt>]
+    python run-monthly-reports.py --sites-file <path_to_sites.txt> [--reports-file <path_to_reports.txt>] [--workers N]
 
 Example:
     python run-monthly-reports.py --sites-file site-lists/sites.txt
@@ -14,8 +14,10 @@ Example:
 
 import os
 import sys
-import subprocess
 import argparse
+from datetime import datetime
+from core import metrics
+from core.scheduler import build_jobs, run_jobs, print_summary, BATCH_WORKERS
 
 # Scripts to exclude from automated runs (usually require manual input or specific URLs)
 EXCLUDE_FROM_AUTO = [
@@ -50,11 +52,14 @@ def main():
 Example Usage:
   python run-monthly-reports.py --sites-file site-lists/sites.txt
   python run-monthly-reports.py --sites-file site-lists/sites.txt --reports-file reports.txt
+  python run-monthly-reports.py --sites-file site-lists/sites.txt --workers 8
 """
     )
     parser.add_argument('--sites-file', required=True, help='Path to a text file containing site URLs (one per line).')
     parser.add_argument('--reports-file', help='Optional path to a text file containing report script names to run.')
     parser.add_argument('--dry-run', action='store_true', help='Print the commands without executing them.')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help=f'Number of reports to run in parallel (default: {BATCH_WORKERS}, set by GSC_BATCH_WORKERS).')
+    parser.add_argument('--subprocess', action='store_true', help='Run each report in a fresh Python process instead of reusing worker processes.')
     
     # Capture any unknown arguments to pass them to the target scripts
     args, other_args = parser.parse_known_args()
@@ -93,65 +98,47 @@ Example Usage:
         print("Error: No reports to run.")
         return
 
+    missing = [report for report in reports_to_run if not os.path.exists(report)]
+    for report in missing:
+        print(f"[!] Warning: Script '{report}' not found. Skipping.")
+    reports_to_run = [report for report in reports_to_run if report not in missing]
+
+    # Since all reports are now standardised, we default to --last-month
+    # if no other date-related flag was provided by the user.
+    date_flags = ['--last-month', '--start-date', '--end-date', '--lookback-months']
+    script_args = list(other_args)
+    if not any(flag in other_args for flag in date_flags):
+        script_args.insert(0, '--last-month')
+
+    jobs = build_jobs(sites, reports_to_run, script_args)
+
     print(f"\n{'='*50}")
     print(f"Starting Monthly Reports Run")
     print(f"Sites: {len(sites)}")
     print(f"Reports: {len(reports_to_run)}")
+    print(f"Workers: {args.workers}")
     print(f"{'='*50}\n")
 
-    for site in sites:
-        print(f"\n{'#'*60}")
-        print(f"### SITE: {site}")
-        print(f"{'#'*60}")
-        
-        for report in reports_to_run:
-            if not os.path.exists(report):
-                print(f"\n[!] Warning: Script '{report}' not found. Skipping.")
-                continue
-            
-            print(f"\n>>> Executing {report} for {site}...")
-            
-            # Use sys.executable to ensure we use the same Python environment
-            # Set PYTHONPATH to the current directory so that 'core' can be found
-            env = os.environ.copy()
-            env["PYTHONPATH"] = os.getcwd()
-            
-            command = [sys.executable, report, site]
-            
-            # Since all reports are now standardised, we default to --last-month
-            # if no other date-related flag was provided by the user.
-            date_flags = ['--last-month', '--start-date', '--end-date', '--lookback-months']
-            
-            # Check if any date-related flag is already in other_args
-            has_date_flag = any(flag in other_args for flag in date_flags)
-            
-            if not has_date_flag:
-                command.append('--last-month')
-            
-            # Add any other flags provided by the user
-            command.extend(other_args)
-            
-            print(f"Command: {' '.join(command)}")
-            
-            if args.dry_run:
-                print("--- DRY RUN: Skipping execution ---")
-                continue
-            
-            try:
-                # Use subprocess.run to execute the script
-                # We don't use capture_output=True so the user can see progress in real-time
-                process = subprocess.run(command, env=env)
-                
-                if process.returncode == 0:
-                    print(f"--- SUCCESS: {report} completed for {site}")
-                else:
-                    print(f"--- FAILURE: {report} exited with code {process.returncode} for {site}")
-            except Exception as e:
-                print(f"--- ERROR: An unexpected error occurred while running {report}: {e}")
+    if args.dry_run:
+        for job in jobs:
+            print(f"Command: {' '.join(job.command)}")
+        print("--- DRY RUN: Skipping execution ---")
+        return
+
+    # Every worker appends its cache and API metrics to one file, summarised below
+    if not metrics.METRICS_FILE:
+        metrics.METRICS_FILE = os.path.join('output', 'account', f"batch-metrics-{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.jsonl")
+    os.environ['GSC_METRICS_FILE'] = metrics.METRICS_FILE
+
+    run_jobs(jobs, args.workers, in_process=not args.subprocess)
+    failed = print_summary(jobs)
+    metrics.print_metrics_summary(metrics.METRICS_FILE)
 
     print(f"\n{'='*50}")
     print(f"Monthly Reports Run Completed")
     print(f"{'='*50}\n")
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
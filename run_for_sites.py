@@ -14,12 +14,15 @@ Usage:
 
     # Pass additional arguments to the target script
     python run_for_sites.py reports/snapshot_report.py --sites-file site-lists/sites.txt --last-7-days
+
+    # Run four sites at a time
+    python run_for_sites.py reports/snapshot_report.py --sites-file site-lists/sites.txt --workers 4
 """
 
 import os
 import sys
-import subprocess
 import argparse
+from core.scheduler import build_jobs, run_jobs, print_summary, BATCH_WORKERS
 
 def main():
     """
@@ -34,6 +37,8 @@ def main():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('sites', nargs='*', default=[], help='A list of site URLs to process.')
     group.add_argument('--sites-file', help='Path to a text file containing a list of site URLs, one per line.')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help=f'Number of sites to process in parallel (default: {BATCH_WORKERS}, set by GSC_BATCH_WORKERS).')
+    parser.add_argument('--subprocess', action='store_true', help='Run each report in a fresh Python process instead of reusing worker processes.')
     
     # Capture any unknown arguments to pass them to the target script
     args, other_args = parser.parse_known_args()
@@ -61,30 +66,10 @@ def main():
 
     print(f"\nFound {len(sites_to_process)} properties to process with '{script_to_run}'.")
     
-    for site in sites_to_process:
-        print(f"\n{'='*20} Running for: {site} {'='*20}")
-        
-        # Construct the command for the subprocess
-        command = ['python', script_to_run, site] + other_args
-        
-        print(f"Executing command: {' '.join(command)}")
-        
-        try:
-            # Use subprocess.run
-            process = subprocess.run(
-                command, 
-                capture_output=False, 
-                text=True, 
-                check=False
-            )
-            
-            if process.returncode == 0:
-                print(f"\n----- Successfully completed for {site} -----")
-            else:
-                print(f"\n----- Script finished with a non-zero exit code ({process.returncode}) for {site} -----")
-
-        except Exception as e:
-            print(f"\nAn unexpected error occurred while running the script for {site}: {e}")
+    jobs = build_jobs(sites_to_process, [script_to_run], other_args)
+    run_jobs(jobs, args.workers, in_process=not args.subprocess)
+    if print_summary(jobs):
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,86 @@
+import re
+import numpy as np
+import pandas as pd
+from core import brand
+from core.brand import classify_query, classify_queries
+
+TERMS = {'acme', 'acme tools', 'c++', 'café'}
+QUERIES = [
+    'Acme drills', 'acmetools', 'buy ACME TOOLS online', 'learn c++', 'c++11 guide',
+    'the café menu', 'CAFÉ near me', 'cafés', 'acme-tools review', 'drills', '', 'acme', 'xacme'
+]
+
+def reference(query, terms):
+    pattern = r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\b'
+    return bool(re.search(pattern, query, re.IGNORECASE))
+
+def test_classify_queries_matches_the_word_boundary_regex():
+    expected = [reference(q, TERMS) for q in QUERIES]
+    assert [classify_query(q, TERMS) for q in QUERIES] == expected
+    assert classify_queries(pd.Series(QUERIES), TERMS).tolist() == expected
+
+def test_classify_queries_keeps_the_index_and_handles_missing_values():
+    queries = pd.Series(['acme', np.nan, 'drills', 'acme'], index=[10, 11, 12, 13])
+    result = classify_queries(queries, TERMS)
+    assert result.index.tolist() == [10, 11, 12, 13]
+    assert result.tolist() == [True, False, False, True]
+    assert classify_queries(queries, set()).tolist() == [False] * 4
+
+def test_each_term_set_is_compiled_once_and_queries_are_memoised(mocker):
+    brand._compile_brand_pattern.cache_clear()
+    mocker.patch.object(brand, '_classify_memo', {})
+    queries = pd.Series(['acme', 'drills'] * 1000)
+
+    classify_queries(queries, {'acme'})
+    classify_queries(queries, ['acme'])
+    assert brand._compile_brand_pattern.cache_info().misses == 1
+    assert brand._classify_memo[frozenset({'acme'})] == {'acme': True, 'drills': False}
+
+def use_brand_index(mocker, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path / 'cache'))
+    mocker.patch.object(brand, 'BRAND_INDEX_ENABLED', True)
+    mocker.patch.object(brand, '_classify_memo', {})
+    mocker.patch.object(brand, '_loaded_indexes', set())
+
+def test_resolved_terms_are_reused_until_the_term_file_changes(mocker, monkeypatch, tmp_path):
+    import os
+    from core.brand import get_brand_terms
+    use_brand_index(mocker, monkeypatch, tmp_path)
+    os.makedirs('config')
+    terms_file = os.path.join('config', 'brand-terms-example.txt')
+    with open(terms_file, 'w') as f:
+        f.write('acme\nacme tools\n')
+    resolve = mocker.spy(brand, '_resolve_brand_terms')
+
+    assert get_brand_terms('sc-domain:example.com') == {'acme', 'acme tools'}
+    assert get_brand_terms('sc-domain:example.com') == {'acme', 'acme tools'}
+    assert resolve.call_count == 1
+    assert os.path.exists(brand.get_brand_index_path('sc-domain:example.com'))
+
+    with open(terms_file, 'w') as f:
+        f.write('acme\nacme tools\nacme drills\n')
+    assert get_brand_terms('sc-domain:example.com') == {'acme', 'acme tools', 'acme drills'}
+    assert get_brand_terms('sc-domain:example.com', brand_terms=['widgets']) == {'widgets'}
+    assert resolve.call_count == 3
+
+def test_query_flags_persist_between_runs_and_reset_with_new_terms(mocker, monkeypatch, tmp_path):
+    use_brand_index(mocker, monkeypatch, tmp_path)
+    site = 'sc-domain:example.com'
+    queries = pd.Series(['acme drills', 'drills', np.nan])
+    db_path = brand.get_brand_index_path(site)
+    brand._save_resolved_terms(db_path, 'first', {'acme'})
+
+    assert classify_queries(queries, {'acme'}, site).tolist() == [True, False, False]
+
+    # A later run starts with an empty memo and takes the flags from the index
+    mocker.patch.object(brand, '_classify_memo', {})
+    mocker.patch.object(brand, '_loaded_indexes', set())
+    search = mocker.patch.object(brand, '_compile_brand_pattern')
+    assert classify_queries(queries, {'acme'}, site).tolist() == [True, False, False]
+    search.return_value.search.assert_not_called()
+
+    mocker.stop(search)
+    brand._save_resolved_terms(db_path, 'second', {'drills'})
+    assert brand._load_query_flags(db_path, brand._get_terms_hash(frozenset({'acme'}))) == {}
+    assert classify_queries(queries, {'drills'}, site).tolist() == [True, True, False]
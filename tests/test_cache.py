@@ -1,3 +1,4 @@
+import os
 import pytest
 import pandas as pd
 from datetime import date
@@ -29,7 +30,11 @@ def test_aggregation_logic(mocker):
     
     # Mock os.path.exists to always return True so it looks in "cache"
     mocker.patch('os.path.exists', return_value=True)
-    
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'csv'})
+    mocker.patch('core.datastore.DATASTORE_ENABLED', False)
+    # Each month has its metadata sidecar, so the fragments are complete
+    mocker.patch('core.cache._read_metadata', return_value={})
+
     # Mock pd.read_csv to return specific data for each month
     df1 = pd.DataFrame({
         'page': ['url1', 'url2'],
@@ -49,11 +54,11 @@ def test_aggregation_logic(mocker):
     result = fetch_with_cache(None, 'site', '2024-01-01', '2024-02-29', ['page'])
     
     assert len(result) == 2
-    # url1: 10 + 5 = 15 clicks, 100 + 50 = 150 impressions, (1+3)/2 = 2.0 pos
+    # url1: 10 + 5 = 15 clicks, 100 + 50 = 150 impressions, (1*100 + 3*50)/150 pos
     url1 = result[result['page'] == 'url1'].iloc[0]
     assert url1['clicks'] == 15
     assert url1['impressions'] == 150
-    assert url1['position'] == 2.0
+    assert url1['position'] == pytest.approx(250 / 150)
     assert url1['ctr'] == 0.1
 
 def test_fetch_from_api_feedback(mocker, capsys):
@@ -132,3 +137,501 @@ def test_fetch_from_api_timeout_retry(mocker, capsys):
     captured = capsys.readouterr()
     assert "Timeout occurred. Retrying (attempt 1/3)..." in captured.out
     assert "Retrieved 1 rows (total: 1) in " in captured.out
+
+def test_fetch_with_cache_concurrent_months(mocker, tmp_path):
+    import threading
+    import time as real_time
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mocker.patch('core.cache.PROPERTY_CONCURRENCY', 2)
+    mocker.patch('core.cache._property_semaphores', {})
+
+    active = {'now': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def fake_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=10000, max_rows=None, start_row=0):
+        with lock:
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+        real_time.sleep(0.05)
+        with lock:
+            active['now'] -= 1
+        yield 0, pd.DataFrame({'page': ['url1'], 'clicks': [1], 'impressions': [10], 'ctr': [0.1], 'position': [1.0]})
+
+    mock_fetch = mocker.patch('core.cache._iter_api_pages', side_effect=fake_pages)
+
+    result = fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-06-30', ['page'], max_workers=6)
+
+    assert mock_fetch.call_count == 6
+    # The per-property cap limits concurrency even with more workers available
+    assert active['max'] == 2
+    assert result.iloc[0]['clicks'] == 6
+    assert len(list((tmp_path / 'sc-domain.example.com').glob('*.json'))) == 6
+
+    # A second call is served entirely from the fragments written by the first
+    fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-06-30', ['page'])
+    assert mock_fetch.call_count == 6
+
+def test_fetch_from_api_does_not_return_partial_data(mocker):
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from core.cache import _fetch_from_api
+    mocker.patch('time.sleep')
+
+    mock_service = mocker.MagicMock()
+    page1_rows = [{'keys': ['page1'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 1.0}] * 10
+    server_error = HttpError(httplib2.Response({'status': 503}), b'Backend Error')
+    mock_service.searchanalytics.return_value.query.return_value.execute.side_effect = [{'rows': page1_rows}] + [server_error] * 10
+
+    with pytest.raises(HttpError):
+        _fetch_from_api(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], row_limit=10)
+
+def test_fetch_from_api_permission_error_returns_empty(mocker):
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from core.cache import _fetch_from_api
+
+    mock_service = mocker.MagicMock()
+    forbidden = HttpError(httplib2.Response({'status': 403}), b'Forbidden')
+    mock_service.searchanalytics.return_value.query.return_value.execute.side_effect = [forbidden]
+
+    df = _fetch_from_api(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'])
+    assert df.empty
+
+def _write_interrupted_download(tmp_path, params):
+    import json
+    from datetime import datetime
+    from core.storage import write_fragment
+
+    parts_dir = tmp_path / 'abc123.parts'
+    parts_dir.mkdir()
+    # Simulate a crash after the first page of 2 rows was committed
+    first_page = pd.DataFrame({'page': ['p1', 'p2'], 'clicks': [5, 4], 'impressions': [50, 40], 'ctr': [0.1, 0.1], 'position': [1.0, 2.0]})
+    write_fragment(first_page, str(parts_dir / 'part-000000000-2'))
+    # A second page that was written but never checkpointed
+    write_fragment(first_page, str(parts_dir / 'part-000000002-2'))
+    checkpoint = dict(params, next_start_row=2, rows=2, pages=1, updated_at=datetime.now().isoformat())
+    with open(tmp_path / 'abc123.checkpoint', 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    return parts_dir
+
+CHECKPOINT_PARAMS = {
+    'site_url': 'sc-domain:example.com',
+    'start_date': '2026-05-01',
+    'end_date': '2026-05-31',
+    'dimensions': ['page'],
+    'search_type': 'web'
+}
+
+def test_fetch_to_fragment_streams_and_resumes(mocker, tmp_path):
+    from core.cache import _fetch_to_fragment
+    from core.storage import read_fragment, fragment_exists
+
+    base_path = str(tmp_path / 'abc123')
+    parts_dir = _write_interrupted_download(tmp_path, CHECKPOINT_PARAMS)
+
+    mock_service = mocker.MagicMock()
+    mock_execute = mock_service.searchanalytics.return_value.query.return_value.execute
+    mock_execute.return_value = {'rows': [{'keys': ['p3'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 3.0}]}
+
+    rows = _fetch_to_fragment(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], 'web', None, base_path)
+
+    # Only the remaining rows were requested
+    body = mock_service.searchanalytics.return_value.query.call_args.kwargs['body']
+    assert body['startRow'] == 2
+    assert rows == 3
+    assert fragment_exists(base_path)
+    assert not parts_dir.exists()
+    assert not (tmp_path / 'abc123.checkpoint').exists()
+    assert read_fragment(base_path)['page'].tolist() == ['p1', 'p2', 'p3']
+
+def test_fetch_to_fragment_sweeps_interrupted_page_writes(mocker, tmp_path):
+    import json
+    from core.cache import _fetch_to_fragment
+    from core.storage import write_fragment
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+
+    base_path = str(tmp_path / 'abc123')
+    parts_dir = _write_interrupted_download(tmp_path, CHECKPOINT_PARAMS)
+    # A crash between writing a page and renaming it into place
+    write_fragment(pd.DataFrame({'page': ['p9'], 'clicks': [1]}), str(parts_dir / 'part-000000002-5.tmp'))
+
+    mock_service = mocker.MagicMock()
+    mock_execute = mock_service.searchanalytics.return_value.query.return_value.execute
+    mock_execute.return_value = {'rows': [{'keys': ['p3'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 3.0}]}
+
+    json_path = base_path + '.json'
+    rows = _fetch_to_fragment(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], 'web', None, base_path, json_path=json_path)
+
+    assert rows == 3
+    assert not parts_dir.exists()
+    assert not (tmp_path / 'abc123.checkpoint').exists()
+    with open(json_path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['row_count'] == 3
+
+def test_fetch_to_fragment_ignores_mismatched_checkpoint(mocker, tmp_path):
+    from core.cache import _fetch_to_fragment
+
+    base_path = str(tmp_path / 'abc123')
+    _write_interrupted_download(tmp_path, dict(CHECKPOINT_PARAMS, search_type='image'))
+
+    mock_service = mocker.MagicMock()
+    mock_execute = mock_service.searchanalytics.return_value.query.return_value.execute
+    mock_execute.return_value = {'rows': [{'keys': ['p3'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 3.0}]}
+
+    rows = _fetch_to_fragment(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], 'web', None, base_path)
+
+    body = mock_service.searchanalytics.return_value.query.call_args.kwargs['body']
+    assert body['startRow'] == 0
+    assert rows == 1
+
+def test_fetch_to_fragment_checkpoints_each_page(mocker, tmp_path):
+    import json
+    import threading
+    from core.cache import _fetch_to_fragment, FetchCancelled, find_checkpoints
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    site_dir = tmp_path / 'sc-domain.example.com'
+    site_dir.mkdir()
+    base_path = str(site_dir / 'abc123')
+
+    mock_service = mocker.MagicMock()
+    mock_execute = mock_service.searchanalytics.return_value.query.return_value.execute
+    mock_execute.return_value = {'rows': [{'keys': ['p1'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 3.0}] * 10000}
+
+    # Cancel after the first page, as a Ctrl-C would
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(FetchCancelled):
+        _fetch_to_fragment(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], 'web', None, base_path, cancel_event)
+
+    checkpoints = find_checkpoints('sc-domain:example.com')
+    assert len(checkpoints) == 1
+    assert checkpoints[0]['next_start_row'] == 10000
+    assert checkpoints[0]['pages'] == 1
+
+def test_fetch_with_cache_prime_only(mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mock_read = mocker.patch('core.cache.read_fragment')
+
+    def fake_pages(*args, **kwargs):
+        yield 0, pd.DataFrame({'page': ['url1'], 'clicks': [1], 'impressions': [10], 'ctr': [0.1], 'position': [1.0]})
+
+    mocker.patch('core.cache._iter_api_pages', side_effect=fake_pages)
+
+    result = fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-02-29', ['page'], load=False)
+    assert result is None
+    assert mock_read.call_count == 0
+    assert len(list((tmp_path / 'sc-domain.example.com').glob('*.json'))) == 2
+
+def test_iter_api_pages_adapts_page_size(mocker):
+    import socket
+    from core.cache import _iter_api_pages
+    mocker.patch('time.sleep')
+
+    mock_service = mocker.MagicMock()
+    mock_query = mock_service.searchanalytics.return_value.query
+
+    def row(i):
+        return {'keys': [f'page{i}'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 1.0}
+
+    mock_query.return_value.execute.side_effect = [
+        socket.timeout("Timeout!"),
+        {'rows': [row(i) for i in range(4000)]},
+        {'rows': [row(i) for i in range(8000)]},
+        {'rows': [row(i) for i in range(10)]}
+    ]
+
+    pages = list(_iter_api_pages(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], row_limit=8000))
+
+    requested = [c.kwargs['body']['rowLimit'] for c in mock_query.call_args_list]
+    # Shrinks after the timeout, then grows back to the maximum
+    assert requested == [8000, 4000, 8000, 8000]
+    assert [start for start, _ in pages] == [0, 4000, 12000]
+
+def test_iter_api_pages_stops_at_max_rows(mocker):
+    from core.cache import _iter_api_pages
+
+    mock_service = mocker.MagicMock()
+    mock_query = mock_service.searchanalytics.return_value.query
+    page = {'rows': [{'keys': ['page1'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 1.0}] * 25000}
+    mock_query.return_value.execute.side_effect = [page, {'rows': page['rows'][:5000]}]
+
+    pages = list(_iter_api_pages(mock_service, 'sc-domain:example.com', '2026-05-01', '2026-05-31', ['page'], max_rows=30000))
+
+    requested = [c.kwargs['body']['rowLimit'] for c in mock_query.call_args_list]
+    assert requested == [25000, 5000]
+    assert sum(len(df) for _, df in pages) == 30000
+
+def _cache_fragment(site_url, s_str, e_str, dimensions, df, max_rows=None):
+    from core.cache import _get_cache_key, _get_cache_paths, _write_metadata
+    from core.storage import write_fragment
+    base_path, json_path = _get_cache_paths(_get_cache_key(site_url, s_str, e_str, dimensions, 'web'), site_url)
+    write_fragment(df, base_path)
+    _write_metadata(json_path, site_url, s_str, e_str, dimensions, 'web', len(df), max_rows)
+
+def test_fetch_with_cache_rolls_up_finer_fragment(mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mock_fetch = mocker.patch('core.cache._iter_api_pages')
+    _cache_fragment('sc-domain:example.com', '2024-01-01', '2024-01-31', ['date', 'page'], pd.DataFrame({
+        'date': ['2024-01-01', '2024-01-02', '2024-01-01'],
+        'page': ['url1', 'url1', 'url2'],
+        'clicks': [10, 30, 5],
+        'impressions': [100, 300, 50],
+        'ctr': [0.1, 0.1, 0.1],
+        'position': [1.0, 3.0, 4.0]
+    }))
+
+    result = fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'])
+
+    assert mock_fetch.call_count == 0
+    url1 = result[result['page'] == 'url1'].iloc[0]
+    assert url1['clicks'] == 40
+    assert url1['impressions'] == 400
+    # Impression-weighted: (1 * 100 + 3 * 300) / 400
+    assert url1['position'] == 2.5
+    assert url1['ctr'] == 0.1
+    assert not result.attrs.get('approximate')
+    # The derived fragment is cached under its own key
+    assert len(list((tmp_path / 'sc-domain.example.com').glob('*.json'))) == 2
+
+def test_fetch_with_cache_approximate_rollup_is_opt_in(mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+
+    def fake_pages(*args, **kwargs):
+        yield 0, pd.DataFrame({'query': ['q1'], 'clicks': [7], 'impressions': [70], 'ctr': [0.1], 'position': [1.0]})
+
+    mock_fetch = mocker.patch('core.cache._iter_api_pages', side_effect=fake_pages)
+    _cache_fragment('sc-domain:example.com', '2024-01-01', '2024-01-31', ['query', 'page'], pd.DataFrame({
+        'query': ['q1', 'q1'],
+        'page': ['url1', 'url2'],
+        'clicks': [10, 5],
+        'impressions': [100, 50],
+        'ctr': [0.1, 0.1],
+        'position': [1.0, 4.0]
+    }))
+
+    # Dropping 'page' changes GSC's aggregation, so it is only used when allowed
+    approx = fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['query'], allow_approximate=True)
+    assert mock_fetch.call_count == 0
+    assert approx.attrs['approximate']
+    assert approx.iloc[0]['clicks'] == 15
+    assert approx.iloc[0]['position'] == 2.0
+
+    result = fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['query'])
+    assert mock_fetch.call_count == 1
+    assert result.iloc[0]['clicks'] == 7
+
+def test_plan_rollup_flags_truncated_source(tmp_path, mocker):
+    from core.cache import _plan_rollup
+    mocker.patch('core.cache.fragment_exists', return_value=True)
+    metadata = {
+        'site_url': 'sc-domain:example.com', 'start_date': '2024-01-01', 'end_date': '2024-01-31',
+        'dimensions': ['date', 'page'], 'search_type': 'web', 'row_count': 1000, 'max_rows': 1000
+    }
+    plan = _plan_rollup([('abc', metadata)], 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], 'web')
+    assert not plan['exact']
+    assert plan['reasons'] == ['source may be truncated']
+
+    # Sidecars written before max_rows was recorded may describe capped fetches
+    legacy = {k: v for k, v in metadata.items() if k not in ('row_count', 'max_rows')}
+    plan = _plan_rollup([('abc', legacy)], 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], 'web')
+    assert not plan['exact']
+
+    metadata = dict(metadata, max_rows=None)
+    assert _plan_rollup([('abc', metadata)], 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], 'web')['exact']
+
+    # searchAppearance rows overlap and can never be summed away
+    metadata = dict(metadata, dimensions=['searchAppearance', 'page'])
+    assert _plan_rollup([('abc', metadata)], 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], 'web') is None
+
+def test_aggregate_metrics_weights_position_by_impressions():
+    from core.cache import aggregate_metrics
+    df = pd.DataFrame({
+        'page': ['url1', 'url1', 'url2', 'url2'],
+        'query': ['q1', 'q2', 'q1', 'q1'],
+        'clicks': [1, 9, 0, 0],
+        'impressions': [10, 1000000, 0, 0],
+        'position': [50.0, 2.0, 4.0, 6.0]
+    })
+
+    result = aggregate_metrics(df, ['page'], unique_queries=('query', 'nunique')).set_index('page')
+
+    assert list(result.columns) == ['clicks', 'impressions', 'ctr', 'position', 'unique_queries']
+    assert result.loc['url1', 'position'] == pytest.approx((50 * 10 + 2 * 1000000) / 1000010)
+    assert result.loc['url1', 'ctr'] == pytest.approx(10 / 1000010)
+    assert result.loc['url1', 'unique_queries'] == 2
+    # Groups without impressions fall back to the plain mean
+    assert result.loc['url2', 'position'] == 5.0
+
+    totals = aggregate_metrics(df, [])
+    assert len(totals) == 1
+    assert totals.iloc[0]['clicks'] == 10
+
+def _daily_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=None, max_rows=None, start_row=0):
+    yield 0, pd.DataFrame({'page': ['url1'], 'clicks': [1], 'impressions': [10], 'ctr': [0.1], 'position': [2.0]})
+
+def test_rolling_window_in_open_month_fetches_only_new_days(mocker, tmp_path):
+    from datetime import timedelta
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mock_fetch = mocker.patch('core.cache._iter_api_pages', side_effect=_daily_pages)
+    end = date.today() - timedelta(days=3)
+
+    result = fetch_with_cache(None, 'sc-domain:example.com', end - timedelta(days=6), end, ['page'])
+    assert mock_fetch.call_count == 7
+    assert result.iloc[0]['clicks'] == 7
+
+    # The next day's window only fetches the new day
+    result = fetch_with_cache(None, 'sc-domain:example.com', end - timedelta(days=5), end + timedelta(days=1), ['page'])
+    assert mock_fetch.call_count == 8
+    assert result.iloc[0]['clicks'] == 7
+    assert mock_fetch.call_args.args[2] == mock_fetch.call_args.args[3] == str(end + timedelta(days=1))
+
+def test_freshness_policy():
+    from datetime import datetime, timedelta
+    from core.cache import get_freshness
+    now = datetime.now()
+    recent = {'start_date': str(date.today() - timedelta(days=8)), 'end_date': str(date.today() - timedelta(days=2))}
+
+    assert get_freshness(dict(recent, fetched_at=now.isoformat())) == 'fresh'
+    # Still being revised: served while it is refreshed
+    assert get_freshness(dict(recent, fetched_at=(now - timedelta(days=2)).isoformat())) == 'stale'
+
+    # Fetched on day 2 of a month which has since settled
+    old = {'start_date': '2024-01-01', 'end_date': '2024-01-31'}
+    assert get_freshness(dict(old, fetched_at='2024-01-02T09:00:00')) == 'expired'
+    assert get_freshness(dict(old, fetched_at='2024-02-03T09:00:00')) == 'settled'
+    assert get_freshness(old) == 'settled'
+
+def test_expired_fragments_are_refetched_and_stale_ones_refreshed_in_background(mocker, tmp_path):
+    from datetime import timedelta
+    from core.cache import _get_cache_key, _get_cache_paths, _write_metadata
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mock_fetch = mocker.patch('core.cache._iter_api_pages', side_effect=_daily_pages)
+    mock_background = mocker.patch('core.cache._refresh_in_background')
+    site = 'sc-domain:example.com'
+    _cache_fragment(site, '2024-01-01', '2024-01-31', ['page'], pd.DataFrame({'page': ['url1'], 'clicks': [9], 'impressions': [10], 'ctr': [0.9], 'position': [1.0]}))
+    _, json_path = _get_cache_paths(_get_cache_key(site, '2024-01-01', '2024-01-31', ['page'], 'web'), site)
+    _write_metadata(json_path, site, '2024-01-01', '2024-01-31', ['page'], 'web', 1, None, fetched_at='2024-01-02T09:00:00')
+
+    result = fetch_with_cache(None, site, '2024-01-01', '2024-01-31', ['page'])
+    assert mock_fetch.call_count == 1
+    assert result.iloc[0]['clicks'] == 1
+
+    day = str(date.today() - timedelta(days=1))
+    _cache_fragment(site, day, day, ['page'], pd.DataFrame({'page': ['url1'], 'clicks': [9], 'impressions': [10], 'ctr': [0.9], 'position': [1.0]}))
+    _, json_path = _get_cache_paths(_get_cache_key(site, day, day, ['page'], 'web'), site)
+    _write_metadata(json_path, site, day, day, ['page'], 'web', 1, None, fetched_at=(date.today() - timedelta(days=1)).isoformat())
+
+    result = fetch_with_cache(None, site, day, day, ['page'])
+    assert mock_fetch.call_count == 1
+    assert mock_background.call_count == 1
+    assert result.iloc[0]['clicks'] == 9
+
+def test_closed_month_is_merged_from_settled_days(mocker, tmp_path):
+    import json
+    from datetime import timedelta
+    from core.cache import _get_fragment_chunks
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mock_fetch = mocker.patch('core.cache._iter_api_pages')
+    day = date(2024, 2, 1)
+    while day.month == 2:
+        _cache_fragment('sc-domain:example.com', str(day), str(day), ['page'], pd.DataFrame({
+            'page': ['url1', 'url2'], 'clicks': [2, 1], 'impressions': [10, 10], 'ctr': [0.2, 0.1], 'position': [1.0, 3.0]
+        }))
+        day += timedelta(days=1)
+
+    # Closed months are cached as a single fragment
+    assert _get_fragment_chunks('2024-02-01', '2024-02-29') == [(date(2024, 2, 1), date(2024, 2, 29))]
+    result = fetch_with_cache(None, 'sc-domain:example.com', '2024-02-01', '2024-02-29', ['page'])
+
+    assert mock_fetch.call_count == 0
+    assert result['clicks'].tolist() == [58, 29]
+    merged = [json.loads(p.read_text()) for p in (tmp_path / 'sc-domain.example.com').glob('*.json')]
+    assert [m['derived_from'] for m in merged if m['start_date'] != m['end_date']] == ['daily']
+
+def test_concurrent_fetches_of_a_key_are_single_flight(mocker, tmp_path):
+    import threading
+    import time
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mocker.patch('core.datastore.DATASTORE_ENABLED', False)
+    mocker.patch('core.memo.MEMO_ENABLED', False)
+    calls = []
+
+    def slow_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=None, max_rows=None, start_row=0):
+        calls.append(start_date)
+        time.sleep(0.3)
+        yield 0, pd.DataFrame({'page': ['url1'], 'clicks': [3], 'impressions': [10], 'ctr': [0.3], 'position': [1.0]})
+
+    mocker.patch('core.cache._iter_api_pages', side_effect=slow_pages)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page']))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ['2024-01-01']
+    assert [r.iloc[0]['clicks'] for r in results] == [3, 3, 3]
+
+def test_fragment_lock_is_held_across_processes(mocker, tmp_path):
+    import fcntl
+    import threading
+    from core.cache import fragment_lock, _is_fragment_locked, _get_lock_path, FetchCancelled
+    base_path = str(tmp_path / 'sc-domain.example.com' / ('a' * 32))
+    assert not _is_fragment_locked(base_path)
+
+    with fragment_lock(base_path):
+        assert _is_fragment_locked(base_path)
+    assert not _is_fragment_locked(base_path)
+
+    # A lock taken on a separate open file behaves like another process holding it
+    with open(_get_lock_path(base_path), 'a') as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with pytest.raises(FetchCancelled):
+            with fragment_lock(base_path, cancel_event):
+                pass
+
+def test_orphaned_fragments_are_refetched_and_reported(mocker, tmp_path):
+    from core.cache import _get_cache_key, _get_cache_paths, find_orphaned_fragments
+    from core.storage import write_fragment
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mocker.patch('core.datastore.DATASTORE_ENABLED', False)
+    mock_fetch = mocker.patch('core.cache._iter_api_pages', side_effect=lambda *a, **k: iter([(0, pd.DataFrame({
+        'page': ['url1'], 'clicks': [5], 'impressions': [10], 'ctr': [0.5], 'position': [1.0]
+    }))]))
+    site = 'sc-domain:example.com'
+    stale_df = pd.DataFrame({'page': ['url1'], 'clicks': [1], 'impressions': [10], 'ctr': [0.1], 'position': [1.0]})
+
+    # A data file whose sidecar was never written, as after a crash mid-commit
+    base_path, json_path = _get_cache_paths(_get_cache_key(site, '2024-01-01', '2024-01-31', ['page'], 'web'), site)
+    data_path = write_fragment(stale_df, base_path)
+    other_base, other_json = _get_cache_paths(_get_cache_key(site, '2024-02-01', '2024-02-29', ['page'], 'web'), site)
+    with open(other_json, 'w') as f:
+        f.write('{}')
+    write_fragment(stale_df, base_path + '.tmp')
+
+    orphans = dict(find_orphaned_fragments(site))
+    assert orphans[data_path].startswith('Data file without metadata')
+    assert orphans[other_json] == 'Metadata without a data file'
+    assert any(path.startswith(base_path + '.tmp') for path in orphans)
+
+    result = fetch_with_cache(None, site, '2024-01-01', '2024-01-31', ['page'])
+    assert mock_fetch.call_count == 1
+    assert result.iloc[0]['clicks'] == 5
+    assert os.path.exists(json_path)
+    assert data_path not in dict(find_orphaned_fragments(site))
+
+def test_metadata_is_replaced_atomically(mocker, tmp_path):
+    import json
+    from core.cache import _write_metadata
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    json_path = str(tmp_path / 'fragment.json')
+    _write_metadata(json_path, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], 'web', 1, None)
+
+    mocker.patch('core.cache.json.dump', side_effect=OSError('disk full'))
+    with pytest.raises(OSError):
+        _write_metadata(json_path, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], 'web', 2, None)
+
+    with open(json_path) as f:
+        assert json.load(f)['row_count'] == 1
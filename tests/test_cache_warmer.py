@@ -30,7 +30,8 @@ def test_warm_site(mocker):
         '2026-05-31', 
         ['date'], 
         label="Warming Daily Totals",
-        max_rows=None
+        max_rows=None,
+        load=False
     )
     
     # Check the granular mapping call
@@ -41,7 +42,8 @@ def test_warm_site(mocker):
         '2026-05-31', 
         ['page', 'query'], 
         label="Warming Page-Query Mapping (Granular)",
-        max_rows=100000
+        max_rows=100000,
+        load=False
     )
 
 def test_warm_site_with_adjustment(mocker):
@@ -72,7 +74,8 @@ def test_warm_site_with_adjustment(mocker):
         '2026-05-31', 
         ['date'], 
         label="Warming Daily Totals",
-        max_rows=None
+        max_rows=None,
+        load=False
     )
 
 def test_warm_site_no_complete_months(mocker):
@@ -119,7 +122,8 @@ def test_warm_site_with_custom_dates(mocker):
         '2026-04-30', 
         ['date'], 
         label="Warming Daily Totals",
-        max_rows=None
+        max_rows=None,
+        load=False
     )
 
 def test_parse_month():
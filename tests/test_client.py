@@ -0,0 +1,118 @@
+import os
+import json
+import threading
+import pytest
+from core import client
+
+# Saved before the fixture replaces it
+save_credentials = client._save_credentials
+
+@pytest.fixture(autouse=True)
+def reset_client(mocker):
+    mocker.patch.object(client, '_credentials', None)
+    mocker.patch.object(client, '_service', None)
+    mocker.patch.object(client, '_pooled_http', None)
+    mocker.patch.object(client, '_shared_service', None)
+    mocker.patch.object(client, '_thread_local', threading.local())
+    mocker.patch.object(client, '_save_credentials')
+
+class FakeCredentials:
+    def __init__(self):
+        self.valid = False
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.valid = True
+
+def test_service_and_discovery_are_built_once(mocker):
+    mock_load = mocker.patch.object(client, '_load_credentials', return_value=FakeCredentials())
+    mock_build = mocker.patch.object(client, 'build_from_document')
+
+    assert client.get_gsc_service() is client.get_gsc_service()
+    assert mock_load.call_count == 1
+    assert mock_build.call_count == 1
+    # The bundled document is used, so no discovery request is made
+    assert json.loads(mock_build.call_args.args[0])['name'] == 'searchconsole'
+
+def test_thread_services_share_credentials(mocker):
+    creds = FakeCredentials()
+    mocker.patch.object(client, '_load_credentials', return_value=creds)
+    mocker.patch.object(client, 'build_from_document', side_effect=lambda doc, http: object())
+
+    services = []
+    threads = [threading.Thread(target=lambda: services.append(client.get_thread_service())) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(s) for s in services}) == 3
+    assert client.get_thread_service() is client.get_thread_service()
+
+def test_concurrent_refreshes_are_serialised():
+    creds = client._lock_refresh(FakeCredentials())
+    threads = [threading.Thread(target=creds.refresh, args=(None,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert creds.refreshes == 1
+
+def test_pooled_transport_is_shared_between_threads(mocker):
+    from core.transport import PooledHttp
+    mocker.patch.object(client, 'use_pooled_transport', return_value=True)
+    creds = FakeCredentials()
+
+    http = client._get_http(creds)
+    assert isinstance(http, PooledHttp)
+    assert client._get_http(creds) is http
+
+    service = mocker.MagicMock(_http=http)
+    assert client.get_thread_http(service) is http
+
+def test_service_builds_with_pooled_transport(mocker):
+    from core.transport import PooledHttp
+    mocker.patch.object(client, 'use_pooled_transport', return_value=True)
+    mocker.patch.object(client, '_load_credentials', return_value=FakeCredentials())
+    mock_build = mocker.patch.object(client, 'build_from_document')
+
+    service = client.get_gsc_service()
+
+    assert service is client.get_gsc_service()
+    assert isinstance(mock_build.call_args.kwargs['http'], PooledHttp)
+    assert client.get_thread_http(mocker.MagicMock(_http=mock_build.call_args.kwargs['http'])) is client._pooled_http
+
+def test_pooled_http_translates_responses_and_timeouts(mocker):
+    import socket
+    import requests
+    from core.transport import PooledHttp
+    http = PooledHttp(FakeCredentials(), timeout=(1, 2))
+    response = mocker.MagicMock(status_code=429, content=b'{}', headers={'Content-Encoding': 'gzip', 'Retry-After': '3'})
+    mock_request = mocker.patch.object(http.session, 'request', return_value=response)
+
+    resp, content = http.request('https://example.com', method='POST', body='{}', headers={'a': 'b'})
+
+    assert resp.status == 429
+    assert resp['retry-after'] == '3'
+    assert 'content-encoding' not in resp
+    assert content == b'{}'
+    assert mock_request.call_args.kwargs['timeout'] == (1, 2)
+
+    mock_request.side_effect = requests.exceptions.ReadTimeout('slow')
+    with pytest.raises(socket.timeout):
+        http.request('https://example.com')
+
+def test_credentials_are_saved_atomically(mocker, tmp_path):
+    token_file = tmp_path / 'token.json'
+    token_file.write_text('{"token": "old"}')
+    mocker.patch.object(client, 'TOKEN_FILE', str(token_file))
+    mock_replace = mocker.spy(client.os, 'replace')
+    creds = mocker.MagicMock()
+    creds.to_json.return_value = '{"token": "new"}'
+
+    save_credentials(creds)
+
+    assert mock_replace.call_args.args[1] == str(token_file)
+    assert json.loads(token_file.read_text()) == {'token': 'new'}
+    assert os.listdir(tmp_path) == ['token.json']
@@ -0,0 +1,73 @@
+import os
+import pytest
+import pandas as pd
+from core import datastore
+from core.cache import fetch_with_cache, query_cache
+
+@pytest.fixture(autouse=True)
+def cache_dir(mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mocker.patch.object(datastore, 'DATASTORE_ENABLED', True)
+    return tmp_path
+
+def month_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=None, max_rows=None, start_row=0):
+    month = int(start_date[5:7])
+    yield 0, pd.DataFrame({
+        'page': ['url1', 'url2'],
+        'clicks': [month, 1],
+        'impressions': [month * 10, 10],
+        'ctr': [0.1, 0.1],
+        'position': [float(month), 5.0]
+    })
+
+def test_store_is_only_loaded_by_query_cache(mocker, cache_dir):
+    mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    db_path = os.path.join(str(cache_dir), datastore.DATASTORE_FILENAME)
+
+    fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'])
+    assert not os.path.exists(db_path)
+
+    query_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'])
+    catalogue = datastore.list_fragments(db_path, 'sc-domain:example.com')
+    assert catalogue['start_date'].tolist() == ['2024-01-01', '2024-02-01', '2024-03-01']
+    assert catalogue['row_count'].tolist() == [2, 2, 2]
+
+def test_deleted_fragments_are_pruned(mocker, cache_dir):
+    from core.cache import prune_datastore
+    from core.storage import get_fragment_data_files
+    mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    query_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'])
+    db_path = os.path.join(str(cache_dir), datastore.DATASTORE_FILENAME)
+
+    deleted_key = datastore.list_fragments(db_path)['cache_key'].iloc[0]
+    for path in get_fragment_data_files(str(cache_dir / 'sc-domain.example.com' / deleted_key)):
+        os.remove(path)
+
+    assert prune_datastore() == 1
+    assert deleted_key not in datastore.list_fragments(db_path)['cache_key'].tolist()
+
+def test_query_cache_pushes_down_filters_and_grouping(mocker):
+    mock_fetch = mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    spy = mocker.spy(datastore, 'query_metrics')
+
+    result = query_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'], filters={'page': 'url1'}, by_month=True)
+
+    assert mock_fetch.call_count == 3
+    assert spy.spy_return is not None
+    assert result['month'].tolist() == ['2024-01', '2024-02', '2024-03']
+    assert result['clicks'].tolist() == [1, 2, 3]
+
+    totals = query_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'], group_by=[]).iloc[0]
+    assert mock_fetch.call_count == 3
+    assert totals['clicks'] == 9
+    # (1*10 + 2*20 + 3*30 + 5*30) / 90
+    assert totals['position'] == pytest.approx(290 / 90)
+
+def test_query_cache_falls_back_to_fragments(mocker):
+    mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    stored = query_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'])
+
+    mocker.patch.object(datastore, 'DATASTORE_ENABLED', False)
+    fallback = query_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-03-31', ['page'])
+
+    pd.testing.assert_frame_equal(stored, fallback, check_dtype=False)
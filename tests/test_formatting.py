@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from core.formatting import format_column, format_table
+
+def test_format_table_matches_per_cell_formatting_of_metric_columns():
+    df = pd.DataFrame({
+        'page': ['/a', '/b', '/c', '/d'],
+        'clicks': [1234567, 0, 12, 1234567],
+        'impressions': [2500.5, 10.0, 999.0, 2500.5],
+        'ctr': [0.12345, 0.0, 1.0, 0.12345],
+        'position': [1.005, 10.0, 3.14159, 1.005]
+    })
+
+    result = format_table(df)
+
+    assert result['clicks'].tolist() == [f"{x:,.0f}" for x in df['clicks']]
+    assert result['impressions'].tolist() == [f"{x:,.0f}" for x in df['impressions']]
+    assert result['ctr'].tolist() == [f"{x:.2%}" for x in df['ctr']]
+    assert result['position'].tolist() == [f"{x:.2f}" for x in df['position']]
+    assert result['page'].tolist() == df['page'].tolist()
+    assert df['clicks'].dtype == np.int64
+
+def test_missing_values_use_na_rep_or_fill_value():
+    values = pd.Series([1.5, np.nan, 'n/a'], index=[5, 6, 7])
+    assert format_column(values, 'decimal').tolist() == ['1.50', '-', '-']
+    assert format_column(values, 'percent', fill_value=0).tolist() == ['150.00%', '0.00%', '0.00%']
+    assert format_column(values, '{:+.1f}', na_rep='N/A').index.tolist() == [5, 6, 7]
+
+def test_column_spec_skips_absent_columns_and_escapes_text():
+    df = pd.DataFrame({'page': ['/a?b=1&c=<2>'], 'avg_clicks': [1234.567]})
+    result = format_table(df, {'page': 'link', 'avg_clicks': 'number', 'queries': 'int'})
+    assert result['page'].iloc[0] == '<a href="/a?b=1&amp;c=&lt;2&gt;" target="_blank" class="text-break">/a?b=1&amp;c=&lt;2&gt;</a>'
+    assert result['avg_clicks'].iloc[0] == '1,234.57'
+    assert 'queries' not in result.columns
@@ -0,0 +1,44 @@
+import pandas as pd
+from core.grouped_tables import build_groups, split_groups, spread_top_rows, render_template
+
+DETAIL = pd.DataFrame({
+    'query': ['shoes', 'boots', 'shoes', 'socks', 'shoes', 'boots'],
+    'page': ['/a', '/b', '/c?x=1&y=<2>', '/d', '/e', '/f'],
+    'clicks': [1200, 40, 30, 5, 2, 1],
+    'impressions': [10000, 400, 300, 50, 20, 10],
+    'ctr': [0.12, 0.1, 0.1, 0.1, 0.1, 0.1],
+    'position': [1.234, 2.0, 3.0, 4.0, 5.0, 6.0]
+})
+
+def test_split_groups_matches_filtering_each_group():
+    keys = ['boots', 'shoes', 'missing']
+    frames = split_groups(DETAIL, 'query', keys, limit=2)
+    for key, frame in zip(keys, frames):
+        expected = DETAIL[DETAIL['query'] == key].head(2)
+        pd.testing.assert_frame_equal(frame, expected)
+
+def test_build_groups_formats_and_escapes_cells():
+    summary = pd.DataFrame({'query': ['shoes', 'boots'], 'total_clicks': [1232, 41]})
+    groups = build_groups(
+        summary, DETAIL, 'query', [('page', 'link'), ('clicks', 'int'), ('ctr', 'percent'), ('position', 'decimal')],
+        limit=2, summary_formats={'total_clicks': 'int'}
+    )
+
+    assert [(g['key'], g['count'], g['total_clicks']) for g in groups] == [('shoes', 2, '1,232'), ('boots', 2, '41')]
+    assert groups[0]['rows'].startswith('<tr><td><a href="/a" target="_blank" class="text-break">/a</a></td><td class="text-end">1,200</td>'
+                                        '<td class="text-end">12.00%</td><td class="text-end">1.23</td></tr>')
+    assert '/c?x=1&amp;y=&lt;2&gt;' in groups[0]['rows'] and '<2>' not in groups[0]['rows']
+
+    html = render_template(
+        'grouped-accordion.html', accordion_id='accordion-query', label_header='Query',
+        summary_headers=['Clicks'], summary_fields=['total_clicks'],
+        detail_headers=['page', 'clicks', 'ctr', 'position'], groups=groups
+    )
+    assert html.count('class="accordion-item"') == 2
+    assert 'data-bs-target="#accordion-query-1"' in html and '<strong>boots</strong>' in html
+
+def test_spread_top_rows_leaves_missing_ranks_empty():
+    wide = spread_top_rows(DETAIL, 'query', ['page', 'clicks'], 2)
+    assert wide.loc['shoes', ('page', 2)] == '/c?x=1&y=<2>'
+    assert pd.isna(wide.loc['socks', ('clicks', 2)])
+    assert list(wide.columns) == [('page', 1), ('page', 2), ('clicks', 1), ('clicks', 2)]
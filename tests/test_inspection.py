@@ -0,0 +1,75 @@
+import pytest
+from core import inspection
+
+SITE = 'https://www.example.com/'
+
+@pytest.fixture(autouse=True)
+def cache_dir(mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    mocker.patch.object(inspection, '_minute_budgets', {})
+    return tmp_path
+
+def make_service(mocker):
+    service = mocker.MagicMock()
+    inspect = service.urlInspection.return_value.index.return_value.inspect
+
+    def respond(body):
+        request = mocker.MagicMock()
+        request.execute.return_value = {'inspectionResult': {'indexStatusResult': {'verdict': 'PASS', 'url': body['inspectionUrl']}}}
+        return request
+
+    inspect.side_effect = respond
+    return service, inspect
+
+def test_inspect_urls_stores_results_and_skips_fresh_ones(mocker):
+    service, inspect = make_service(mocker)
+    urls = [f"{SITE}page-{i}" for i in range(5)]
+
+    results, deferred = inspection.inspect_urls(service, SITE, urls, workers=3)
+
+    assert deferred == []
+    assert list(results) == urls
+    assert results[urls[2]]['indexStatusResult']['url'] == urls[2]
+    assert inspect.call_count == 5
+
+    results, _ = inspection.inspect_urls(service, SITE, urls + [f"{SITE}new"])
+    assert inspect.call_count == 6
+    assert len(results) == 6
+
+    # A freshness window of zero always re-inspects
+    inspection.inspect_urls(service, SITE, urls[:1], freshness_days=0)
+    assert inspect.call_count == 7
+
+def test_inspect_urls_defers_beyond_daily_quota(mocker):
+    mocker.patch.object(inspection, 'INSPECTION_QUERIES_PER_DAY', 3)
+    service, inspect = make_service(mocker)
+    urls = [f"{SITE}page-{i}" for i in range(5)]
+
+    results, deferred = inspection.inspect_urls(service, SITE, urls)
+    assert list(results) == urls[:3]
+    assert deferred == urls[3:]
+
+    # The rest of the list waits for the next day's quota
+    mocker.patch.object(inspection, 'INSPECTION_QUERIES_PER_DAY', 6)
+    results, deferred = inspection.inspect_urls(service, SITE, urls)
+    assert len(results) == 5 and deferred == []
+    assert inspect.call_count == 5
+
+def test_daily_quota_is_shared_between_runs(cache_dir):
+    db_path = inspection.get_store_path(SITE)
+    assert inspection.reserve_daily_quota(db_path, 3, limit=5) == 3
+    assert inspection.reserve_daily_quota(db_path, 3, limit=5) == 2
+    assert inspection.reserve_daily_quota(db_path, 3, limit=5) == 0
+    inspection.release_daily_quota(db_path, 2)
+    assert inspection.reserve_daily_quota(db_path, 3, limit=5) == 2
+
+def test_failed_inspections_are_retried_next_run(mocker):
+    service, inspect = make_service(mocker)
+    inspect.side_effect = None
+    inspect.return_value.execute.side_effect = ValueError('boom')
+
+    results, _ = inspection.inspect_urls(service, SITE, [f"{SITE}a"])
+    assert results[f"{SITE}a"] == {'error': 'boom'}
+
+    inspection.inspect_urls(service, SITE, [f"{SITE}a"])
+    assert inspect.call_count == 2
@@ -0,0 +1,71 @@
+import os
+import json
+import pytest
+import pandas as pd
+from core import manifest
+from core.cache import fetch_with_cache, _load_fragment_index
+
+@pytest.fixture(autouse=True)
+def cache_dir(mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+def month_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=None, max_rows=None, start_row=0):
+    yield 0, pd.DataFrame({
+        'page': ['url1', 'url2'],
+        'clicks': [10, 1],
+        'impressions': [100, 10],
+        'ctr': [0.1, 0.1],
+        'position': [1.0, 5.0]
+    })
+
+def test_written_fragments_are_recorded(mocker, cache_dir):
+    mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-02-29', ['page'])
+    fetch_with_cache(None, 'https://www.other.com/', '2024-01-01', '2024-01-31', ['page'])
+
+    entries = manifest.load_manifest(str(cache_dir), 'sc-domain:example.com')
+    assert [e['metadata']['start_date'] for e in entries] == sorted(['2024-01-01', '2024-02-01'])
+    entry = entries[0]
+    assert entry['row_count'] == 2
+    assert entry['byte_size'] > 0 and entry['checksum']
+    assert os.path.exists(entry['json_path'])
+    assert len(manifest.load_manifest(str(cache_dir))) == 3
+
+    # The fragment index is answered from the manifest without reading any sidecar
+    mocker.patch('builtins.open', side_effect=AssertionError('sidecar opened'))
+    assert sorted(m['start_date'] for _, m in _load_fragment_index('sc-domain:example.com')) == ['2024-01-01', '2024-02-01']
+
+def test_missing_manifest_is_rebuilt_from_sidecars(mocker, cache_dir):
+    mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'])
+    for suffix in ('', '-wal', '-shm'):
+        path = manifest.get_manifest_path(str(cache_dir)) + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+    corrupted = os.path.join(str(cache_dir), 'sc-domain.example.com', 'broken.json')
+    with open(corrupted, 'w') as f:
+        f.write('{"start_date": ')
+
+    entries = manifest.load_manifest(str(cache_dir))
+    assert len(entries) == 2
+    broken = next(e for e in entries if e['json_path'] == corrupted)
+    assert broken['metadata'] is None and broken['error'].startswith('Corrupted JSON file')
+    fragment = next(e for e in entries if e['metadata'])
+    assert fragment['metadata']['dimensions'] == ['page']
+
+    manifest.remove_fragments(str(cache_dir), [corrupted])
+    assert [e['json_path'] for e in manifest.load_manifest(str(cache_dir))] == [fragment['json_path']]
+
+def test_existing_cache_is_indexed_by_the_first_write(cache_dir):
+    site_dir = os.path.join(str(cache_dir), 'sc-domain.example.com')
+    os.makedirs(site_dir)
+    with open(os.path.join(site_dir, 'old.json'), 'w') as f:
+        json.dump({'site_url': 'sc-domain:example.com', 'start_date': '2023-01-01', 'end_date': '2023-01-31', 'dimensions': ['page']}, f)
+    new_json = os.path.join(site_dir, 'new.json')
+    metadata = {'site_url': 'sc-domain:example.com', 'start_date': '2023-02-01', 'end_date': '2023-02-28', 'dimensions': ['page']}
+
+    manifest.record_fragment(str(cache_dir), new_json, metadata)
+
+    assert sorted(os.path.basename(e['json_path']) for e in manifest.load_manifest(str(cache_dir))) == ['new.json', 'old.json']
@@ -0,0 +1,49 @@
+import os
+import pytest
+import pandas as pd
+from core import memo
+from core.storage import write_fragment
+from core.memo import get_memo_key, get_fragments_fingerprint, memo_get, memo_put
+
+@pytest.fixture(autouse=True)
+def clear_memory(mocker):
+    mocker.patch.object(memo, '_memory', memo.OrderedDict())
+    mocker.patch.object(memo, '_memory_bytes', 0)
+    mocker.patch.object(memo, 'MEMO_ENABLED', True)
+
+@pytest.fixture
+def result_df():
+    return pd.DataFrame({'query': ['a', 'b'], 'clicks': [10, 5], 'impressions': [100, 50]})
+
+def test_memo_key_keeps_dimension_order():
+    key1 = get_memo_key('sc-domain:example.com', '2024-01-01', '2024-02-29', ['query', 'page'], 'web')
+    key2 = get_memo_key('sc-domain:example.com', '2024-01-01', '2024-02-29', ['page', 'query'], 'web')
+    assert key1 != key2
+
+def test_memo_memory_and_disk_hit(tmp_path, result_df):
+    fragment = str(tmp_path / 'fragment')
+    write_fragment(result_df, fragment)
+    fingerprint = get_fragments_fingerprint([fragment])
+    memo_dir = str(tmp_path / 'cache' / 'prop' / 'memo')
+
+    memo_put(memo_dir, 'key', fingerprint, result_df)
+    pd.testing.assert_frame_equal(memo_get(memo_dir, 'key', fingerprint), result_df)
+
+    # A new process starts with an empty memory but shares the disk store
+    memo._memory.clear()
+    pd.testing.assert_frame_equal(memo_get(memo_dir, 'key', fingerprint), result_df)
+
+def test_memo_invalidated_when_fragment_changes(tmp_path, result_df):
+    fragment = str(tmp_path / 'fragment')
+    write_fragment(result_df, fragment)
+    memo_dir = str(tmp_path / 'cache' / 'prop' / 'memo')
+    memo_put(memo_dir, 'key', get_fragments_fingerprint([fragment]), result_df)
+
+    write_fragment(pd.concat([result_df, result_df]), fragment)
+    assert memo_get(memo_dir, 'key', get_fragments_fingerprint([fragment])) is None
+
+def test_memo_not_persisted_for_single_chunk(tmp_path, result_df):
+    memo_dir = str(tmp_path / 'memo')
+    memo_put(memo_dir, 'key', 'fp', result_df, persist=False)
+    assert not os.path.exists(memo_dir)
+    assert memo_get(memo_dir, 'key', 'fp') is not None
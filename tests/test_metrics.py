@@ -0,0 +1,82 @@
+import sys
+import pytest
+import pandas as pd
+from core import metrics
+from core.cache import fetch_with_cache
+
+@pytest.fixture(autouse=True)
+def metrics_file(mocker, tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path / 'cache'))
+    mocker.patch('core.datastore.DATASTORE_ENABLED', False)
+    mocker.patch.object(metrics, 'METRICS_FILE', path)
+    mocker.patch.object(metrics, '_report', 'page_level_report.py')
+    return path
+
+def month_pages(service, site_url, start_date, end_date, dimensions, search_type='web', row_limit=None, max_rows=None, start_row=0):
+    yield 0, pd.DataFrame({
+        'page': ['url1', 'url2'],
+        'clicks': [10, 1],
+        'impressions': [100, 10],
+        'ctr': [0.1, 0.1],
+        'position': [1.0, 5.0]
+    })
+
+def test_fetch_with_cache_records_hits_misses_and_io(mocker, metrics_file):
+    mocker.patch('core.cache._iter_api_pages', side_effect=month_pages)
+    fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-02-29', ['page'])
+    fetch_with_cache(None, 'sc-domain:example.com', '2024-01-01', '2024-02-29', ['page'])
+
+    events = metrics.load_events(metrics_file)
+    assert {e['report'] for e in events} == {'page_level_report.py'}
+    assert {e['site_url'] for e in events} == {'sc-domain:example.com'}
+    totals = metrics.summarise(events)['page_level_report.py']
+    assert (totals['misses'], totals['hits'], totals['memo_hits']) == (2, 2, 1)
+    assert totals['bytes_written'] > 0 and totals['bytes_read'] > 0
+
+def test_api_pages_are_recorded_with_latency(mocker, metrics_file):
+    from core.cache import _fetch_from_api
+    service = mocker.MagicMock()
+    rows = [{'keys': ['page1'], 'clicks': 1, 'impressions': 10, 'ctr': 0.1, 'position': 1.0}]
+    service.searchanalytics.return_value.query.return_value.execute.side_effect = [{'rows': rows * 10}, {'rows': rows * 3}]
+
+    _fetch_from_api(service, 'sc-domain:example.com', '2024-01-01', '2024-01-31', ['page'], row_limit=10)
+
+    calls = [e for e in metrics.load_events(metrics_file) if e['event'] == 'api_call']
+    assert [c['rows'] for c in calls] == [10, 3]
+    assert all(c['latency'] >= 0 for c in calls)
+
+def test_summary_aggregates_processes_and_skips_partial_lines(metrics_file, capsys):
+    metrics.record('api_call', 'sc-domain:a.com', rows=100, latency=0.4)
+    metrics.record('cache_miss', 'sc-domain:a.com')
+    metrics.set_report('snapshot_report.py')
+    metrics.record('api_call', 'sc-domain:b.com', rows=5, latency=12.0)
+    metrics.record('throttled', 'sc-domain:b.com')
+    metrics.record('cache_hit', 'sc-domain:b.com')
+    with open(metrics_file, 'a') as f:
+        f.write('{"event": "api_ca')
+
+    assert metrics.latency_histogram([0.4, 12.0])[0] == ('<0.5s', 1)
+    metrics.print_metrics_summary(metrics_file)
+
+    out = capsys.readouterr().out
+    assert 'page_level_report.py' in out and 'snapshot_report.py' in out
+    assert 'sc-domain:b.com: 1 calls, 5 rows, 1 throttled' in out
+    assert '>=30s: 0' in out
+
+def test_in_process_jobs_tag_events_with_their_report(mocker, metrics_file, tmp_path):
+    from core.scheduler import _run_in_process
+    mocker.patch.object(metrics, '_report', None)
+    script = tmp_path / 'keyword_report.py'
+    script.write_text("from core import metrics\nif __name__ == '__main__':\n    metrics.record('cache_hit', 'sc-domain:a.com')\n")
+
+    _run_in_process([sys.executable, str(script)], stream=False)
+
+    assert [e['report'] for e in metrics.load_events(metrics_file)] == ['keyword_report.py']
+    assert metrics._report is None
+
+def test_nothing_is_recorded_without_a_metrics_file(mocker, metrics_file):
+    import os
+    mocker.patch.object(metrics, 'METRICS_FILE', None)
+    metrics.record('cache_hit', 'sc-domain:a.com')
+    assert not os.path.exists(metrics_file)
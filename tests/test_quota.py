@@ -0,0 +1,74 @@
+import pytest
+from core.quota import TokenBucket
+
+def test_token_bucket_burst_then_wait(mocker):
+    clock = {'now': 100.0}
+    mocker.patch('core.quota.time.monotonic', side_effect=lambda: clock['now'])
+
+    def fake_sleep(seconds):
+        clock['now'] += seconds
+
+    mock_sleep = mocker.patch('core.quota.time.sleep', side_effect=fake_sleep)
+
+    # 60 per minute = 1 token per second, burst of 2
+    bucket = TokenBucket(60, capacity=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert mock_sleep.call_count == 0
+
+    waited = bucket.acquire()
+    assert waited == pytest.approx(1.0)
+    assert mock_sleep.call_count == 1
+
+def _http_error(status, headers=None):
+    import httplib2
+    from googleapiclient.errors import HttpError
+    resp = httplib2.Response(dict({'status': status}, **(headers or {})))
+    return HttpError(resp, b'error')
+
+def _mock_service(mocker, side_effect):
+    service = mocker.MagicMock()
+    service.searchanalytics.return_value.query.return_value.execute.side_effect = side_effect
+    return service
+
+def test_execute_query_honours_retry_after(mocker):
+    from core.quota import execute_query, get_request_stats
+    mock_sleep = mocker.patch('core.quota.time.sleep')
+    before = get_request_stats()
+
+    service = _mock_service(mocker, [_http_error(503, {'retry-after': '7'}), {'rows': []}])
+    response = execute_query(service, 'sc-domain:retry.example.com', {})
+
+    assert response == {'rows': []}
+    mock_sleep.assert_called_once_with(7.0)
+    after = get_request_stats()
+    assert after['retried'] - before['retried'] == 1
+    assert after['requests'] - before['requests'] == 2
+
+def test_execute_query_throttling_slows_property_budget(mocker):
+    from core.quota import execute_query, get_property_budget, get_request_stats
+    mocker.patch('core.quota.time.sleep')
+    site = 'sc-domain:throttled.example.com'
+    before = get_request_stats()
+
+    service = _mock_service(mocker, [_http_error(429), {'rows': []}])
+    execute_query(service, site, {})
+
+    budget = get_property_budget(site)
+    assert budget.rate < budget.max_rate
+    assert get_request_stats()['throttled'] - before['throttled'] == 1
+
+def test_execute_query_gives_up(mocker):
+    from googleapiclient.errors import HttpError
+    from core.quota import execute_query, RETRY_ATTEMPTS
+    mocker.patch('core.quota.time.sleep')
+
+    service = _mock_service(mocker, [_http_error(500)] * RETRY_ATTEMPTS)
+    with pytest.raises(HttpError):
+        execute_query(service, 'sc-domain:down.example.com', {})
+
+    # Client errors are not retried
+    service = _mock_service(mocker, [_http_error(403)])
+    with pytest.raises(HttpError):
+        execute_query(service, 'sc-domain:down.example.com', {})
+    assert service.searchanalytics.return_value.query.return_value.execute.call_count == 1
@@ -74,7 +74,8 @@ def test_query_position_analysis_report(mock_service, mocker):
     assert os.path.exists(os.path.join(output_dir, f"query-position-analysis-{slug}-2026-05-01-to-2026-05-31.csv"))
     assert os.path.exists(os.path.join(output_dir, f"query-position-analysis-{slug}-2026-05-01-to-2026-05-31.html"))
 
-def test_url_inspection_report(mock_service, mocker):
+def test_url_inspection_report(mock_service, mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
     # Mock the response from urlInspection().index().inspect().execute()
     mock_response = {
         'inspectionResult': {
@@ -111,7 +112,8 @@ def test_url_inspection_report(mock_service, mocker):
     assert df.iloc[0]['URL'] == url_to_inspect
     assert df.iloc[0]['Verdict'] == 'NEUTRAL'
 
-def test_url_inspection_report_smart_detection(mock_service, mocker):
+def test_url_inspection_report_smart_detection(mock_service, mocker, tmp_path):
+    mocker.patch('core.cache.CACHE_DIR', str(tmp_path))
     # Mock available properties
     mocker.patch('reports.url_inspection_report.get_available_properties', 
                  return_value=['https://www.example.com/', 'sc-domain:example.com'])
@@ -157,3 +159,23 @@ def test_daily_performance_matrix_report(mock_service, mocker):
     assert os.path.exists(impressions_csv)
     assert os.path.exists(html_path)
 
+
+def test_sitemap_writer_escapes_splits_and_indexes(tmp_path):
+    import gzip
+    from reports.sitemap_generator import write_sitemaps
+    urls = [f'https://example.com/p{i}?a=1&b=<{i}>' for i in range(5)]
+
+    paths, index_path = write_sitemaps(urls, str(tmp_path / 'sitemap.xml'), 'https://example.com/maps/', max_urls=2)
+    assert [os.path.basename(p) for p in paths] == ['sitemap-1.xml', 'sitemap-2.xml', 'sitemap-3.xml']
+    first = open(paths[0], encoding='utf-8').read()
+    assert first.count('<url>') == 2 and '<loc>https://example.com/p0?a=1&amp;b=&lt;0&gt;</loc>' in first
+    index = open(index_path, encoding='utf-8').read()
+    assert '<loc>https://example.com/maps/sitemap-3.xml</loc>' in index
+
+    # A byte limit also splits, and a single file takes the plain name
+    paths, _ = write_sitemaps(urls, str(tmp_path / 'bytes.xml'), 'https://example.com/', max_bytes=400)
+    assert len(paths) > 1 and all(os.path.getsize(p) <= 400 for p in paths)
+    paths, index_path = write_sitemaps(urls, str(tmp_path / 'single.xml'), 'https://example.com/', gzip_output=True)
+    assert index_path is None and paths == [str(tmp_path / 'single.xml.gz')]
+    with gzip.open(paths[0], 'rt', encoding='utf-8') as f:
+        assert f.read().count('<url>') == 5
@@ -0,0 +1,82 @@
+import os
+import sys
+from core.scheduler import Job, build_jobs, run_jobs, print_summary, get_worker_env
+
+def test_build_jobs_orders_dependent_reports_per_site():
+    jobs = build_jobs(['site-a', 'site-b'], ['reports/historical_summary_report.py', 'reports/monthly_summary_report.py'], ['--last-month'])
+
+    assert len(jobs) == 4
+    historical = jobs[0]
+    assert historical.command == [sys.executable, 'reports/historical_summary_report.py', 'site-a', '--last-month']
+    # Only the monthly summary for the same site is a dependency
+    assert [(dep.site, dep.script) for dep in historical.depends_on] == [('site-a', 'reports/monthly_summary_report.py')]
+    assert jobs[1].depends_on == []
+
+def test_worker_env_splits_query_budget(mocker):
+    mocker.patch('core.scheduler.API_QUERIES_PER_MINUTE', 1200)
+    mocker.patch('core.scheduler.PROPERTY_QUERIES_PER_MINUTE', 1200)
+    env = get_worker_env(4)
+    assert env['GSC_QPM_LIMIT'] == '300'
+    assert env['GSC_PROPERTY_QPM_LIMIT'] == '300'
+
+def test_init_worker_splits_budgets(mocker):
+    from core import quota, memo
+    from core.scheduler import _init_worker
+    mocker.patch('core.scheduler.API_QUERIES_PER_MINUTE', 1200)
+    mocker.patch('core.scheduler.PROPERTY_QUERIES_PER_MINUTE', 1200)
+    mocker.patch.object(quota, 'PROPERTY_QUERIES_PER_MINUTE', 1200)
+    mocker.patch.object(quota, '_api_budget', None)
+    mocker.patch.object(memo, 'MEMORY_MAX_BYTES', 512 * 1024 * 1024)
+    mocker.patch('core.client.get_gsc_service')
+    mock_set = mocker.patch('core.client.set_shared_service')
+
+    _init_worker(4)
+
+    assert quota.PROPERTY_QUERIES_PER_MINUTE == 300
+    assert memo.MEMORY_MAX_BYTES == 128 * 1024 * 1024
+    assert mock_set.called
+
+def test_run_jobs_waits_for_dependencies_and_collects_exit_codes(tmp_path, capsys):
+    log = tmp_path / 'order.log'
+
+    def job(name, code, delay):
+        script = f"import time; time.sleep({delay}); open({str(log)!r}, 'a').write({name!r} + '\\n'); raise SystemExit({code})"
+        return Job('site', name, [sys.executable, '-c', script])
+
+    first = job('first', 0, 0.3)
+    second = job('second', 3, 0)
+    independent = job('independent', 0, 0)
+    second.depends_on = [first]
+
+    run_jobs([second, first, independent], workers=3)
+
+    assert log.read_text().split() == ['independent', 'first', 'second']
+    assert [first.returncode, second.returncode, independent.returncode] == [0, 3, 0]
+    assert print_summary([first, second, independent]) == 1
+    assert '2 succeeded, 1 failed' in capsys.readouterr().out
+
+def test_run_in_process_runs_main_block_with_arguments(tmp_path):
+    from core.scheduler import _run_in_process
+    script = tmp_path / 'report.py'
+    script.write_text("import sys\nif __name__ == '__main__':\n    print('args', sys.argv[1:])\n    sys.exit(int(sys.argv[2]))\n")
+    saved_argv = list(sys.argv)
+
+    returncode, output, _ = _run_in_process([sys.executable, str(script), 'site', '4'], stream=False)
+
+    assert returncode == 4
+    assert "args ['site', '4']" in output
+    assert sys.argv == saved_argv
+
+def test_run_jobs_in_process_reuses_workers(mocker, tmp_path):
+    mocker.patch('core.client.get_gsc_service')
+    script = tmp_path / 'report.py'
+    pids = tmp_path / 'pids.log'
+    script.write_text(f"import os\nif __name__ == '__main__':\n    open({str(pids)!r}, 'a').write(str(os.getpid()) + '\\n')\n")
+
+    jobs = build_jobs([f'site-{i}' for i in range(6)], [str(script)])
+    run_jobs(jobs, workers=2, in_process=True)
+
+    assert all(job.returncode == 0 for job in jobs)
+    worker_pids = set(pids.read_text().split())
+    assert len(worker_pids) <= 2
+    assert str(os.getpid()) not in worker_pids
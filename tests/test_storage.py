@@ -0,0 +1,88 @@
+import os
+import pytest
+import pandas as pd
+from core.storage import (
+    HAS_PARQUET,
+    get_fragment_store,
+    read_fragment,
+    write_fragment,
+    find_fragment
+)
+
+requires_parquet = pytest.mark.skipif(not HAS_PARQUET, reason="pyarrow not installed")
+
+@pytest.fixture
+def sample_df():
+    return pd.DataFrame({
+        'query': ['keyword1', 'keyword2', 'keyword1'],
+        'page': ['https://example.com/p1', 'https://example.com/p1', 'https://example.com/p2'],
+        'clicks': [10, 20, 5],
+        'impressions': [100, 200, 50],
+        'ctr': [0.1, 0.1, 0.1],
+        'position': [1.5, 2.5, 3.0]
+    })
+
+def test_get_fragment_store_env(mocker):
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'csv'})
+    assert get_fragment_store().name == 'csv'
+
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'unknown'})
+    assert get_fragment_store().name == 'csv'
+
+@requires_parquet
+def test_parquet_round_trip_with_projection(tmp_path, sample_df, mocker):
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'parquet'})
+    base_path = str(tmp_path / 'abc123')
+
+    path = write_fragment(sample_df, base_path)
+    assert path.endswith('.parquet')
+
+    df = read_fragment(base_path, columns=['query', 'clicks', 'position', 'missing'])
+    assert list(df.columns) == ['query', 'clicks', 'position']
+    assert df['clicks'].tolist() == [10, 20, 5]
+
+@requires_parquet
+def test_legacy_csv_migrated_on_first_read(tmp_path, sample_df, mocker):
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'parquet'})
+    base_path = str(tmp_path / 'abc123')
+    sample_df.to_csv(base_path + '.csv', index=False)
+
+    df = read_fragment(base_path, columns=['page', 'impressions'])
+    assert df['impressions'].sum() == 350
+
+    path, store = find_fragment(base_path)
+    assert store.name == 'parquet'
+    assert not os.path.exists(base_path + '.csv')
+    pd.testing.assert_frame_equal(read_fragment(base_path), sample_df, check_dtype=False)
+
+def test_read_missing_fragment(tmp_path):
+    assert read_fragment(str(tmp_path / 'missing')).empty
+
+@requires_parquet
+def test_migration_keeps_mixed_queries_as_strings(tmp_path, mocker):
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'parquet'})
+    base_path = str(tmp_path / 'abc123')
+    pd.DataFrame({'query': ['404', 'keyword'], 'clicks': [1, 2]}).to_csv(base_path + '.csv', index=False)
+
+    read_fragment(base_path)
+
+    assert read_fragment(base_path)['query'].tolist() == ['404', 'keyword']
+    assert os.listdir(tmp_path) == ['abc123.parquet']
+
+@requires_parquet
+def test_read_relocates_fragment_migrated_by_another_process(tmp_path, sample_df, mocker):
+    mocker.patch.dict(os.environ, {'GSC_CACHE_FORMAT': 'parquet'})
+    base_path = str(tmp_path / 'abc123')
+    sample_df.to_csv(base_path + '.csv', index=False)
+    csv_store = get_fragment_store('csv')
+    original_read = csv_store.read
+
+    def migrated_meanwhile(path, columns=None):
+        # Simulates another process converting the fragment after it was located
+        write_fragment(original_read(path), base_path)
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    mocker.patch.object(csv_store, 'read', side_effect=migrated_meanwhile)
+
+    assert read_fragment(base_path)['clicks'].sum() == 35
@@ -4,7 +4,6 @@ Supports compressing cache files into tar.gz or zip archives, filtering by prope
 """
 import os
 import sys
-import json
 import tarfile
 import zipfile
 import argparse
@@ -15,6 +14,8 @@ from datetime import datetime, date
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.naming import get_property_name
+from core.storage import get_fragment_data_files
+from core import manifest
 
 CACHE_DIR = Path("cache")
 
@@ -33,9 +34,14 @@ def is_safe_path(base_dir, path):
     path = Path(path).resolve()
     return base_dir in path.parents or path == base_dir
 
+def is_local_file(path):
+    """The cache manifest and fragment locks describe the local cache only, so they are never exported or imported."""
+    path = Path(path)
+    return path.name.startswith(manifest.MANIFEST_FILENAME) or '.locks' in path.parts
+
 def get_file_list(property_filter=None, start_date=None, end_date=None):
     """
-    Scans the cache directory and returns a list of file paths to export.
+    Returns a list of cache file paths to export, using the cache manifest.
     Applies filters based on property names and date ranges.
     """
     if not CACHE_DIR.exists():
@@ -44,17 +50,16 @@ def get_file_list(property_filter=None, start_date=None, end_date=None):
 
     # If no filters are provided, return all files in the cache directory
     if not property_filter and not start_date and not end_date:
-        return list(CACHE_DIR.glob("**/*"))
+        return [f for f in CACHE_DIR.glob("**/*") if not is_local_file(f)]
 
     matched_files = []
     
-    # We search for metadata files first to filter, then find corresponding data files
-    for json_file in CACHE_DIR.glob("**/*.json"):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-        except Exception as e:
-            print(f"Warning: Could not read metadata file '{json_file}': {e}", file=sys.stderr)
+    # We filter on the manifest first, then find corresponding data files
+    for entry in manifest.load_manifest(str(CACHE_DIR)):
+        json_file = Path(entry["json_path"])
+        metadata = entry["metadata"]
+        if metadata is None:
+            print(f"Warning: Could not read metadata file '{json_file}': {entry['error']}", file=sys.stderr)
             continue
 
         # 1. Filter by Property
@@ -85,13 +90,13 @@ def get_file_list(property_filter=None, start_date=None, end_date=None):
             if end_date and item_start > end_date:
                 continue
 
-        # If it passed all filters, add the JSON and corresponding CSV
+        # If it passed all filters, add the JSON and corresponding data file (CSV or Parquet)
         matched_files.append(json_file)
-        csv_file = json_file.with_suffix(".csv")
-        if csv_file.exists():
-            matched_files.append(csv_file)
+        data_files = get_fragment_data_files(entry["base_path"])
+        if data_files:
+            matched_files.extend(Path(p) for p in data_files)
         else:
-            print(f"Warning: CSV file '{csv_file}' not found for metadata '{json_file}'", file=sys.stderr)
+            print(f"Warning: Data file not found for metadata '{json_file}'", file=sys.stderr)
 
     return matched_files
 
@@ -124,7 +129,7 @@ def extract_tarball(archive_path, project_root, overwrite=False):
                 continue
             
             # Only extract files destined for the cache directory
-            if not target_path.is_relative_to(project_root / CACHE_DIR):
+            if not target_path.is_relative_to(project_root / CACHE_DIR) or is_local_file(target_path):
                 continue
                 
             if member.isfile():
@@ -155,7 +160,7 @@ def extract_zip(archive_path, project_root, overwrite=False):
                 print(f"Warning: Skipping unsafe member path in archive: '{member}'", file=sys.stderr)
                 continue
                 
-            if not target_path.is_relative_to(project_root / CACHE_DIR):
+            if not target_path.is_relative_to(project_root / CACHE_DIR) or is_local_file(target_path):
                 continue
                 
             # Zip entries ending with '/' represent directories
@@ -286,6 +291,9 @@ def main():
                 print(f"Error: Unsupported archive format. Must be .tar.gz, .tgz, or .zip.")
                 sys.exit(1)
                 
+            if imported:
+                # Index the imported fragments alongside the existing ones
+                manifest.rebuild_manifest(str(project_root / CACHE_DIR))
             print("Import complete:")
             print(f"  - Imported: {imported} files")
             print(f"  - Skipped: {skipped} files (already exist; use --overwrite to replace)")
@@ -13,7 +13,7 @@ from dateutil.relativedelta import relativedelta
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.client import get_gsc_service
-from core.cache import fetch_with_cache
+from core.cache import fetch_with_cache, find_checkpoints
 from core.date_utils import (
     get_latest_available_date, 
     get_month_range_lookback, 
@@ -82,6 +82,12 @@ def warm_site(service, site_url, lookback_months=16, max_rows=100000, start_date
         print(f"Date Range: {start_date} to {end_date}")
     else:
         print(f"Lookback: {lookback_months} full months ({start_date} to {end_date})")
+
+    checkpoints = find_checkpoints(site_url)
+    if checkpoints:
+        print(f"Resuming {len(checkpoints)} interrupted download(s):")
+        for cp in checkpoints:
+            print(f"  - {cp['start_date']} to {cp['end_date']} {cp['dimensions']}: {cp['rows']:,} rows already downloaded")
     
     # 2. Iterate through Golden Dimensions
     for dims, label in GOLDEN_DIMENSIONS:
@@ -89,8 +95,9 @@ def warm_site(service, site_url, lookback_months=16, max_rows=100000, start_date
         try:
             # Cap the multi-dimensional (granular) mapping to prevent pagination latency issues
             chunk_max_rows = max_rows if len(dims) > 1 else None
-            # fetch_with_cache handles the monthly fragmentation and local saving
-            fetch_with_cache(service, site_url, start_date, end_date, dims, label=f"Warming {label}", max_rows=chunk_max_rows)
+            # fetch_with_cache handles the monthly fragmentation and local saving.
+            # load=False streams pages to disk without reassembling the months in memory.
+            fetch_with_cache(service, site_url, start_date, end_date, dims, label=f"Warming {label}", max_rows=chunk_max_rows, load=False)
         except Exception as e:
             print(f"  [!] Error warming {label}: {e}")
 
@@ -129,8 +136,12 @@ def main():
     if args.month:
         start_date, end_date = args.month
         
-    for site in site_list:
-        warm_site(service, site, args.months, args.max_rows, start_date, end_date)
+    try:
+        for site in site_list:
+            warm_site(service, site, args.months, args.max_rows, start_date, end_date)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Downloaded pages have been checkpointed; re-run the same command to resume.")
+        sys.exit(130)
         
     print(f"\n{'='*60}")
     print("CACHE WARMING COMPLETE")
@@ -1,9 +1,15 @@
 """
 Utility to identify and clean partial or corrupted Google Search Console cache files.
 
-This script scans the GSC cache directory and finds JSON cache files that are:
+This script lists the fragments recorded in the cache manifest (cache/manifest.sqlite)
+and finds JSON cache files that are:
 1. Not complete calendar months (i.e. do not start on the 1st and end on the last day of the month).
-2. Corrupted or invalid JSON structures.
+   Single-day fragments of a month that is still open are kept, as fetch_with_cache
+   uses them for rolling windows and merges them once the month closes.
+2. Corrupted or invalid JSON structures (found when the manifest is rebuilt; pass
+   --rebuild-manifest to rescan the sidecars first).
+3. Orphaned by an interrupted write: temporary files, data files without a sidecar,
+   sidecars without a data file and downloaded pages without a checkpoint.
 
 By default, it runs in dry-run mode. Run with the --delete flag to delete these cache files.
 It saves an HTML report under output/account/ detailing the invalid caches with copy-pasteable commands to re-warm them.
@@ -11,12 +17,19 @@ It saves an HTML report under output/account/ detailing the invalid caches with
 
 import os
 import sys
-import json
+import shutil
 import calendar
 import argparse
 from pathlib import Path
 from datetime import datetime
 
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.storage import get_fragment_data_files
+from core.cache import prune_datastore, is_open_month, find_orphaned_fragments
+from core import manifest
+
 CACHE_DIR = Path("cache")
 
 def is_full_month(start_date_str, end_date_str):
@@ -276,33 +289,33 @@ def generate_html_report(bad_caches, total_scanned, delete_files, max_days=None)
         
     print(f"HTML report successfully saved to: {html_path}")
 
-def clean_caches(delete_files=False, verbose=False, max_days=None):
+def clean_caches(delete_files=False, verbose=False, max_days=None, rebuild_manifest=False):
     """
-    Scans the cache directory, finding and optionally deleting partial/corrupted cache entries.
+    Lists the fragments in the cache manifest, finding and optionally deleting partial/corrupted cache entries.
     """
     if not CACHE_DIR.exists():
         print(f"Error: Cache directory '{CACHE_DIR}' does not exist.")
         return
 
     print(f"Scanning cache directory: {CACHE_DIR.resolve()}\n")
+    if rebuild_manifest:
+        manifest.rebuild_manifest(str(CACHE_DIR))
 
     total_scanned = 0
     bad_caches = []
     
-    # Iterate through all JSON files in the cache directory
-    for json_file in CACHE_DIR.glob("**/*.json"):
+    # Iterate through every fragment recorded in the cache manifest
+    for entry in manifest.load_manifest(str(CACHE_DIR)):
         total_scanned += 1
+        json_file = Path(entry["json_path"])
         is_bad = False
         reason = ""
-        metadata = {}
+        metadata = entry["metadata"] or {}
         duration_days = None
         
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-        except Exception as e:
+        if entry["error"]:
             is_bad = True
-            reason = f"Corrupted JSON file ({e})"
+            reason = entry["error"]
             
         if not is_bad:
             start_date_str = metadata.get("start_date")
@@ -312,6 +325,9 @@ def clean_caches(delete_files=False, verbose=False, max_days=None):
             if not start_date_str or not end_date_str:
                 is_bad = True
                 reason = "Missing start_date or end_date in metadata"
+            elif start_date_str == end_date_str and is_open_month(datetime.strptime(start_date_str, "%Y-%m-%d").date()):
+                # Single-day fragments of a still-open month are the live daily cache
+                continue
             elif not is_full_month(start_date_str, end_date_str):
                 is_bad = True
                 reason = f"Partial month ({start_date_str} to {end_date_str})"
@@ -328,10 +344,10 @@ def clean_caches(delete_files=False, verbose=False, max_days=None):
                 if duration_days is None or duration_days > max_days:
                     continue
                     
-            csv_file = json_file.with_suffix(".csv")
+            data_files = [Path(p) for p in get_fragment_data_files(str(json_file.with_suffix("")))]
             bad_caches.append({
                 "json_file": json_file,
-                "csv_file": csv_file,
+                "data_files": data_files,
                 "reason": reason,
                 "site": site_url if isinstance(metadata, dict) and metadata.get("site_url") else "Unknown",
                 "start_date": metadata.get("start_date") if isinstance(metadata, dict) else None,
@@ -343,6 +359,22 @@ def clean_caches(delete_files=False, verbose=False, max_days=None):
                 print(f"  Property: {metadata.get('site_url', 'Unknown')}")
                 print(f"  Reason: {reason}\n")
 
+    # Files left behind by interrupted writes have no usable metadata, so they are always reported
+    if max_days is None:
+        for path, reason in find_orphaned_fragments():
+            total_scanned += 1
+            bad_caches.append({
+                "json_file": Path(path),
+                "data_files": [],
+                "reason": reason,
+                "site": "Unknown",
+                "start_date": None,
+                "end_date": None
+            })
+            if verbose:
+                print(f"Found orphaned cache file: {Path(path).name}")
+                print(f"  Reason: {reason}\n")
+
     if not bad_caches:
         print(f"Scan complete. Scanned {total_scanned} cache files. No matching invalid caches found.")
         return
@@ -372,21 +404,29 @@ def clean_caches(delete_files=False, verbose=False, max_days=None):
         for item in bad_caches:
             # Delete JSON file
             try:
-                if item["json_file"].exists():
+                if item["json_file"].is_dir():
+                    shutil.rmtree(item["json_file"])
+                    deleted_count += 1
+                elif item["json_file"].exists():
                     os.remove(item["json_file"])
                     deleted_count += 1
             except Exception as e:
                 print(f"Error deleting JSON file '{item['json_file']}': {e}")
                 
-            # Delete corresponding CSV file
-            try:
-                if item["csv_file"].exists():
-                    os.remove(item["csv_file"])
-                    deleted_count += 1
-            except Exception as e:
-                print(f"Error deleting CSV file '{item['csv_file']}': {e}")
+            # Delete corresponding data files (CSV or Parquet)
+            for data_file in item["data_files"]:
+                try:
+                    if data_file.exists():
+                        os.remove(data_file)
+                        deleted_count += 1
+                except Exception as e:
+                    print(f"Error deleting data file '{data_file}': {e}")
                 
         print(f"Successfully deleted {deleted_count} files ({len(bad_caches)} cache entries).")
+        manifest.remove_fragments(str(CACHE_DIR), [item["json_file"] for item in bad_caches if not item["json_file"].exists()])
+        pruned = prune_datastore()
+        if pruned:
+            print(f"Removed {pruned} deleted fragments from the local data store.")
 
     # Always generate and save the HTML report
     generate_html_report(bad_caches, total_scanned, delete_files, max_days)
@@ -410,9 +450,14 @@ def main():
         type=int,
         help="Only target partial caches spanning this number of days or fewer (e.g. 7)."
     )
+    parser.add_argument(
+        "--rebuild-manifest",
+        action="store_true",
+        help="Rebuild the cache manifest from the JSON sidecars before scanning, to find corrupted ones."
+    )
     
     args = parser.parse_args()
-    clean_caches(delete_files=args.delete, verbose=args.verbose, max_days=args.max_days)
+    clean_caches(delete_files=args.delete, verbose=args.verbose, max_days=args.max_days, rebuild_manifest=args.rebuild_manifest)
 
 if __name__ == "__main__":
     main()
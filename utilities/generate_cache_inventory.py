@@ -5,7 +5,6 @@ Scans cache directory and reports on presence of "Golden Caches"
 """
 import os
 import sys
-import json
 import datetime
 import calendar
 import argparse
@@ -19,6 +18,7 @@ import pandas as pd
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core.naming import get_property_name, get_output_dir, get_filename_slug
+from core import manifest
 
 try:
     from core.client import get_gsc_service, get_available_properties
@@ -120,9 +120,9 @@ def adjust_expected_months_for_site(service, site_url, expected_months):
         
     return expected_months
 
-def load_cache_inventory():
+def load_cache_inventory(rebuild_manifest=False):
     """
-    Reads all cache JSON files in the cache directory.
+    Reads the cache manifest (rebuilding it from the JSON sidecars if it is missing or rebuild_manifest is set).
     Returns a nested dict: prop_name -> (start_date, end_date) -> set of sorted dimension tuples.
     """
     cache_dir = Path("cache")
@@ -130,23 +130,18 @@ def load_cache_inventory():
     
     if not cache_dir.exists():
         return inventory
+
+    if rebuild_manifest:
+        count = manifest.rebuild_manifest(str(cache_dir))
+        print(f"Rebuilt the cache manifest from {count} cache fragments.")
         
-    for json_file in cache_dir.glob("**/*.json"):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                site_url = data.get("site_url")
-                if not site_url:
-                    continue
-                prop_name = get_property_name(site_url)
-                start_date = data.get("start_date")
-                end_date = data.get("end_date")
-                dims = data.get("dimensions", [])
-                
-                dims_tuple = tuple(sorted(dims))
-                inventory[prop_name][(start_date, end_date)].add(dims_tuple)
-        except Exception:
+    for entry in manifest.load_manifest(str(cache_dir)):
+        data = entry['metadata']
+        if not data or not data.get("site_url"):
             continue
+        prop_name = get_property_name(data["site_url"])
+        dims_tuple = tuple(sorted(data.get("dimensions") or []))
+        inventory[prop_name][(data.get("start_date"), data.get("end_date"))].add(dims_tuple)
             
     return inventory
 
@@ -556,9 +551,9 @@ def format_dims(dims_list):
     """Formats tuples into short dimension label strings."""
     return [DIM_LABELS.get(d, "+".join(d)) for d in dims_list]
 
-def run_inventory(site_arg=None, file_arg=None, months=16, start_date=None, end_date=None, api_flag=False, output_dir='output/account', format_arg='all'):
+def run_inventory(site_arg=None, file_arg=None, months=16, start_date=None, end_date=None, api_flag=False, output_dir='output/account', format_arg='all', rebuild_manifest=False):
     """Executes the cache evaluation process and generates reports."""
-    cache_inventory = load_cache_inventory()
+    cache_inventory = load_cache_inventory(rebuild_manifest)
     
     # 1. Resolve site list
     sites = determine_sites(site_arg, file_arg, api_flag, cache_inventory)
@@ -646,6 +641,8 @@ def main():
     parser.add_argument('--output-dir', default='output/account', help='Directory to save output reports (default: output/account).')
     parser.add_argument('--format', choices=['all', 'html', 'csv', 'console'], default='all', 
                         help='Report format: console, csv, html, or all (default).')
+    parser.add_argument('--rebuild-manifest', action='store_true',
+                        help='Rebuild the cache manifest from the JSON sidecars before reporting (e.g. after copying cache files by hand).')
                         
     args = parser.parse_args()
     
@@ -661,7 +658,8 @@ def main():
         end_date=args.end_date,
         api_flag=args.api,
         output_dir=args.output_dir,
-        format_arg=args.format
+        format_arg=args.format,
+        rebuild_manifest=args.rebuild_manifest
     )
 
 if __name__ == '__main__':